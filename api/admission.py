@@ -0,0 +1,312 @@
+"""
+准入控制模块
+把并发 LLM 调用分为 interactive / batch / background 三个优先级通道，共享同一份提供商额度：
+有空闲名额时按优先级放行，interactive 独占一部分预留名额；预计排队时间超过截止时间的请求
+在入队时就直接拒绝（HTTP 层返回 429 + Retry-After），不在队列中白等
+"""
+
+import asyncio
+import math
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.stream_metrics import summarize_samples
+
+
+# 优先级从高到低
+LANES = ("interactive", "batch", "background")
+
+# 每个通道保留的最近排队耗时样本数
+MAX_WAIT_SAMPLES = 1000
+
+# 估算服务时长的指数滑动平均系数
+SERVICE_TIME_ALPHA = 0.1
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    if current is None:
+        return sample
+    return current + SERVICE_TIME_ALPHA * (sample - current)
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入（队列已满、预计超时或排队超时）"""
+
+    def __init__(self, lane: str, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After 响应头（整数秒，至少 1 秒）"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionTicket:
+    """一个已放行的名额，调用结束后必须 release()"""
+
+    def __init__(self, controller: "AdmissionController", lane: str, queue_wait: float):
+        self.controller = controller
+        self.lane = lane
+        self.queue_wait = queue_wait
+        self.granted_at = time.time()
+        self.released = False
+
+    def release(self):
+        """归还名额（重复调用无副作用）"""
+        if self.released:
+            return
+        self.released = True
+        self.controller._release(self)
+
+
+class _Lane:
+    """单个优先级通道的队列与统计"""
+
+    def __init__(self, name: str, max_queue: int, deadline: float):
+        self.name = name
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.inflight = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "predicted_miss": 0, "deadline": 0}
+        self.wait_samples: "deque[float]" = deque(maxlen=MAX_WAIT_SAMPLES)
+        self.service_time: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "deadline": self.deadline,
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "queue_wait": summarize_samples(self.wait_samples),
+            "avg_service_time": round(self.service_time, 4) if self.service_time is not None else None
+        }
+
+
+class AdmissionController:
+    """
+    带优先级通道的准入控制器
+
+    只能在同一个事件循环中使用（web_server.py 的请求处理协程）
+    """
+
+    def __init__(
+        self,
+        max_inflight: Optional[int] = None,
+        interactive_reserved: Optional[int] = None,
+        max_queue: Optional[Dict[str, int]] = None,
+        deadlines: Optional[Dict[str, float]] = None
+    ):
+        """
+        初始化控制器
+
+        Args:
+            max_inflight: 同时进行的 LLM 调用上限（应与提供商额度匹配），默认读取配置 ADMISSION_MAX_INFLIGHT
+            interactive_reserved: 只给 interactive 使用的预留名额，默认读取配置 ADMISSION_INTERACTIVE_RESERVED
+            max_queue: 各通道队列长度上限，默认读取配置 ADMISSION_*_QUEUE
+            deadlines: 各通道默认排队截止时间（秒），默认读取配置 ADMISSION_*_DEADLINE
+        """
+        self.max_inflight = max_inflight or config.ADMISSION_MAX_INFLIGHT
+        reserved = interactive_reserved if interactive_reserved is not None else config.ADMISSION_INTERACTIVE_RESERVED
+        self.interactive_reserved = min(reserved, self.max_inflight - 1)
+        max_queue = {
+            "interactive": config.ADMISSION_INTERACTIVE_QUEUE,
+            "batch": config.ADMISSION_BATCH_QUEUE,
+            "background": config.ADMISSION_BACKGROUND_QUEUE,
+            **(max_queue or {})
+        }
+        deadlines = {
+            "interactive": config.ADMISSION_INTERACTIVE_DEADLINE,
+            "batch": config.ADMISSION_BATCH_DEADLINE,
+            "background": config.ADMISSION_BACKGROUND_DEADLINE,
+            **(deadlines or {})
+        }
+        self.lanes = {name: _Lane(name, max_queue[name], deadlines[name]) for name in LANES}
+        self.inflight = 0
+        self.service_time: Optional[float] = None
+
+    def _lane(self, lane: str) -> _Lane:
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown priority lane: {lane}. Supported: {', '.join(LANES)}")
+        return self.lanes[lane]
+
+    def _capacity(self, lane: str) -> int:
+        """该通道最多能占用的名额（batch/background 不能使用 interactive 的预留名额）"""
+        if lane == "interactive":
+            return self.max_inflight
+        return self.max_inflight - self.interactive_reserved
+
+    def _queued_ahead(self, lane: str) -> int:
+        """排在该通道新请求之前的等待数（同级及更高优先级）"""
+        ahead = 0
+        for name in LANES:
+            ahead += len(self.lanes[name].waiters)
+            if name == lane:
+                break
+        return ahead
+
+    def estimate_wait(self, lane: str) -> float:
+        """
+        估算新请求的排队时间
+
+        Args:
+            lane: 优先级通道
+
+        Returns:
+            预计排队秒数；没有服务时长样本时返回 0（不做预测性拒绝）
+        """
+        ahead = self._queued_ahead(lane)
+        free = self._capacity(lane) - self.inflight
+        if free > ahead:
+            return 0.0
+        if self.service_time is None:
+            return 0.0
+        # 前面的请求依次占满可用名额，每一轮约需一个平均服务时长
+        rounds = (ahead - max(free, 0)) // self._capacity(lane) + 1
+        return rounds * self.service_time
+
+    def check(self, lane: str, count: int = 1):
+        """
+        检查通道队列是否还能容纳 count 个请求（批量请求入口使用，不占用名额）
+
+        Raises:
+            AdmissionRejected: 队列已满
+        """
+        state = self._lane(lane)
+        if len(state.waiters) + count > state.max_queue:
+            state.shed["queue_full"] += 1
+            raise AdmissionRejected(
+                lane, "queue_full", self.estimate_wait(lane) or 1.0,
+                f"{lane} queue is full ({state.max_queue} waiting)"
+            )
+
+    async def acquire(self, lane: str = "interactive", deadline: Optional[float] = None) -> AdmissionTicket:
+        """
+        申请一个名额
+
+        Args:
+            lane: 优先级通道
+            deadline: 最长排队秒数，默认使用通道配置；0 或负数表示不设截止时间（一直等待）
+
+        Returns:
+            AdmissionTicket
+
+        Raises:
+            AdmissionRejected: 队列已满、预计超过截止时间或排队超时
+            ValueError: 通道名称不正确
+        """
+        state = self._lane(lane)
+        if deadline is None:
+            deadline = state.deadline
+        start = time.time()
+
+        # 有空闲名额且没有同级或更高优先级的请求在排队：直接放行
+        if self.inflight < self._capacity(lane) and self._queued_ahead(lane) == 0:
+            state.wait_samples.append(0.0)
+            return self._grant(state)
+
+        if len(state.waiters) >= state.max_queue:
+            state.shed["queue_full"] += 1
+            raise AdmissionRejected(
+                lane, "queue_full", self.estimate_wait(lane) or 1.0,
+                f"{lane} queue is full ({state.max_queue} waiting)"
+            )
+
+        if deadline > 0:
+            predicted = self.estimate_wait(lane)
+            if predicted > deadline:
+                state.shed["predicted_miss"] += 1
+                raise AdmissionRejected(
+                    lane, "predicted_miss", predicted,
+                    f"Estimated queue time {predicted:.1f}s exceeds {lane} deadline of {deadline}s"
+                )
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        try:
+            if deadline > 0:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=deadline)
+            else:
+                await waiter
+        except asyncio.TimeoutError:
+            self._abandon(state, waiter)
+            state.shed["deadline"] += 1
+            raise AdmissionRejected(
+                lane, "deadline", self.estimate_wait(lane) or 1.0,
+                f"Waited {time.time() - start:.1f}s in {lane} queue without getting a slot"
+            )
+        except asyncio.CancelledError:
+            # 排队期间客户端断开
+            self._abandon(state, waiter)
+            raise
+
+        ticket = waiter.result()
+        ticket.queue_wait = time.time() - start
+        state.wait_samples.append(ticket.queue_wait)
+        return ticket
+
+    def _grant(self, state: _Lane) -> AdmissionTicket:
+        self.inflight += 1
+        state.inflight += 1
+        state.admitted += 1
+        return AdmissionTicket(self, state.name, 0.0)
+
+    def _abandon(self, state: _Lane, waiter: asyncio.Future):
+        """移出队列；如果在超时/取消的同时已经放行，把名额还回去"""
+        if waiter in state.waiters:
+            state.waiters.remove(waiter)
+        elif waiter.done() and not waiter.cancelled():
+            waiter.result().release()
+        if not waiter.done():
+            waiter.cancel()
+
+    def _release(self, ticket: AdmissionTicket):
+        state = self.lanes[ticket.lane]
+        self.inflight -= 1
+        state.inflight -= 1
+        held = time.time() - ticket.granted_at
+        state.service_time = _ewma(state.service_time, held)
+        self.service_time = _ewma(self.service_time, held)
+        self._dispatch()
+
+    def _dispatch(self):
+        """按优先级把空闲名额分给排队的请求"""
+        for name in LANES:
+            state = self.lanes[name]
+            while state.waiters and self.inflight < self._capacity(name):
+                waiter = state.waiters.popleft()
+                if waiter.done():
+                    continue
+                waiter.set_result(self._grant(state))
+            if state.waiters:
+                # 高优先级仍在排队时不放行低优先级
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入控制指标：各通道队列深度、放行数、拒绝数、排队耗时"""
+        return {
+            "max_inflight": self.max_inflight,
+            "interactive_reserved": self.interactive_reserved,
+            "inflight": self.inflight,
+            "avg_service_time": round(self.service_time, 4) if self.service_time is not None else None,
+            "queued": sum(len(lane.waiters) for lane in self.lanes.values()),
+            "shed": sum(sum(lane.shed.values()) for lane in self.lanes.values()),
+            "lanes": {name: lane.to_dict() for name, lane in self.lanes.items()}
+        }
+
+
+admission_controller = AdmissionController()
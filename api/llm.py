@@ -1,9 +1,11 @@
 import openai
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import Dict, Any, Optional, List, Generator, Callable
+from typing import Dict, Any, Optional, List, Generator, Callable, Tuple
 import sys
 from pathlib import Path
+import threading
 import time
 
 # 添加项目根目录到Python路径
@@ -15,6 +17,46 @@ from config import Config
 class LLMClient:
     def __init__(self):
         self.config = Config()
+        # 连接池：同一个 LLMClient 的所有请求复用 HTTP 连接（服务端多个请求共享一个实例）
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=self.config.HTTP_POOL_MAXSIZE
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._openai_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._openai_clients_lock = threading.Lock()
+    
+    def _get_openai_client(self, api_key: str, base_url: Optional[str] = None):
+        """
+        获取（并缓存）OpenAI 客户端，相同 api_key 和 base_url 复用同一个连接池
+        
+        Args:
+            api_key: API 密钥
+            base_url: API 地址，None 表示 OpenAI 官方地址
+        """
+        key = (api_key, base_url)
+        with self._openai_clients_lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                if base_url:
+                    client = openai.OpenAI(api_key=api_key, base_url=base_url)
+                else:
+                    client = openai.OpenAI(api_key=api_key)
+                self._openai_clients[key] = client
+            return client
+    
+    def close(self):
+        """关闭连接池"""
+        self._session.close()
+        with self._openai_clients_lock:
+            for client in self._openai_clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._openai_clients.clear()
         
     def call_openai(
         self,
@@ -45,7 +87,7 @@ class LLMClient:
         Returns:
             API响应字典
         """
-        client = openai.OpenAI(api_key=self.config.OPENAI_API_KEY)
+        client = self._get_openai_client(self.config.OPENAI_API_KEY)
         
         try:
             response = client.chat.completions.create(
@@ -121,10 +163,7 @@ class LLMClient:
             API响应字典
         """
         # 使用 OpenAI 客户端库，但指向 Perplexity 的端点
-        client = openai.OpenAI(
-            api_key=self.config.PERPLEXITY_API_KEY,
-            base_url="https://api.perplexity.ai"
-        )
+        client = self._get_openai_client(self.config.PERPLEXITY_API_KEY, "https://api.perplexity.ai")
         
         try:
             response = client.chat.completions.create(
@@ -215,7 +254,7 @@ class LLMClient:
             payload["stop"] = stop
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._session.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
             data = response.json()
@@ -282,7 +321,7 @@ class LLMClient:
             payload["stop"] = stop
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._session.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
             data = response.json()
@@ -355,7 +394,7 @@ class LLMClient:
             payload["stop"] = stop
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._session.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
             data = response.json()
@@ -373,6 +412,47 @@ class LLMClient:
                 "provider": "gemini"
             }
     
+    def call_stub(
+        self,
+        model: str = "stub",
+        messages: List[Dict[str, str]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        调用本地 OpenAI 兼容桩服务（STUB_API_BASE），用于压测和离线联调，不消耗真实额度
+        
+        Args:
+            model: 模型名称（桩服务忽略）
+            messages: 消息列表 [{"role": "user", "content": "text"}]
+            **kwargs: 其他参数，原样透传
+        
+        Returns:
+            API响应字典
+        """
+        url = f"{self.config.STUB_API_BASE}/chat/completions"
+        payload = {
+            "model": model,
+            "messages": messages or [],
+            **kwargs
+        }
+        
+        try:
+            response = self._session.post(url, json=payload)
+            response.raise_for_status()
+            
+            return {
+                "success": True,
+                "data": response.json(),
+                "provider": "stub"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "provider": "stub"
+            }
+    
     def call_llm(
         self,
         provider: str,
@@ -384,7 +464,7 @@ class LLMClient:
         统一LLM调用接口
         
         Args:
-            provider: 提供商 ("openai", "perplexity", "groq", "ali", "gemini")
+            provider: 提供商 ("openai", "perplexity", "groq", "ali", "gemini", "stub")
             model: 模型名称
             messages: 消息列表
             **kwargs: 其他参数
@@ -402,6 +482,8 @@ class LLMClient:
             return self.call_ali(model=model, messages=messages, **kwargs)
         elif provider.lower() == "gemini":
             return self.call_gemini(model=model, messages=messages, **kwargs)
+        elif provider.lower() == "stub":
+            return self.call_stub(model=model, messages=messages, **kwargs)
         else:
             return {
                 "success": False,
@@ -444,6 +526,10 @@ class LLMClient:
             choices = data.get("choices", [])
             if choices:
                 return choices[0].get("message", {}).get("content")
+        elif response.get("provider") == "stub":
+            choices = data.get("choices", [])
+            if choices:
+                return choices[0].get("message", {}).get("content")
         
         return None
     
@@ -458,7 +544,7 @@ class LLMClient:
         流式调用LLM接口 - 简单直接返回流对象
         
         Args:
-            provider: 提供商 ("openai", "gemini", "ali", "groq")
+            provider: 提供商 ("openai", "gemini", "ali", "groq", "perplexity", "stub")
             model: 模型名称
             messages: 消息列表
             **kwargs: 其他参数
@@ -478,12 +564,14 @@ class LLMClient:
             return self._stream_groq(model, messages, **kwargs)
         elif provider.lower() == "perplexity":
             return self._stream_perplexity(model, messages, **kwargs)
+        elif provider.lower() == "stub":
+            return self._stream_stub(model, messages, **kwargs)
         else:
             raise ValueError(f"Unsupported provider for streaming: {provider}")
     
     def _stream_openai(self, model: str, messages: List[Dict[str, str]], **kwargs):
         """OpenAI 流式生成 - 使用原生 OpenAI API"""
-        client = openai.OpenAI(api_key=self.config.OPENAI_API_KEY)
+        client = self._get_openai_client(self.config.OPENAI_API_KEY)
         return client.chat.completions.create(
             model=model,
             messages=messages or [],
@@ -493,10 +581,7 @@ class LLMClient:
     def _stream_gemini(self, model: str, messages: List[Dict[str, str]], **kwargs):
         """Gemini 流式生成 - 使用 OpenAI 客户端库统一接口"""
         # 使用 OpenAI 客户端库，但指向 Gemini 的端点
-        client = openai.OpenAI(
-            api_key=self.config.GEMINI_API_KEY,
-            base_url=self.config.GEMINI_API_BASE
-        )
+        client = self._get_openai_client(self.config.GEMINI_API_KEY, self.config.GEMINI_API_BASE)
         
         # 过滤掉不支持的参数
         supported_params = {}
@@ -525,7 +610,7 @@ class LLMClient:
             **kwargs
         }
         
-        response = requests.post(url, json=payload, headers=headers, stream=True)
+        response = self._session.post(url, json=payload, headers=headers, stream=True)
         response.raise_for_status()
         return response
     
@@ -544,23 +629,34 @@ class LLMClient:
             **kwargs
         }
         
-        response = requests.post(url, json=payload, headers=headers, stream=True)
+        response = self._session.post(url, json=payload, headers=headers, stream=True)
         response.raise_for_status()
         return response
     
     def _stream_perplexity(self, model: str, messages: List[Dict[str, str]], **kwargs):
         """Perplexity 流式生成 - 使用 OpenAI 客户端库统一接口"""
         # 使用 OpenAI 客户端库，但指向 Perplexity 的端点
-        client = openai.OpenAI(
-            api_key=self.config.PERPLEXITY_API_KEY,
-            base_url="https://api.perplexity.ai"
-        )
+        client = self._get_openai_client(self.config.PERPLEXITY_API_KEY, "https://api.perplexity.ai")
         
         return client.chat.completions.create(
             model=model,
             messages=messages or [],
             **kwargs
         )
+    
+    def _stream_stub(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        """本地桩服务 流式生成 - 返回requests流对象"""
+        url = f"{self.config.STUB_API_BASE}/chat/completions"
+        
+        payload = {
+            "model": model,
+            "messages": messages or [],
+            **kwargs
+        }
+        
+        response = self._session.post(url, json=payload, stream=True)
+        response.raise_for_status()
+        return response
 
 
 # 预设模型配置
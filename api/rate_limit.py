@@ -0,0 +1,95 @@
+"""
+提供商速率限制模块
+令牌桶限速器：批量调用在发请求前先取令牌，按提供商的每分钟请求数（*_RATE_LIMIT_RPM）平滑发送；
+同一进程内同一提供商共享一个限速器
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+
+
+# 提供商返回限流错误时错误信息中常见的关键字
+RATE_LIMIT_MARKERS = ("429", "rate limit", "rate_limit", "too many requests", "quota")
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        """
+        初始化限速器
+
+        Args:
+            requests_per_minute: 每分钟允许的请求数
+            burst: 令牌桶容量（允许的突发请求数），默认为每秒请求数，至少 1
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        取一个令牌，令牌不足时阻塞等待
+
+        Returns:
+            等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, requests_per_minute: Optional[float] = None) -> Optional[RateLimiter]:
+    """
+    获取提供商共享的限速器
+
+    Args:
+        provider: LLM提供商
+        requests_per_minute: 每分钟请求数，默认读取配置 <PROVIDER>_RATE_LIMIT_RPM；0 表示不限速
+
+    Returns:
+        RateLimiter，不限速时返回 None
+    """
+    if requests_per_minute is None:
+        requests_per_minute = getattr(config, f"{provider.upper()}_RATE_LIMIT_RPM", 0)
+    if not requests_per_minute or requests_per_minute <= 0:
+        return None
+
+    key = f"{provider.lower()}:{requests_per_minute}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(requests_per_minute)
+        return limiter
+
+
+def is_rate_limit_error(error: Optional[str]) -> bool:
+    """判断错误信息是否为提供商限流（可退避重试）"""
+    if not error:
+        return False
+    error = error.lower()
+    return any(marker in error for marker in RATE_LIMIT_MARKERS)
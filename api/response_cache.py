@@ -0,0 +1,154 @@
+"""
+响应缓存模块
+低温度的提取调用对相同输入基本是幂等的：按规范化后的请求（提供商、模型、提示词版本、输入）计算强 ETag，
+命中时直接返回缓存的响应体，不调用 LLMClient；客户端带 If-None-Match 时返回 304
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+
+
+def prompt_version(prompt_template: str) -> str:
+    """
+    提示词版本：提示词内容的短哈希，修改提示词后旧缓存自动失效
+
+    Args:
+        prompt_template: 提示词模板内容
+
+    Returns:
+        12 位十六进制字符串
+    """
+    return hashlib.sha256(prompt_template.encode("utf-8")).hexdigest()[:12]
+
+
+def compute_etag(
+    endpoint: str,
+    provider: Optional[str],
+    model: Optional[str],
+    version: str,
+    payload: Dict[str, Any]
+) -> str:
+    """
+    根据规范化的请求计算强 ETag
+
+    Args:
+        endpoint: 端点名称
+        provider: LLM提供商（None 表示提取器默认值）
+        model: 模型名称（None 表示提取器默认值）
+        version: 提示词版本
+        payload: 影响结果的输入字段和 LLM 参数
+
+    Returns:
+        带引号的 ETag，例如 "\"3f2a...\""
+    """
+    canonical = json.dumps(
+        {"endpoint": endpoint, "provider": provider, "model": model, "prompt": version, "input": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 是否匹配（按 RFC 7232 使用弱比较）
+
+    Args:
+        if_none_match: If-None-Match 请求头
+        etag: 当前响应的 ETag
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """线程安全的 LRU 响应缓存（按 ETag 存放序列化后的响应体）"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最多缓存的响应数，默认读取配置 RESPONSE_CACHE_MAX_ENTRIES
+            ttl: 缓存有效期（秒），默认读取配置 RESPONSE_CACHE_TTL
+        """
+        self.max_entries = max_entries or config.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = ttl or config.RESPONSE_CACHE_TTL
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, etag: str) -> Optional[bytes]:
+        """读取缓存的响应体，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            body, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[etag]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return body
+
+    def put(self, etag: str, body: bytes):
+        """写入响应体，超过容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[etag] = (body, time.time())
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+response_cache = ResponseCache()
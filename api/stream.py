@@ -3,11 +3,20 @@
 支持多种 LLM 提供商的流式输出统一处理，方便前端集成
 """
 
+import asyncio
 import json
-from typing import Dict, Any, Optional, Generator, Iterator
+import threading
+from typing import Dict, Any, Optional, Generator, Iterator, Callable, AsyncIterator
 from enum import Enum
 import time
 
+from api.stream_metrics import StreamMetrics
+
+
+# 异步迭代时拉取线程最多领先消费方的数据块数
+# 保持很小：拉取线程跑得太靠前会与事件循环争抢 GIL，高并发时新连接的首 token 时间明显变长
+ASYNC_PREFETCH = 1
+
 
 class StreamType(Enum):
     """流式响应类型枚举"""
@@ -56,14 +65,19 @@ class UniversalStream:
         self, 
         provider_stream, 
         stream_type: StreamType,
-        provider_name: str = "unknown"
+        provider_name: str = "unknown",
+        start_time: Optional[float] = None,
+        max_tokens: Optional[int] = None
     ):
         self.provider_stream = provider_stream
         self.stream_type = stream_type
         self.provider_name = provider_name
         self.finished = False
+        self.cancelled = False
         self.total_content = ""
         self.chunk_count = 0
+        self.metrics = StreamMetrics(provider_name, start_time=start_time, max_tokens=max_tokens)
+        self._line_iterator = None
         
     def __iter__(self):
         return self
@@ -79,17 +93,24 @@ class UniversalStream:
                 # 检查是否结束
                 if chunk_data.finish_reason is not None:
                     self.finished = True
-                return chunk_data
             elif self.stream_type == StreamType.REQUESTS:
-                return self._handle_requests_chunk()
+                chunk_data = self._handle_requests_chunk()
             else:
                 raise ValueError(f"Unsupported stream type: {self.stream_type}")
+            
+            # 记录延迟指标
+            self.metrics.record_chunk(chunk_data.content, chunk_data.metadata.get('usage'))
+            if chunk_data.finish_reason is not None:
+                self.metrics.finish("completed")
+            return chunk_data
                 
         except StopIteration:
             self.finished = True
+            self.metrics.finish("completed")
             raise
         except Exception as e:
             self.finished = True
+            self.metrics.finish("error")
             error_chunk = ChunkData(
                 chunk_type="error",
                 error=str(e),
@@ -97,6 +118,38 @@ class UniversalStream:
             )
             return error_chunk
     
+    def close(self, reason: str = "cancelled"):
+        """
+        取消流并关闭底层连接（requests.Response 或 OpenAI Stream），让提供商尽快停止生成
+        
+        Args:
+            reason: 取消原因，如 "client_disconnect"
+        """
+        if self.finished:
+            return
+        self.finished = True
+        self.cancelled = True
+        self.metrics.finish("cancelled", reason=reason)
+        
+        close = getattr(self.provider_stream, 'close', None)
+        if close is None:
+            # 兼容只在 response 上提供 close 的流对象
+            close = getattr(getattr(self.provider_stream, 'response', None), 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Failed to close provider stream: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取流的统计信息，用于 finish 块元数据"""
+        return {
+            "total_chunks": self.chunk_count,
+            "total_content_length": len(self.total_content),
+            "provider": self.provider_name,
+            "latency": self.metrics.to_dict()
+        }
+    
     def _handle_openai_chunk(self) -> ChunkData:
         """处理 OpenAI 风格的流式数据"""
         chunk = next(self.provider_stream)
@@ -133,7 +186,11 @@ class UniversalStream:
     
     def _handle_requests_chunk(self) -> ChunkData:
         """处理 requests SSE 风格的流式数据"""
-        for line in self.provider_stream.iter_lines():
+        # 复用同一个行迭代器，避免每次调用 iter_lines() 丢弃已缓冲但未消费的行
+        if self._line_iterator is None:
+            self._line_iterator = self.provider_stream.iter_lines()
+        
+        for line in self._line_iterator:
             if line:
                 line = line.decode('utf-8')
                 if line.startswith('data: '):
@@ -162,47 +219,252 @@ class UniversalStream:
         raise StopIteration
 
 
+def make_event_id(stream_id: Optional[str], seq: int) -> str:
+    """生成 SSE 事件 id，带流ID时格式为 <stream_id>:<序号>"""
+    return f"{stream_id}:{seq}" if stream_id else str(seq)
+
+
+def format_sse_event(data: str, event_id: Optional[str] = None) -> str:
+    """格式化单个 SSE 事件"""
+    if event_id is None:
+        return f"data: {data}\n\n"
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+class _PumpError:
+    """异步迭代时拉取线程中抛出的异常，交给消费方重新抛出"""
+    
+    def __init__(self, error: Exception):
+        self.error = error
+
+
 class StreamResponse:
     """流式响应封装器"""
     
-    def __init__(self, universal_stream: UniversalStream):
+    def __init__(
+        self,
+        universal_stream: UniversalStream,
+        result_builder: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        """
+        初始化流式响应
+        
+        Args:
+            universal_stream: 统一流（UniversalStream 或接口兼容的流）
+            result_builder: 流正常结束后由完整内容和 usage 构建最终结果的函数，
+                结果以 type 为 "result" 的块（metadata.result）在结束块之前发送
+        """
         self.stream = universal_stream
+        self.result_builder = result_builder
+    
+    def _build_result_chunk(self, content: str) -> Optional[ChunkData]:
+        """用 result_builder 构建最终结果块，未设置 result_builder 时返回 None"""
+        if self.result_builder is None:
+            return None
+        metrics = getattr(self.stream, 'metrics', None)
+        usage = (metrics.usage if metrics is not None else None) or {}
+        try:
+            result = self.result_builder(content, usage)
+        except Exception as e:
+            return ChunkData(chunk_type="error", error=f"Failed to build result: {str(e)}")
+        return ChunkData(chunk_type="result", metadata={"result": result})
+    
+    def close(self, reason: str = "cancelled"):
+        """取消底层流（客户端断开时调用），未结束的提供商连接会被关闭"""
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            close(reason)
+    
+    def buffered(
+        self,
+        max_chunks: Optional[int] = None,
+        policy: Optional[str] = None,
+        max_chars: Optional[int] = None
+    ) -> "StreamResponse":
+        """
+        在提供商流和输出适配器之间加入有界缓冲队列，上游在后台全速读取，尽早释放提供商连接
+        
+        Args:
+            max_chunks: 队列最多容纳的数据块数，默认读取配置 STREAM_BUFFER_MAX_CHUNKS
+            policy: 队列满时的策略 ("block", "coalesce", "drop_oldest")，默认读取配置 STREAM_BUFFER_POLICY
+            max_chars: 队列中最多容纳的内容字符数，默认读取配置 STREAM_BUFFER_MAX_CHARS
+            
+        Returns:
+            StreamResponse: 包装了 BufferedStream 的新响应对象
+        """
+        from api.stream_buffer import BufferedStream
+        return StreamResponse(
+            BufferedStream(self.stream, max_chunks=max_chunks, policy=policy, max_chars=max_chars),
+            result_builder=self.result_builder
+        )
+    
+    def pipe(self, *operators) -> "StreamResponse":
+        """
+        让内容块在到达时依次经过流式变换算子（见 api.stream_ops），不需要等待完整响应
+        
+        Args:
+            *operators: 算子或算子列表，如 strip_code_fences()、redact_pii()
+            
+        Returns:
+            StreamResponse: 包装了 TransformedStream 的新响应对象
+        """
+        from api.stream_ops import TransformedStream
+        return StreamResponse(TransformedStream(self.stream, operators), result_builder=self.result_builder)
+    
+    async def _aiterate(self, iterator: Iterator) -> AsyncIterator[Any]:
+        """
+        在线程池中拉取同步迭代器，不阻塞事件循环；消费方提前退出时取消上游
+        
+        整个流只占用线程池中的一个线程持续拉取，数据块通过 call_soon_threadsafe 交给事件循环，
+        避免每个数据块都提交一次线程池任务（高并发时线程切换开销远大于数据块本身的处理）
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        slots = threading.Semaphore(ASYNC_PREFETCH)
+        stopped = threading.Event()
+        sentinel = object()
+        
+        def deliver(item):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                stopped.set()
+        
+        def pump():
+            try:
+                for item in iterator:
+                    slots.acquire()
+                    if stopped.is_set():
+                        return
+                    deliver(item)
+            except Exception as e:
+                deliver(_PumpError(e))
+            finally:
+                deliver(sentinel)
+        
+        completed = False
+        loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await items.get()
+                if item is sentinel:
+                    completed = True
+                    return
+                slots.release()
+                if isinstance(item, _PumpError):
+                    raise item.error
+                yield item
+        finally:
+            if not completed:
+                # 客户端断开或任务被取消，关闭提供商连接（拉取线程随之结束）
+                stopped.set()
+                slots.release()
+                self.close("client_disconnect")
+    
+    def aiter_chunks(self) -> AsyncIterator[ChunkData]:
+        """异步迭代数据块，用于 asyncio / ASGI 服务"""
+        return self._aiterate(iter(self.stream))
+    
+    def to_async_sse(self, stream_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        异步版本的 to_sse，事件格式与 to_sse 完全相同
+        
+        Args:
+            stream_id: 流ID，用于断点续传
+        """
+        return self._aiterate(self.to_sse(stream_id))
+
+    def to_async_websocket(self) -> AsyncIterator[str]:
+        """异步版本的 to_websocket，消息格式与 to_websocket 完全相同"""
+        return self._aiterate(self.to_websocket())
+
+    def _get_stream_stats(self) -> Dict[str, Any]:
+        """获取底层流的统计信息（包含延迟指标）"""
+        if hasattr(self.stream, 'get_stats'):
+            return self.stream.get_stats()
+        return {
+            "total_chunks": getattr(self.stream, 'chunk_count', 0),
+            "total_content_length": len(getattr(self.stream, 'total_content', '')),
+            "provider": getattr(self.stream, 'provider_name', 'unknown')
+        }
+        
+    def to_sse(self, stream_id: Optional[str] = None) -> Generator[str, None, None]:
+        """
+        转换为 Server-Sent Events 格式
+        
+        每个事件都带有单调递增的 id（传入 stream_id 时为 "<stream_id>:<序号>"），
+        客户端断线重连时浏览器会通过 Last-Event-ID 请求头带回最后收到的 id
         
-    def to_sse(self) -> Generator[str, None, None]:
-        """转换为 Server-Sent Events 格式"""
+        Args:
+            stream_id: 流ID，用于断点续传
+        """
+        event_seq = 0
+        
+        def next_event_id() -> str:
+            nonlocal event_seq
+            event_seq += 1
+            return make_event_id(stream_id, event_seq)
+        
+        client_disconnected = False
+        full_content = ""
+        errored = False
         try:
             for chunk in self.stream:
                 # 发送有内容的块
                 if chunk.content or chunk.error:
-                    yield f"data: {chunk.to_json()}\n\n"
+                    yield format_sse_event(chunk.to_json(), next_event_id())
+                full_content += chunk.content
+                errored = errored or bool(chunk.error)
                 
-                # 如果遇到结束标志，发送最终块并结束
+                # 如果遇到结束标志，发送结果块和最终块并结束
                 if chunk.finish_reason is not None:
+                    result_chunk = self._build_result_chunk(full_content)
+                    if result_chunk is not None:
+                        yield format_sse_event(result_chunk.to_json(), next_event_id())
                     final_chunk = ChunkData(
                         chunk_type="finish",
                         finish_reason=chunk.finish_reason,
-                        metadata={
-                            "total_chunks": getattr(self.stream, 'chunk_count', 0),
-                            "total_content_length": len(getattr(self.stream, 'total_content', '')),
-                            "provider": getattr(self.stream, 'provider_name', 'unknown')
-                        }
+                        metadata=self._get_stream_stats()
                     )
-                    yield f"data: {final_chunk.to_json()}\n\n"
+                    yield format_sse_event(final_chunk.to_json(), next_event_id())
                     break
+            else:
+                # 流结束但没有给出 finish_reason
+                result_chunk = None if errored else self._build_result_chunk(full_content)
+                if result_chunk is not None:
+                    yield format_sse_event(result_chunk.to_json(), next_event_id())
             
+        except GeneratorExit:
+            # 客户端断开（生成器被关闭），取消上游生成
+            client_disconnected = True
+            self.close("client_disconnect")
+            raise
         except StopIteration:
             pass
         finally:
-            # 始终发送结束标志
-            yield "data: [DONE]\n\n"
+            # 始终发送结束标志（客户端已断开时无法再发送）
+            if not client_disconnected:
+                yield format_sse_event("[DONE]", next_event_id())
     
     def to_websocket(self) -> Generator[str, None, None]:
         """转换为 WebSocket 格式"""
+        full_content = ""
+        errored = False
         try:
             for chunk in self.stream:
+                full_content += chunk.content
+                errored = errored or bool(chunk.error)
                 if chunk.content or chunk.error or chunk.finish_reason:
                     yield chunk.to_json()
+            
+            result_chunk = None if errored else self._build_result_chunk(full_content)
+            if result_chunk is not None:
+                yield result_chunk.to_json()
                     
+        except GeneratorExit:
+            self.close("client_disconnect")
+            raise
         except StopIteration as e:
             if hasattr(e, 'value') and e.value:
                 yield e.value.to_json()
@@ -232,21 +494,42 @@ class StreamResponse:
             if hasattr(e, 'value') and e.value:
                 final_metadata.update(e.value.metadata)
         
-        return {
+        metrics = getattr(self.stream, 'metrics', None)
+        if metrics is not None:
+            final_metadata['latency'] = metrics.to_dict()
+        
+        response = {
             "success": True,
             "content": full_content,
             "metadata": final_metadata,
             "chunk_count": chunk_count
         }
+        
+        result_chunk = self._build_result_chunk(full_content)
+        if result_chunk is not None:
+            if result_chunk.error:
+                return {**response, "success": False, "error": result_chunk.error}
+            response["result"] = result_chunk.metadata["result"]
+        
+        return response
 
 
-def create_stream_response(provider_stream, provider_name: str) -> StreamResponse:
+def create_stream_response(
+    provider_stream, 
+    provider_name: str,
+    start_time: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    result_builder: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None
+) -> StreamResponse:
     """
     工厂函数：创建统一的流式响应
     
     Args:
         provider_stream: 原始提供商流对象
         provider_name: 提供商名称 ("openai", "gemini", "perplexity", "groq", "ali")
+        start_time: 请求发起时间 (time.time())，用于计算包含建连耗时的首 token 时间
+        max_tokens: 请求的 max_tokens，用于估算取消后节省的输出 token 数
+        result_builder: 流正常结束后由完整内容和 usage 构建最终结果的函数
     
     Returns:
         StreamResponse: 统一的流式响应对象
@@ -257,8 +540,8 @@ def create_stream_response(provider_stream, provider_name: str) -> StreamRespons
     else:
         stream_type = StreamType.REQUESTS
     
-    universal_stream = UniversalStream(provider_stream, stream_type, provider_name)
-    return StreamResponse(universal_stream)
+    universal_stream = UniversalStream(provider_stream, stream_type, provider_name, start_time, max_tokens)
+    return StreamResponse(universal_stream, result_builder=result_builder)
 
 
 # 简单的使用示例和测试
@@ -296,4 +579,6 @@ if __name__ == "__main__":
     print("  - SSE (Server-Sent Events) 格式转换")
     print("  - WebSocket 格式转换")
     print("  - 完整响应收集")
-    print("  - 错误处理和元数据提取")
\ No newline at end of file
+    print("  - 错误处理和元数据提取")
+    print("  - 首 token 时间 / 块间间隔 / 输出速率等延迟指标")
+    print("  - 客户端断开时取消上游生成")
\ No newline at end of file
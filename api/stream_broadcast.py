@@ -0,0 +1,388 @@
+"""
+流式广播模块
+一个上游生成同时广播给多个订阅者：第一个订阅者触发生成，后来的订阅者先回放已生成的内容再跟随实时输出，
+最后一个订阅者离开时释放上游连接。每个共享流的内存占用有上限
+"""
+
+import hashlib
+import json
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.stream import ChunkData, UniversalStream
+
+
+class BroadcastStream:
+    """
+    单个上游流的广播器
+
+    后台线程以上游速度拉取数据块，保存在有界环形缓冲区中；被挤出缓冲区的文本内容
+    合并为一段压缩回放文本（同样有上限），供晚加入或落后的订阅者补齐
+    """
+
+    def __init__(
+        self,
+        upstream_factory: Callable[[], UniversalStream],
+        provider_name: str = "unknown",
+        max_chunks: Optional[int] = None,
+        max_replay_chars: Optional[int] = None,
+        on_release: Optional[Callable[["BroadcastStream"], None]] = None
+    ):
+        """
+        初始化广播器
+
+        Args:
+            upstream_factory: 创建上游 UniversalStream 的函数，在后台线程中调用，
+                因此发起请求不会阻塞订阅者
+            provider_name: 提供商名称
+            max_chunks: 缓冲区最多保留的数据块数，默认读取配置 STREAM_BROADCAST_MAX_CHUNKS
+            max_replay_chars: 压缩回放文本的最大字符数，默认读取配置 STREAM_BROADCAST_MAX_REPLAY_CHARS，
+                超过后新订阅者无法加入，落后的订阅者会收到错误块
+            on_release: 广播器释放（最后一个订阅者离开）时的回调
+        """
+        self.upstream_factory = upstream_factory
+        self.upstream: Optional[UniversalStream] = None
+        self.provider_name = provider_name
+        self.max_chunks = max_chunks or config.STREAM_BROADCAST_MAX_CHUNKS
+        self.max_replay_chars = max_replay_chars or config.STREAM_BROADCAST_MAX_REPLAY_CHARS
+        self.on_release = on_release
+
+        self._chunks: deque = deque()
+        self._base_seq = 0
+        self._compacted: Optional[str] = ""
+        self._subscribers: List["StreamSubscriber"] = []
+        self._total_subscribers = 0
+        self._done = False
+        self._released = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def joinable(self) -> bool:
+        """新订阅者是否还能拿到完整内容"""
+        with self._cond:
+            return not self._released and self._compacted is not None
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._cond:
+            return len(self._subscribers)
+
+    def start(self):
+        """启动后台拉取线程（只启动一次）"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._pump,
+                name=f"broadcast-{self.provider_name}",
+                daemon=True
+            )
+        self._thread.start()
+
+    def _pump(self):
+        """创建上游并拉取数据块写入缓冲区"""
+        try:
+            upstream = self.upstream_factory()
+            with self._cond:
+                self.upstream = upstream
+                released = self._released
+            if released:
+                self._close_upstream()
+                return
+            
+            for chunk in upstream:
+                with self._cond:
+                    if self._released:
+                        return
+                    self._append(chunk)
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._append(ChunkData(
+                    chunk_type="error",
+                    error=str(e),
+                    metadata={"provider": self.provider_name}
+                ))
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def _append(self, chunk: ChunkData):
+        """追加数据块并在超出上限时挤出最旧的块（调用方需持有锁）"""
+        self._chunks.append(chunk)
+        while len(self._chunks) > self.max_chunks:
+            evicted = self._chunks.popleft()
+            self._base_seq += 1
+            if self._compacted is not None:
+                self._compacted += evicted.content
+                if len(self._compacted) > self.max_replay_chars:
+                    self._compacted = None
+
+    def subscribe(self) -> "StreamSubscriber":
+        """
+        添加订阅者，订阅者从头回放已生成的内容后跟随实时输出
+
+        Returns:
+            StreamSubscriber: 订阅者迭代器
+        """
+        with self._cond:
+            if self._released:
+                raise RuntimeError("Broadcast stream has been released")
+            subscriber = StreamSubscriber(self)
+            self._subscribers.append(subscriber)
+            self._total_subscribers += 1
+        self.start()
+        return subscriber
+
+    def _unsubscribe(self, subscriber: "StreamSubscriber"):
+        """移除订阅者，最后一个订阅者离开时释放上游"""
+        with self._cond:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.remove(subscriber)
+            if self._subscribers:
+                return
+            self._released = True
+            upstream_running = not self._done
+            self._chunks.clear()
+            self._compacted = None
+            self._cond.notify_all()
+
+        if upstream_running and self.upstream is not None:
+            self._close_upstream()
+        if self.on_release:
+            self.on_release(self)
+
+    def _close_upstream(self):
+        """关闭上游连接，停止继续生成"""
+        self.upstream.close("no_subscribers")
+
+    def _read(self, subscriber: "StreamSubscriber") -> ChunkData:
+        """为订阅者读取下一个数据块，没有新数据时阻塞等待"""
+        with self._cond:
+            while True:
+                if subscriber._cursor < self._base_seq:
+                    # 订阅者落后于缓冲区，使用压缩回放文本补齐
+                    if self._compacted is None:
+                        subscriber._cursor = self._base_seq
+                        return ChunkData(
+                            chunk_type="error",
+                            error="Subscriber fell too far behind the shared stream",
+                            metadata={"provider": self.provider_name}
+                        )
+                    text = self._compacted[subscriber._char_pos:]
+                    subscriber._cursor = self._base_seq
+                    subscriber._char_pos = len(self._compacted)
+                    if text:
+                        subscriber.replayed_chunks += 1
+                        return ChunkData(content=text, metadata={"replayed": True})
+
+                index = subscriber._cursor - self._base_seq
+                if index < len(self._chunks):
+                    chunk = self._chunks[index]
+                    subscriber._cursor += 1
+                    subscriber._char_pos += len(chunk.content)
+                    return chunk
+
+                if self._done or self._released:
+                    raise StopIteration
+
+                self._cond.wait()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取广播器统计信息"""
+        with self._cond:
+            return {
+                "subscribers": len(self._subscribers),
+                "total_subscribers": self._total_subscribers,
+                "buffered_chunks": len(self._chunks),
+                "evicted_chunks": self._base_seq,
+                "replay_chars": len(self._compacted) if self._compacted is not None else None,
+                "done": self._done
+            }
+
+
+class StreamSubscriber:
+    """
+    广播流的订阅者
+
+    与 UniversalStream 接口兼容，可以直接传给 StreamResponse 使用
+    """
+
+    def __init__(self, broadcast: BroadcastStream):
+        self.broadcast = broadcast
+        self.provider_name = broadcast.provider_name
+        self.finished = False
+        self.total_content = ""
+        self.chunk_count = 0
+        self.replayed_chunks = 0
+        self._cursor = 0
+        self._char_pos = 0
+
+    @property
+    def metrics(self):
+        """共享上游流的延迟指标（上游尚未创建时为 None）"""
+        upstream = self.broadcast.upstream
+        return upstream.metrics if upstream is not None else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> ChunkData:
+        if self.finished:
+            raise StopIteration
+        try:
+            chunk = self.broadcast._read(self)
+        except StopIteration:
+            self.close()
+            raise
+        if chunk.content:
+            self.total_content += chunk.content
+            self.chunk_count += 1
+        return chunk
+
+    def close(self, reason: str = "unsubscribed"):
+        """
+        离开广播，最后一个订阅者离开时释放上游
+
+        Args:
+            reason: 离开原因（仅用于接口兼容，上游以 "no_subscribers" 原因取消）
+        """
+        if self.finished:
+            return
+        self.finished = True
+        self.broadcast._unsubscribe(self)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息，用于 finish 块元数据"""
+        upstream = self.broadcast.upstream
+        stats = upstream.get_stats() if upstream is not None else {"provider": self.provider_name}
+        stats.update({
+            "total_chunks": self.chunk_count,
+            "total_content_length": len(self.total_content),
+            "broadcast": {
+                **self.broadcast.get_stats(),
+                "replayed_chunks": self.replayed_chunks
+            }
+        })
+        return stats
+
+
+class BroadcastHub:
+    """按键管理共享流：相同键的请求共用同一个上游生成"""
+
+    def __init__(
+        self,
+        max_chunks: Optional[int] = None,
+        max_replay_chars: Optional[int] = None
+    ):
+        """
+        初始化广播中心
+
+        Args:
+            max_chunks: 每个共享流缓冲区最多保留的数据块数
+            max_replay_chars: 每个共享流压缩回放文本的最大字符数
+        """
+        self.max_chunks = max_chunks
+        self.max_replay_chars = max_replay_chars
+        self._streams: Dict[str, BroadcastStream] = {}
+        self._lock = threading.Lock()
+        self.upstreams_started = 0
+        self.subscriptions = 0
+
+    def subscribe(
+        self,
+        key: str,
+        upstream_factory: Callable[[], UniversalStream],
+        provider_name: str = "unknown"
+    ) -> StreamSubscriber:
+        """
+        订阅指定键的共享流，不存在（或已无法完整回放）时用工厂函数创建新的上游
+
+        Args:
+            key: 共享键，通常由 make_broadcast_key 生成
+            upstream_factory: 创建上游 UniversalStream 的函数，只在需要新上游时调用
+            provider_name: 提供商名称
+
+        Returns:
+            StreamSubscriber: 订阅者迭代器
+        """
+        with self._lock:
+            self.subscriptions += 1
+            broadcast = self._streams.get(key)
+            if broadcast is not None and broadcast.joinable:
+                try:
+                    return broadcast.subscribe()
+                except RuntimeError:
+                    pass
+
+            broadcast = BroadcastStream(
+                upstream_factory,
+                provider_name=provider_name,
+                max_chunks=self.max_chunks,
+                max_replay_chars=self.max_replay_chars,
+                on_release=lambda released: self._release(key, released)
+            )
+            self._streams[key] = broadcast
+            self.upstreams_started += 1
+            return broadcast.subscribe()
+
+    def _release(self, key: str, broadcast: BroadcastStream):
+        """广播器释放后从中心移除"""
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取广播中心统计信息"""
+        with self._lock:
+            return {
+                "active_streams": len(self._streams),
+                "upstreams_started": self.upstreams_started,
+                "subscriptions": self.subscriptions,
+                "shared_subscriptions": self.subscriptions - self.upstreams_started,
+                "streams": {
+                    key: broadcast.get_stats()
+                    for key, broadcast in self._streams.items()
+                }
+            }
+
+
+def make_broadcast_key(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    **params
+) -> str:
+    """
+    根据请求内容生成共享键，内容完全相同的请求得到相同的键
+
+    Args:
+        provider: 提供商名称
+        model: 模型名称
+        messages: 消息列表
+        **params: 其他影响输出的参数（temperature、max_tokens 等）
+
+    Returns:
+        共享键字符串
+    """
+    canonical = json.dumps(
+        {"provider": provider.lower(), "model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# 进程级广播中心
+broadcast_hub = BroadcastHub()
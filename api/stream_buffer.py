@@ -0,0 +1,288 @@
+"""
+流式缓冲模块
+在提供商流和输出适配器（to_sse / to_websocket）之间加入有界队列：上游在后台线程中全速读取，
+客户端按自己的速度消费；队列满时按策略施加背压或合并/丢弃数据块，尽早释放提供商连接
+
+代价是每个流多占一个常驻线程（异步输出本身已有一个拉取线程），适合慢客户端多、并发不高的场景。
+web_server.py 默认不启用（SERVER_STREAM_BUFFER）。用 loadtest_stream.py 压测（桩服务每流 100 个 token、间隔 0.1s，单核机器）：
+- 不启用：5000 个并发流全部完成
+- 启用：3000 个并发流全部完成；5000 个时进程线程数达到约 5000，1788 个流读取超时；
+  在另一台机器上 2000 个流即已大量失败。启用时并发上限应按约 1500～2000 个流规划
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.stream import ChunkData, UniversalStream
+
+
+# 队列满时的处理策略
+#   block:       阻塞上游读取，直到客户端消费（不丢内容，但慢客户端会占住提供商连接）
+#   coalesce:    把新内容合并到队尾的内容块中（不丢内容，块数不再增长，上游照常全速读取；
+#                队列中的字符数达到 max_chars 后改为阻塞上游，内存占用有上限）
+#   drop_oldest: 丢弃最旧的内容块（会丢内容，适合只关心最新输出的实时预览）
+BUFFER_POLICIES = ("block", "coalesce", "drop_oldest")
+
+
+class BufferedStream:
+    """
+    带有界队列的缓冲流
+
+    与 UniversalStream 接口兼容，可以直接传给 StreamResponse 使用。
+    结束块和错误块不会被合并或丢弃
+    """
+
+    def __init__(
+        self,
+        stream: UniversalStream,
+        max_chunks: Optional[int] = None,
+        policy: Optional[str] = None,
+        max_chars: Optional[int] = None
+    ):
+        """
+        初始化缓冲流
+
+        Args:
+            stream: 上游流（UniversalStream 或接口兼容的流）
+            max_chunks: 队列最多容纳的数据块数，默认读取配置 STREAM_BUFFER_MAX_CHUNKS
+            policy: 队列满时的策略 ("block", "coalesce", "drop_oldest")，
+                默认读取配置 STREAM_BUFFER_POLICY
+            max_chars: 队列中最多容纳的内容字符数（含合并后的块），默认读取配置 STREAM_BUFFER_MAX_CHARS
+        """
+        policy = policy or config.STREAM_BUFFER_POLICY
+        if policy not in BUFFER_POLICIES:
+            raise ValueError(f"Unsupported buffer policy: {policy}")
+
+        self.stream = stream
+        self.provider_name = getattr(stream, 'provider_name', 'unknown')
+        self.max_chunks = max_chunks or config.STREAM_BUFFER_MAX_CHUNKS
+        self.max_chars = max_chars or config.STREAM_BUFFER_MAX_CHARS
+        self.policy = policy
+        self.finished = False
+        self.total_content = ""
+        self.chunk_count = 0
+
+        self._queue: deque = deque()
+        self._queued_chars = 0
+        self._upstream_done = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        self.max_depth = 0
+        self.dropped_chunks = 0
+        self.dropped_chars = 0
+        self.coalesced_chunks = 0
+        self.blocked_time = 0.0
+        self.start_time = time.time()
+        self.upstream_done_time: Optional[float] = None
+
+        # 创建后立即开始读取上游，不等待客户端
+        self._start()
+
+    @property
+    def metrics(self):
+        """上游流的延迟指标"""
+        return getattr(self.stream, 'metrics', None)
+
+    @property
+    def depth(self) -> int:
+        """当前队列深度"""
+        with self._cond:
+            return len(self._queue)
+
+    def _start(self):
+        """启动后台读取线程（只启动一次）"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._pump,
+                name=f"stream-buffer-{self.provider_name}",
+                daemon=True
+            )
+        self._thread.start()
+
+    def _pump(self):
+        """从上游读取数据块写入队列"""
+        try:
+            for chunk in self.stream:
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self._put(ChunkData(
+                chunk_type="error",
+                error=str(e),
+                metadata={"provider": self.provider_name}
+            ))
+        finally:
+            with self._cond:
+                self._upstream_done = True
+                self.upstream_done_time = time.time()
+                self._cond.notify_all()
+
+    def _put(self, chunk: ChunkData) -> bool:
+        """
+        按策略把数据块放入队列
+
+        Returns:
+            缓冲流已关闭时返回 False，上游应停止读取
+        """
+        with self._cond:
+            if self._closed:
+                return False
+
+            if self._is_plain(chunk) and self._chars_full(chunk) and self.policy != "drop_oldest":
+                # 字符数达到上限：不丢内容的策略只能阻塞上游
+                if not self._wait_for_room(chunk):
+                    return False
+
+            if len(self._queue) >= self.max_chunks and self._is_plain(chunk):
+                if self.policy == "block":
+                    if not self._wait_for_room(chunk):
+                        return False
+                elif self.policy == "coalesce" and self._is_plain(self._queue[-1]):
+                    tail = self._queue[-1]
+                    self._queue[-1] = ChunkData(
+                        content=tail.content + chunk.content,
+                        metadata={**tail.metadata, **chunk.metadata}
+                    )
+                    self._queued_chars += len(chunk.content)
+                    self.coalesced_chunks += 1
+                    self._cond.notify_all()
+                    return True
+                elif self.policy == "drop_oldest":
+                    self._drop_oldest()
+
+            if self.policy == "drop_oldest" and self._is_plain(chunk):
+                while self._chars_full(chunk) and self._drop_oldest():
+                    pass
+
+            self._queue.append(chunk)
+            self._queued_chars += len(chunk.content)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+            return True
+
+    def _chars_full(self, chunk: ChunkData) -> bool:
+        """加入该块后队列字符数是否超过上限（队列为空时总能放入，单个超大块不会永远等待）"""
+        return bool(self._queue) and self._queued_chars + len(chunk.content) > self.max_chars
+
+    def _wait_for_room(self, chunk: ChunkData) -> bool:
+        """
+        阻塞到队列块数和字符数都有空间（调用方需持有锁）
+
+        Returns:
+            缓冲流已关闭时返回 False
+        """
+        blocked_at = time.time()
+        while (len(self._queue) >= self.max_chunks or self._chars_full(chunk)) and not self._closed:
+            self._cond.wait()
+        self.blocked_time += time.time() - blocked_at
+        return not self._closed
+
+    @staticmethod
+    def _is_plain(chunk: ChunkData) -> bool:
+        """普通内容块可以被合并或丢弃，结束块和错误块必须保留"""
+        return chunk.finish_reason is None and not chunk.error
+
+    def _drop_oldest(self) -> bool:
+        """
+        丢弃队列中最旧的普通内容块（调用方需持有锁）
+
+        Returns:
+            队列中没有可丢弃的内容块时返回 False
+        """
+        for index, queued in enumerate(self._queue):
+            if self._is_plain(queued):
+                del self._queue[index]
+                self._queued_chars -= len(queued.content)
+                self.dropped_chunks += 1
+                self.dropped_chars += len(queued.content)
+                return True
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> ChunkData:
+        if self.finished:
+            raise StopIteration
+
+        with self._cond:
+            while not self._queue:
+                if self._upstream_done or self._closed:
+                    self.finished = True
+                    raise StopIteration
+                self._cond.wait()
+            chunk = self._queue.popleft()
+            self._queued_chars -= len(chunk.content)
+            self._cond.notify_all()
+
+        if chunk.content:
+            self.total_content += chunk.content
+            self.chunk_count += 1
+        return chunk
+
+    def close(self, reason: str = "cancelled"):
+        """
+        关闭缓冲流，上游仍在读取时取消上游
+
+        Args:
+            reason: 取消原因，如 "client_disconnect"
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self.finished = True
+            upstream_running = not self._upstream_done
+            self._queue.clear()
+            self._queued_chars = 0
+            self._cond.notify_all()
+
+        if upstream_running:
+            close = getattr(self.stream, 'close', None)
+            if close is not None:
+                close(reason)
+
+    def get_buffer_stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "max_chunks": self.max_chunks,
+                "max_chars": self.max_chars,
+                "depth": len(self._queue),
+                "queued_chars": self._queued_chars,
+                "max_depth": self.max_depth,
+                "dropped_chunks": self.dropped_chunks,
+                "dropped_chars": self.dropped_chars,
+                "coalesced_chunks": self.coalesced_chunks,
+                "blocked_time": round(self.blocked_time, 4),
+                "upstream_done": self._upstream_done,
+                "upstream_release_time": (
+                    round(self.upstream_done_time - self.start_time, 4)
+                    if self.upstream_done_time is not None else None
+                )
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息，用于 finish 块元数据"""
+        upstream_stats = getattr(self.stream, 'get_stats', None)
+        stats = upstream_stats() if upstream_stats is not None else {"provider": self.provider_name}
+        stats.update({
+            "total_chunks": self.chunk_count,
+            "total_content_length": len(self.total_content),
+            "buffer": self.get_buffer_stats()
+        })
+        return stats
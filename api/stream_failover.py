@@ -0,0 +1,360 @@
+"""
+流式卡顿看门狗与中途切换模块
+为每个流设置无数据超时和总时限；上游卡顿或出错时，把已输出的文本作为 assistant 消息
+发给备用提供商续写，并把续写内容拼接到同一个客户端流中
+"""
+
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.stream import ChunkData, StreamResponse, UniversalStream, create_stream_response
+from util.token_counter import estimate_tokens
+
+
+# 续写指令：要求模型从上一条 assistant 消息中断处继续
+CONTINUATION_INSTRUCTION = (
+    "Your previous reply was cut off. Continue it exactly from where it stopped. "
+    "Do not repeat any text that was already written and do not add any preamble."
+)
+
+# 续写开头需要缓冲的字符数，用于去掉与已输出内容重复的部分
+OVERLAP_PROBE_CHARS = 80
+
+# 在已输出内容末尾查找重复时的最大窗口
+OVERLAP_WINDOW_CHARS = 200
+
+# 视为重复的最短长度：更短的重合（如 "a" 与 "and"、"1" 与 "10"）多为巧合，不裁剪
+MIN_OVERLAP_CHARS = 8
+
+
+def parse_fallbacks(value: str) -> List[Tuple[str, str]]:
+    """
+    解析备用提供商配置
+
+    Args:
+        value: 形如 "groq:llama-3.1-8b-instant,gemini:gemini-2.5-flash-lite" 的字符串
+
+    Returns:
+        [(provider, model), ...]
+    """
+    fallbacks = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item or ":" not in item:
+            continue
+        provider, model = item.split(":", 1)
+        fallbacks.append((provider.strip(), model.strip()))
+    return fallbacks
+
+
+def _trim_overlap(emitted: str, continuation: str) -> str:
+    """去掉续写开头与已输出内容末尾重复的部分（至少 MIN_OVERLAP_CHARS 个字符，否则原样保留）"""
+    tail = emitted[-OVERLAP_WINDOW_CHARS:]
+    for size in range(min(len(tail), len(continuation)), MIN_OVERLAP_CHARS - 1, -1):
+        if tail.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+
+class _Attempt:
+    """一次上游请求：后台线程建立连接并把数据块放入队列"""
+
+    def __init__(self, llm_client, provider: str, model: str, messages: List[Dict[str, str]], llm_params: Dict[str, Any]):
+        self.provider = provider
+        self.model = model
+        self.queue: "queue.Queue" = queue.Queue()
+        self.upstream: Optional[UniversalStream] = None
+        self.abandoned = False
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._pump,
+            args=(llm_client, messages, llm_params),
+            name=f"failover-{provider}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def _pump(self, llm_client, messages, llm_params):
+        try:
+            raw_stream = llm_client.stream_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=messages,
+                **llm_params
+            )
+            upstream = create_stream_response(
+                raw_stream,
+                self.provider,
+                start_time=self.started_at,
+                max_tokens=llm_params.get("max_tokens")
+            ).stream
+            with self._lock:
+                self.upstream = upstream
+                abandoned = self.abandoned
+            if abandoned:
+                upstream.close("stall")
+                return
+
+            for chunk in upstream:
+                self.queue.put(chunk)
+        except Exception as e:
+            self.queue.put(ChunkData(
+                chunk_type="error",
+                error=str(e),
+                metadata={"provider": self.provider}
+            ))
+        finally:
+            self.queue.put(None)
+
+    def abandon(self, reason: str):
+        """放弃本次请求并关闭上游连接"""
+        with self._lock:
+            self.abandoned = True
+            upstream = self.upstream
+        if upstream is not None:
+            upstream.close(reason)
+
+
+class FailoverStream:
+    """
+    带卡顿看门狗和中途切换的流
+
+    与 UniversalStream 接口兼容，可以直接传给 StreamResponse 使用
+    """
+
+    def __init__(
+        self,
+        llm_client,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        fallbacks: Optional[List[Tuple[str, str]]] = None,
+        inactivity_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        start_time: Optional[float] = None,
+        **llm_params
+    ):
+        """
+        初始化流
+
+        Args:
+            llm_client: LLMClient 实例
+            provider: 主提供商
+            model: 主模型
+            messages: 消息列表
+            fallbacks: 备用 [(provider, model), ...]，默认读取配置 STREAM_FALLBACKS
+            inactivity_timeout: 无数据超时（秒），默认读取配置 STREAM_INACTIVITY_TIMEOUT
+            deadline: 整个流的总时限（秒），默认读取配置 STREAM_TOTAL_DEADLINE
+            start_time: 请求开始时间 (time.time())
+            **llm_params: 传给 stream_llm 的其他参数
+        """
+        self.llm_client = llm_client
+        self.messages = messages
+        self.llm_params = llm_params
+        if fallbacks is None:
+            fallbacks = parse_fallbacks(config.STREAM_FALLBACKS)
+        self.targets = [(provider, model)] + [
+            target for target in fallbacks if target != (provider, model)
+        ]
+        self.inactivity_timeout = inactivity_timeout or config.STREAM_INACTIVITY_TIMEOUT
+        self.deadline = deadline or config.STREAM_TOTAL_DEADLINE
+        self.start_time = start_time if start_time is not None else time.time()
+
+        self.provider_name = provider
+        self.finished = False
+        self.total_content = ""
+        self.chunk_count = 0
+        self.failovers: List[Dict[str, Any]] = []
+        self._target_index = 0
+        self._attempt: Optional[_Attempt] = None
+        self._attempts: List[_Attempt] = []
+        self._pending_overlap: Optional[str] = None
+
+    @property
+    def metrics(self):
+        """当前上游的延迟指标（上游尚未建立时为 None）"""
+        if self._attempt is None or self._attempt.upstream is None:
+            return None
+        return self._attempt.upstream.metrics
+
+    def _start_attempt(self):
+        """向当前目标发起请求，已有输出时改为续写请求（max_tokens 扣除已输出的 token）"""
+        provider, model = self.targets[self._target_index]
+        messages = list(self.messages)
+        llm_params = self.llm_params
+        if self.total_content:
+            messages += [
+                {"role": "assistant", "content": self.total_content},
+                {"role": "user", "content": CONTINUATION_INSTRUCTION}
+            ]
+            self._pending_overlap = ""
+            if llm_params.get("max_tokens"):
+                remaining_tokens = llm_params["max_tokens"] - estimate_tokens(self.total_content)
+                llm_params = {**llm_params, "max_tokens": max(1, remaining_tokens)}
+        self.provider_name = provider
+        self._attempt = _Attempt(self.llm_client, provider, model, messages, llm_params)
+        self._attempts.append(self._attempt)
+
+    def _fail_over(self, reason: str, detail: str) -> bool:
+        """
+        放弃当前上游并切换到下一个备用目标
+
+        Returns:
+            是否还有可用的备用目标
+        """
+        previous = self.targets[self._target_index]
+        self._attempt.abandon(reason)
+        if self._target_index + 1 >= len(self.targets):
+            return False
+
+        self._target_index += 1
+        self.failovers.append({
+            "from": f"{previous[0]}:{previous[1]}",
+            "to": "{}:{}".format(*self.targets[self._target_index]),
+            "reason": reason,
+            "detail": detail,
+            "at_chars": len(self.total_content),
+            "elapsed": round(time.time() - self.start_time, 3)
+        })
+        self._start_attempt()
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> ChunkData:
+        if self.finished:
+            raise StopIteration
+        if self._attempt is None:
+            self._start_attempt()
+
+        while True:
+            remaining = self.deadline - (time.time() - self.start_time)
+            if remaining <= 0:
+                return self._give_up("deadline", f"Stream exceeded total deadline of {self.deadline}s")
+
+            try:
+                chunk = self._attempt.queue.get(timeout=min(self.inactivity_timeout, remaining))
+            except queue.Empty:
+                if remaining <= self.inactivity_timeout:
+                    return self._give_up("deadline", f"Stream exceeded total deadline of {self.deadline}s")
+                detail = f"No data from {self.provider_name} for {self.inactivity_timeout}s"
+                if self._fail_over("stall", detail):
+                    continue
+                return self._give_up("stall", detail)
+
+            if chunk is None:
+                # 上游正常结束但没有给出 finish_reason，先发出尚未发出的续写缓冲
+                self.finished = True
+                if self._pending_overlap:
+                    return self._emit(self._splice(ChunkData(content="", finish_reason="stop")))
+                raise StopIteration
+
+            if chunk.error:
+                if self._fail_over("error", chunk.error):
+                    continue
+                self.finished = True
+                return chunk
+
+            chunk = self._splice(chunk)
+            if chunk is None:
+                continue
+            if chunk.finish_reason is not None:
+                self.finished = True
+            return self._emit(chunk)
+
+    def _splice(self, chunk: ChunkData) -> Optional[ChunkData]:
+        """续写开头先缓冲一小段，去掉与已输出内容重复的部分后再发出"""
+        if self._pending_overlap is None:
+            return chunk
+
+        self._pending_overlap += chunk.content
+        if len(self._pending_overlap) < OVERLAP_PROBE_CHARS and chunk.finish_reason is None:
+            return None
+
+        text = _trim_overlap(self.total_content, self._pending_overlap)
+        self._pending_overlap = None
+        return ChunkData(
+            content=text,
+            finish_reason=chunk.finish_reason,
+            metadata={**chunk.metadata, "failover": self.failovers[-1]}
+        )
+
+    def _emit(self, chunk: ChunkData) -> ChunkData:
+        """记录并返回发给客户端的数据块"""
+        if chunk.content:
+            self.total_content += chunk.content
+            self.chunk_count += 1
+        return chunk
+
+    def _give_up(self, reason: str, detail: str) -> ChunkData:
+        """没有可用备用目标时结束流并返回错误块"""
+        self.finished = True
+        if self._attempt is not None:
+            self._attempt.abandon(reason)
+        return ChunkData(
+            chunk_type="error",
+            error=detail,
+            metadata={"provider": self.provider_name, "reason": reason}
+        )
+
+    def close(self, reason: str = "cancelled"):
+        """取消流并关闭当前上游连接"""
+        if self.finished:
+            return
+        self.finished = True
+        if self._attempt is not None:
+            self._attempt.abandon(reason)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息，用于 finish 块元数据"""
+        metrics = self.metrics
+        return {
+            "total_chunks": self.chunk_count,
+            "total_content_length": len(self.total_content),
+            "provider": self.provider_name,
+            "latency": metrics.to_dict() if metrics is not None else None,
+            "failover": {
+                "attempts": len(self._attempts),
+                "events": list(self.failovers),
+                "inactivity_timeout": self.inactivity_timeout,
+                "deadline": self.deadline
+            }
+        }
+
+
+def create_failover_stream_response(
+    llm_client,
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    fallbacks: Optional[List[Tuple[str, str]]] = None,
+    **llm_params
+) -> StreamResponse:
+    """
+    工厂函数：创建带卡顿看门狗和中途切换的流式响应
+
+    Args:
+        llm_client: LLMClient 实例
+        provider: 主提供商
+        model: 主模型
+        messages: 消息列表
+        fallbacks: 备用 [(provider, model), ...]，默认读取配置 STREAM_FALLBACKS
+        **llm_params: 传给 stream_llm 的其他参数
+
+    Returns:
+        StreamResponse: 统一的流式响应对象
+    """
+    return StreamResponse(FailoverStream(
+        llm_client, provider, model, messages, fallbacks=fallbacks, **llm_params
+    ))
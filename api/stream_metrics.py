@@ -0,0 +1,331 @@
+"""
+流式延迟指标模块
+记录每个流的首 token 时间 (TTFT)、块间间隔分布、总耗时、输出速率和卡顿事件，
+并汇总到进程级指标收集器，便于横向比较各提供商的真实体感延迟
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from util.token_counter import estimate_tokens
+
+
+# 块间间隔直方图的桶上界（毫秒），最后一个桶收集所有更大的间隔
+GAP_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 单个流最多保留的卡顿事件明细条数
+MAX_STALL_EVENTS = 20
+
+
+def _empty_histogram() -> List[int]:
+    """创建空的间隔直方图"""
+    return [0] * (len(GAP_BUCKETS_MS) + 1)
+
+
+def _bucket_index(gap_ms: float) -> int:
+    """返回间隔所在的直方图桶下标"""
+    for i, upper in enumerate(GAP_BUCKETS_MS):
+        if gap_ms <= upper:
+            return i
+    return len(GAP_BUCKETS_MS)
+
+
+def histogram_to_dict(histogram: List[int]) -> Dict[str, int]:
+    """将直方图列表转换为 {"<=10ms": n, ..., ">5000ms": n} 形式"""
+    labels = [f"<={upper}ms" for upper in GAP_BUCKETS_MS] + [f">{GAP_BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, histogram))
+
+
+class StreamMetrics:
+    """单个流的延迟指标"""
+
+    def __init__(
+        self,
+        provider_name: str = "unknown",
+        start_time: Optional[float] = None,
+        stall_threshold: Optional[float] = None,
+        sink: Optional["StreamMetricsSink"] = None,
+        max_tokens: Optional[int] = None
+    ):
+        """
+        初始化流指标
+
+        Args:
+            provider_name: 提供商名称
+            start_time: 请求开始时间 (time.time())，默认取当前时间；
+                传入发起 stream_llm 之前的时间可以把建连耗时计入 TTFT
+            stall_threshold: 判定为卡顿的块间间隔（秒），默认读取配置 STREAM_STALL_THRESHOLD
+            sink: 指标收集器，默认使用进程级的 stream_metrics_sink
+            max_tokens: 请求的 max_tokens，用于估算取消后节省的输出 token 数
+        """
+        self.provider_name = provider_name
+        self.start_time = start_time if start_time is not None else time.time()
+        self.stall_threshold = (
+            stall_threshold if stall_threshold is not None
+            else config.STREAM_STALL_THRESHOLD
+        )
+        self.sink = sink if sink is not None else stream_metrics_sink
+        self.max_tokens = max_tokens
+
+        self.first_token_time: Optional[float] = None
+        self.last_chunk_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.content_chunks = 0
+        self.content_chars = 0
+        self.gap_histogram = _empty_histogram()
+        self.max_gap = 0.0
+        self.stall_count = 0
+        self.stall_events: List[Dict[str, float]] = []
+        self.usage: Optional[Dict[str, Any]] = None
+        self.status = "streaming"
+        self.cancel_reason: Optional[str] = None
+        self._estimated_tokens = 0
+        self._lock = threading.Lock()
+
+    def record_chunk(self, content: str, usage: Optional[Dict[str, Any]] = None):
+        """
+        记录收到的一个数据块
+
+        Args:
+            content: 数据块的文本内容（可以为空）
+            usage: 提供商返回的 usage 信息（如有）
+        """
+        now = time.time()
+        with self._lock:
+            if usage:
+                self.usage = usage
+
+            if not content:
+                return
+
+            if self.first_token_time is None:
+                self.first_token_time = now
+            else:
+                gap = now - self.last_chunk_time
+                self.gap_histogram[_bucket_index(gap * 1000)] += 1
+                self.max_gap = max(self.max_gap, gap)
+                if gap >= self.stall_threshold:
+                    self.stall_count += 1
+                    if len(self.stall_events) < MAX_STALL_EVENTS:
+                        self.stall_events.append({
+                            "at": round(self.last_chunk_time - self.start_time, 3),
+                            "gap": round(gap, 3)
+                        })
+
+            self.last_chunk_time = now
+            self.content_chunks += 1
+            self.content_chars += len(content)
+            self._estimated_tokens += estimate_tokens(content)
+
+    def finish(self, status: str = "completed", reason: Optional[str] = None):
+        """
+        标记流结束并上报到指标收集器（只生效一次）
+
+        Args:
+            status: 结束状态 ("completed", "error", "cancelled" 等)
+            reason: 取消原因（status 为 "cancelled" 时）
+        """
+        with self._lock:
+            if self.end_time is not None:
+                return
+            self.end_time = time.time()
+            self.status = status
+            self.cancel_reason = reason
+
+        if self.sink is not None:
+            self.sink.record(self)
+
+    @property
+    def output_tokens(self) -> int:
+        """输出 token 数：优先使用提供商 usage，否则按内容估算"""
+        if self.usage and self.usage.get("completion_tokens"):
+            return self.usage["completion_tokens"]
+        return self._estimated_tokens
+
+    @property
+    def tokens_saved(self) -> Optional[int]:
+        """
+        取消节省的输出 token 数上限：max_tokens 减去取消前已输出的 token 数，
+        未取消或未设置 max_tokens 时为 None
+        """
+        if self.status != "cancelled" or not self.max_tokens:
+            return None
+        return max(self.max_tokens - self.output_tokens, 0)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """首 token 时间（秒）"""
+        if self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    @property
+    def duration(self) -> float:
+        """总耗时（秒），流未结束时返回当前已耗时间"""
+        end = self.end_time if self.end_time is not None else time.time()
+        return end - self.start_time
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """首 token 之后的输出速率（tokens/s）"""
+        if self.first_token_time is None or self.last_chunk_time is None:
+            return None
+        generation_time = self.last_chunk_time - self.first_token_time
+        if generation_time <= 0:
+            return None
+        return self.output_tokens / generation_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式，用于 finish 块元数据"""
+        ttft = self.ttft
+        tokens_per_second = self.tokens_per_second
+        return {
+            "provider": self.provider_name,
+            "status": self.status,
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "duration": round(self.duration, 4),
+            "output_tokens": self.output_tokens,
+            "output_tokens_source": "usage" if self.usage and self.usage.get("completion_tokens") else "estimated",
+            "tokens_per_second": round(tokens_per_second, 2) if tokens_per_second is not None else None,
+            "content_chunks": self.content_chunks,
+            "max_gap": round(self.max_gap, 4),
+            "gap_histogram": histogram_to_dict(self.gap_histogram),
+            "stall_threshold": self.stall_threshold,
+            "stall_count": self.stall_count,
+            "stall_events": list(self.stall_events),
+            "cancel_reason": self.cancel_reason,
+            "tokens_saved": self.tokens_saved
+        }
+
+
+class _ProviderAggregate:
+    """单个提供商的汇总指标"""
+
+    def __init__(self, sample_size: int):
+        self.streams = 0
+        self.statuses: Dict[str, int] = {}
+        self.output_tokens = 0
+        self.stall_count = 0
+        self.cancelled = 0
+        self.cancelled_by_reason: Dict[str, int] = {}
+        self.tokens_saved = 0
+        self.gap_histogram = _empty_histogram()
+        self.ttft_samples = deque(maxlen=sample_size)
+        self.duration_samples = deque(maxlen=sample_size)
+        self.tps_samples = deque(maxlen=sample_size)
+
+    def add(self, metrics: StreamMetrics):
+        self.streams += 1
+        self.statuses[metrics.status] = self.statuses.get(metrics.status, 0) + 1
+        self.output_tokens += metrics.output_tokens
+        self.stall_count += metrics.stall_count
+        if metrics.status == "cancelled":
+            self.cancelled += 1
+            reason = metrics.cancel_reason or "unknown"
+            self.cancelled_by_reason[reason] = self.cancelled_by_reason.get(reason, 0) + 1
+            self.tokens_saved += metrics.tokens_saved or 0
+        for i, count in enumerate(metrics.gap_histogram):
+            self.gap_histogram[i] += count
+        if metrics.ttft is not None:
+            self.ttft_samples.append(metrics.ttft)
+        self.duration_samples.append(metrics.duration)
+        if metrics.tokens_per_second is not None:
+            self.tps_samples.append(metrics.tokens_per_second)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "statuses": dict(self.statuses),
+            "output_tokens": self.output_tokens,
+            "stall_count": self.stall_count,
+            "cancelled": self.cancelled,
+            "cancelled_by_reason": dict(self.cancelled_by_reason),
+            "tokens_saved": self.tokens_saved,
+            "gap_histogram": histogram_to_dict(self.gap_histogram),
+            "ttft": summarize_samples(self.ttft_samples),
+            "duration": summarize_samples(self.duration_samples),
+            "tokens_per_second": summarize_samples(self.tps_samples)
+        }
+
+
+def summarize_samples(samples) -> Dict[str, Optional[float]]:
+    """计算样本的均值和分位数（供流指标、准入排队和基准测试共用）"""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean": round(sum(ordered) / count, 4),
+        "p50": round(ordered[int(0.50 * (count - 1))], 4),
+        "p95": round(ordered[int(0.95 * (count - 1))], 4),
+        "max": round(ordered[-1], 4)
+    }
+
+
+class StreamMetricsSink:
+    """进程级流指标收集器，按提供商汇总"""
+
+    def __init__(self, sample_size: int = 1000):
+        """
+        初始化收集器
+
+        Args:
+            sample_size: 每个提供商保留用于计算分位数的最近样本数
+        """
+        self.sample_size = sample_size
+        self._providers: Dict[str, _ProviderAggregate] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def record(self, metrics: StreamMetrics):
+        """记录一个已结束的流"""
+        with self._lock:
+            aggregate = self._providers.get(metrics.provider_name)
+            if aggregate is None:
+                aggregate = _ProviderAggregate(self.sample_size)
+                self._providers[metrics.provider_name] = aggregate
+            aggregate.add(metrics)
+            listeners = list(self._listeners)
+
+        if listeners:
+            data = metrics.to_dict()
+            for listener in listeners:
+                try:
+                    listener(data)
+                except Exception as e:
+                    print(f"Stream metrics listener failed: {e}")
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """
+        注册监听器，每个流结束时以 StreamMetrics.to_dict() 的结果回调，
+        可用于转发到外部监控系统
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取各提供商的汇总指标"""
+        with self._lock:
+            return {
+                provider: aggregate.to_dict()
+                for provider, aggregate in self._providers.items()
+            }
+
+    def reset(self):
+        """清空已汇总的指标"""
+        with self._lock:
+            self._providers.clear()
+
+
+# 进程级指标收集器
+stream_metrics_sink = StreamMetricsSink()
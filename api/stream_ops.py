@@ -0,0 +1,462 @@
+"""
+流式变换算子模块
+在数据块到达时就地处理内容（映射、过滤、跨块正则替换、按行切分、旁路收集），
+内存占用只与算子自身的保留窗口有关，不需要等待 collect_full_response
+"""
+
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Iterable, Union, Pattern
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from api.stream import ChunkData, UniversalStream
+
+
+class StreamOperator:
+    """
+    流式算子基类
+
+    process() 接收一个内容块并返回零个或多个输出块；流结束前调用 flush() 输出算子保留的内容。
+    结束块和错误块不经过算子，由 TransformedStream 在 flush 之后原样发送
+    """
+
+    name = "operator"
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        return [chunk]
+
+    def flush(self) -> List[ChunkData]:
+        return []
+
+
+class MapOperator(StreamOperator):
+    """逐块变换文本内容"""
+
+    name = "map"
+
+    def __init__(self, fn: Callable[[str], str]):
+        self.fn = fn
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        return [ChunkData(content=self.fn(chunk.content), metadata=chunk.metadata)]
+
+
+class FilterOperator(StreamOperator):
+    """丢弃不满足条件的内容块"""
+
+    name = "filter"
+
+    def __init__(self, predicate: Callable[[ChunkData], bool]):
+        self.predicate = predicate
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        return [chunk] if self.predicate(chunk) else []
+
+
+class IncrementalReplaceOperator(StreamOperator):
+    """
+    跨块边界的正则替换
+
+    末尾保留 max_match_len 个字符不输出，因此可以匹配被切分到多个块中的文本。
+    要求任何匹配的长度都不超过 max_match_len；保留窗口起点处的后向断言 (lookbehind, ^)
+    看不到已经输出的文本
+    """
+
+    name = "replace"
+
+    def __init__(
+        self,
+        pattern: Union[str, Pattern],
+        repl: Union[str, Callable[[re.Match], str]],
+        max_match_len: int,
+        flags: int = 0
+    ):
+        self.pattern = re.compile(pattern, flags) if isinstance(pattern, str) else pattern
+        self.repl = repl
+        self.max_match_len = max_match_len
+        self.replacements = 0
+        self._buffer = ""
+        self._metadata: Dict[str, Any] = {}
+
+    def _expand(self, match: re.Match) -> str:
+        self.replacements += 1
+        return self.repl(match) if callable(self.repl) else match.expand(self.repl)
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        self._buffer += chunk.content
+        self._metadata = chunk.metadata
+        cut = len(self._buffer) - self.max_match_len
+        if cut <= 0:
+            return []
+
+        # 起点在 cut 之前的匹配不会再因后续输入而改变
+        parts = []
+        pos = 0
+        for match in self.pattern.finditer(self._buffer):
+            if match.start() >= cut:
+                break
+            parts.append(self._buffer[pos:match.start()])
+            parts.append(self._expand(match))
+            pos = match.end()
+
+        emit_to = max(pos, cut)
+        parts.append(self._buffer[pos:emit_to])
+        self._buffer = self._buffer[emit_to:]
+
+        text = "".join(parts)
+        return [ChunkData(content=text, metadata=chunk.metadata)] if text else []
+
+    def flush(self) -> List[ChunkData]:
+        text = self.pattern.sub(self._expand, self._buffer)
+        self._buffer = ""
+        return [ChunkData(content=text, metadata=self._metadata)] if text else []
+
+
+class LineSplitOperator(StreamOperator):
+    """按行重新切分：每个输出块是一整行（含换行符），最后不完整的行在流结束时输出"""
+
+    name = "lines"
+
+    def __init__(self):
+        self._buffer = ""
+        self._metadata: Dict[str, Any] = {}
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        self._buffer += chunk.content
+        self._metadata = chunk.metadata
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        return [ChunkData(content=line + "\n", metadata=chunk.metadata) for line in lines]
+
+    def flush(self) -> List[ChunkData]:
+        text, self._buffer = self._buffer, ""
+        return [ChunkData(content=text, metadata=self._metadata)] if text else []
+
+
+class TeeOperator(StreamOperator):
+    """把经过的内容块旁路交给收集函数，内容本身原样继续向下游传递"""
+
+    name = "tee"
+
+    def __init__(self, collector: Callable[[ChunkData], None]):
+        self.collector = collector
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        self.collector(chunk)
+        return [chunk]
+
+
+class CodeFenceStripOperator(StreamOperator):
+    """
+    去掉 markdown 代码块标记行（```json、``` 等）
+
+    只保留当前行开头尚不能确定是否为标记的几个字符，其余内容立即输出
+    """
+
+    name = "strip_code_fences"
+
+    def __init__(self):
+        self._buffer = ""
+        self._at_line_start = True
+        self._metadata: Dict[str, Any] = {}
+
+    def process(self, chunk: ChunkData) -> List[ChunkData]:
+        self._buffer += chunk.content
+        self._metadata = chunk.metadata
+        parts = []
+
+        while self._buffer:
+            if self._at_line_start:
+                stripped = self._buffer.lstrip(" \t")
+                newline = self._buffer.find("\n")
+                if stripped.startswith("```"):
+                    if newline == -1:
+                        break
+                    # 丢弃整行标记
+                    self._buffer = self._buffer[newline + 1:]
+                    continue
+                if "```".startswith(stripped) and newline == -1:
+                    # 还不能确定本行是否为标记
+                    break
+                self._at_line_start = False
+
+            newline = self._buffer.find("\n")
+            if newline == -1:
+                parts.append(self._buffer)
+                self._buffer = ""
+            else:
+                parts.append(self._buffer[:newline + 1])
+                self._buffer = self._buffer[newline + 1:]
+                self._at_line_start = True
+
+        text = "".join(parts)
+        return [ChunkData(content=text, metadata=chunk.metadata)] if text else []
+
+    def flush(self) -> List[ChunkData]:
+        text, self._buffer = self._buffer, ""
+        if text.lstrip(" \t").startswith("```"):
+            return []
+        return [ChunkData(content=text, metadata=self._metadata)] if text else []
+
+
+def map_content(fn: Callable[[str], str]) -> MapOperator:
+    """逐块变换文本内容"""
+    return MapOperator(fn)
+
+
+def filter_chunks(predicate: Callable[[ChunkData], bool]) -> FilterOperator:
+    """丢弃不满足条件的内容块"""
+    return FilterOperator(predicate)
+
+
+def incremental_replace(
+    pattern: Union[str, Pattern],
+    repl: Union[str, Callable[[re.Match], str]],
+    max_match_len: int,
+    flags: int = 0
+) -> IncrementalReplaceOperator:
+    """
+    跨块边界的正则替换
+
+    Args:
+        pattern: 正则表达式
+        repl: 替换字符串（支持 \\1 等引用）或接收 Match 的函数
+        max_match_len: 匹配的最大长度，同时也是输出延迟的字符数
+        flags: 正则标志
+
+    Returns:
+        IncrementalReplaceOperator
+    """
+    return IncrementalReplaceOperator(pattern, repl, max_match_len, flags)
+
+
+def split_lines() -> LineSplitOperator:
+    """按行重新切分内容块"""
+    return LineSplitOperator()
+
+
+def tee(collector: Callable[[ChunkData], None]) -> TeeOperator:
+    """把经过的内容块旁路交给收集函数"""
+    return TeeOperator(collector)
+
+
+def strip_code_fences() -> CodeFenceStripOperator:
+    """去掉 markdown 代码块标记行"""
+    return CodeFenceStripOperator()
+
+
+# 邮箱和电话号码的匹配模式及最大长度
+EMAIL_PATTERN = r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+EMAIL_MAX_LEN = 100
+PHONE_PATTERN = r"(?<![\w+])\+?\d[\d\s().-]{7,18}\d(?!\w)"
+PHONE_MAX_LEN = 24
+
+
+def redact_pii(
+    email_mask: str = "[EMAIL]",
+    phone_mask: str = "[PHONE]"
+) -> List[StreamOperator]:
+    """
+    屏蔽邮箱和电话号码
+
+    Args:
+        email_mask: 邮箱替换文本
+        phone_mask: 电话号码替换文本
+
+    Returns:
+        算子列表，可以直接传给 StreamResponse.pipe
+    """
+    return [
+        incremental_replace(EMAIL_PATTERN, email_mask, EMAIL_MAX_LEN),
+        incremental_replace(PHONE_PATTERN, phone_mask, PHONE_MAX_LEN)
+    ]
+
+
+_MARKDOWN_INLINE_RULES = [
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),      # 图片
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),       # 链接
+    (re.compile(r"(\*\*|__)(.+?)\1"), r"\2"),            # 粗体
+    (re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\w)"), r"\1"),  # 斜体
+    (re.compile(r"`([^`]+)`"), r"\1"),                   # 行内代码
+]
+_MARKDOWN_LINE_RULES = [
+    (re.compile(r"^\s{0,3}#{1,6}\s+"), ""),              # 标题
+    (re.compile(r"^\s{0,3}>\s?"), ""),                   # 引用
+    (re.compile(r"^(\s*)[-*+]\s+"), r"\1• "),            # 无序列表
+    (re.compile(r"^\s*([-*_]\s*){3,}$"), ""),            # 分隔线
+]
+
+
+def _markdown_line_to_text(line: str) -> str:
+    """把一行 markdown 转换为纯文本"""
+    body = line.rstrip("\n")
+    ending = line[len(body):]
+    for pattern, repl in _MARKDOWN_LINE_RULES:
+        body = pattern.sub(repl, body)
+    for pattern, repl in _MARKDOWN_INLINE_RULES:
+        body = pattern.sub(repl, body)
+    return body + ending
+
+
+def markdown_to_text() -> List[StreamOperator]:
+    """
+    把 markdown 转换为纯文本（按行处理，因此输出以整行为单位）
+
+    Returns:
+        算子列表，可以直接传给 StreamResponse.pipe
+    """
+    return [strip_code_fences(), split_lines(), map_content(_markdown_line_to_text)]
+
+
+def _flatten(operators: Iterable[Union[StreamOperator, Iterable[StreamOperator]]]) -> List[StreamOperator]:
+    """展开嵌套的算子列表"""
+    flat = []
+    for operator in operators:
+        if isinstance(operator, StreamOperator):
+            flat.append(operator)
+        else:
+            flat.extend(_flatten(operator))
+    return flat
+
+
+class TransformedStream:
+    """
+    经过算子链处理的流
+
+    与 UniversalStream 接口兼容，可以直接传给 StreamResponse 使用
+    """
+
+    def __init__(
+        self,
+        stream: UniversalStream,
+        operators: Iterable[Union[StreamOperator, Iterable[StreamOperator]]]
+    ):
+        """
+        初始化变换流
+
+        Args:
+            stream: 上游流（UniversalStream 或接口兼容的流）
+            operators: 算子或算子列表，按顺序应用
+        """
+        self.stream = stream
+        self.operators = _flatten(operators)
+        self.provider_name = getattr(stream, 'provider_name', 'unknown')
+        self.finished = False
+        self.total_content = ""
+        self.chunk_count = 0
+        self._pending: List[ChunkData] = []
+        self._iterator = iter(stream)
+
+    @property
+    def metrics(self):
+        """上游流的延迟指标"""
+        return getattr(self.stream, 'metrics', None)
+
+    def _run(self, chunks: List[ChunkData]) -> List[ChunkData]:
+        """让内容块依次经过所有算子"""
+        for operator in self.operators:
+            outputs = []
+            for chunk in chunks:
+                outputs.extend(operator.process(chunk))
+            chunks = outputs
+        return chunks
+
+    def _flush(self) -> List[ChunkData]:
+        """依次清空各算子保留的内容，清出的内容继续经过后续算子"""
+        outputs: List[ChunkData] = []
+        for operator in self.operators:
+            carried = []
+            for chunk in outputs:
+                carried.extend(operator.process(chunk))
+            outputs = carried + operator.flush()
+        return outputs
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> ChunkData:
+        while not self._pending:
+            if self.finished:
+                raise StopIteration
+
+            try:
+                chunk = next(self._iterator)
+            except StopIteration:
+                self.finished = True
+                self._pending.extend(self._flush())
+                continue
+
+            if chunk.error or chunk.finish_reason is not None:
+                # 先处理结束块自带的内容，再清空算子，最后发送不含内容的结束块或错误块
+                if chunk.content:
+                    self._pending.extend(self._run([ChunkData(content=chunk.content, metadata=chunk.metadata)]))
+                self._pending.extend(self._flush())
+                self._pending.append(ChunkData(
+                    chunk_type=chunk.type,
+                    finish_reason=chunk.finish_reason,
+                    metadata=chunk.metadata,
+                    error=chunk.error
+                ))
+                self.finished = True
+            elif chunk.content:
+                self._pending.extend(self._run([chunk]))
+            elif chunk.metadata:
+                # 只带元数据（如 usage）的块不经过算子
+                self._pending.append(chunk)
+
+        chunk = self._pending.pop(0)
+        if chunk.content:
+            self.total_content += chunk.content
+            self.chunk_count += 1
+        return chunk
+
+    def close(self, reason: str = "cancelled"):
+        """取消上游流"""
+        self.finished = True
+        self._pending.clear()
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            close(reason)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息，用于 finish 块元数据"""
+        upstream_stats = getattr(self.stream, 'get_stats', None)
+        stats = upstream_stats() if upstream_stats is not None else {"provider": self.provider_name}
+        stats.update({
+            "total_chunks": self.chunk_count,
+            "total_content_length": len(self.total_content),
+            "operators": [operator.name for operator in self.operators]
+        })
+        return stats
+
+
+if __name__ == "__main__":
+    print("🔧 流式变换算子模块")
+    print("=" * 50)
+
+    class _DemoStream:
+        """按固定长度切分文本的模拟流"""
+
+        def __init__(self, text: str, size: int = 5):
+            self.provider_name = "demo"
+            self._chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+        def __iter__(self):
+            return self
+
+        def __next__(self) -> ChunkData:
+            if not self._chunks:
+                raise StopIteration
+            content = self._chunks.pop(0)
+            return ChunkData(content=content, finish_reason="stop" if not self._chunks else None)
+
+    sample = "```markdown\n## 联系方式\n- **邮箱**: hr.team@example.com\n- 电话: +86 138 0013 8000\n```\n"
+    stream = TransformedStream(_DemoStream(sample), [redact_pii(), markdown_to_text()])
+    for chunk in stream:
+        if chunk.content:
+            print(f"📦 {chunk.content!r}")
+    print(f"✅ 结果:\n{stream.total_content}")
@@ -0,0 +1,355 @@
+"""
+可续传 SSE 流模块
+后台线程把 SSE 事件写入按流ID索引的有界环形缓冲区，客户端断线后凭 Last-Event-ID
+从断点继续接收，不需要再次调用提供商
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Iterable, Generator, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.stream import format_sse_event, make_event_id
+
+
+# 等待新事件时发送 SSE 注释保活的间隔（秒），防止代理断开空闲连接
+KEEPALIVE_INTERVAL = 15.0
+
+# 后台清理线程的检查间隔上限（秒）；宽限期更短时按宽限期的一半检查
+REAPER_INTERVAL = 1.0
+
+
+def parse_last_event_id(last_event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    解析 Last-Event-ID
+
+    Args:
+        last_event_id: 形如 "<stream_id>:<序号>" 的事件 id
+
+    Returns:
+        (stream_id, 序号)，格式不正确时返回 None
+    """
+    if not last_event_id or ":" not in last_event_id:
+        return None
+    stream_id, _, seq = last_event_id.strip().rpartition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+def _parse_event_seq(event: str) -> Optional[int]:
+    """从 SSE 事件文本的 id 行中取出序号"""
+    if not event.startswith("id: "):
+        return None
+    id_line = event.split("\n", 1)[0][4:]
+    seq = id_line.rpartition(":")[2]
+    return int(seq) if seq.isdigit() else None
+
+
+class _ReplayEntry:
+    """单个流的事件环形缓冲区"""
+
+    def __init__(self, stream_id: str, max_events: int):
+        self.stream_id = stream_id
+        self.events: deque = deque(maxlen=max_events)
+        self.last_seq = 0
+        self.done = False
+        self.followers = 0
+        self.cancelled = False
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # 没有客户端跟随的起始时间，有客户端跟随时为 None
+        self.orphaned_since: Optional[float] = self.created_at
+        # 取消上游的回调（见 SSEReplayStore.register_cancel）
+        self.cancel_callback: Optional[Callable[[str], None]] = None
+        self.cond = threading.Condition()
+
+    @property
+    def first_seq(self) -> int:
+        """缓冲区中最早事件的序号（缓冲区为空时为下一个序号）"""
+        return self.events[0][0] if self.events else self.last_seq + 1
+
+    def events_after(self, seq: int) -> list:
+        """返回序号大于 seq 的事件（调用方需持有锁，序号在缓冲区内连续）"""
+        start = max(0, seq + 1 - self.first_seq)
+        return list(islice(self.events, start, None))
+
+    def append(self, seq: int, event: str):
+        with self.cond:
+            self.events.append((seq, event))
+            self.last_seq = seq
+            self.cond.notify_all()
+
+    def orphaned_for(self) -> float:
+        """没有客户端跟随的持续时间（秒）"""
+        with self.cond:
+            if self.orphaned_since is None:
+                return 0.0
+            return time.time() - self.orphaned_since
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.last_access = time.time()
+            self.cond.notify_all()
+
+
+class SSEReplayStore:
+    """按流ID保存最近 SSE 事件的有界存储"""
+
+    def __init__(
+        self,
+        max_streams: Optional[int] = None,
+        max_events: Optional[int] = None,
+        ttl: Optional[float] = None,
+        grace: Optional[float] = None
+    ):
+        """
+        初始化存储
+
+        Args:
+            max_streams: 最多保留的流数量，默认读取配置 STREAM_RESUME_MAX_STREAMS
+            max_events: 每个流最多保留的事件数，默认读取配置 STREAM_RESUME_MAX_EVENTS
+            ttl: 流结束后保留的秒数，默认读取配置 STREAM_RESUME_TTL
+            grace: 所有客户端断开后等待重连的秒数，超时仍无人重连则取消上游生成，
+                默认读取配置 STREAM_RESUME_GRACE
+        """
+        self.max_streams = max_streams or config.STREAM_RESUME_MAX_STREAMS
+        self.max_events = max_events or config.STREAM_RESUME_MAX_EVENTS
+        self.ttl = ttl if ttl is not None else config.STREAM_RESUME_TTL
+        self.grace = grace if grace is not None else config.STREAM_RESUME_GRACE
+        self._entries: "OrderedDict[str, _ReplayEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.streams_started = 0
+        self.resumes = 0
+        self.cancelled = 0
+
+    def start(
+        self,
+        event_source: Callable[[str], Iterable[str]],
+        stream_id: Optional[str] = None
+    ) -> str:
+        """
+        在后台线程中生成 SSE 事件并写入存储
+
+        客户端断开不会立即中断生成，之后可以凭 Last-Event-ID 续传；
+        超过 grace 秒无人重连时由后台清理线程取消：调用 register_cancel 登记的回调关闭上游，
+        并在下一个事件到达时关闭事件源（上游停滞、没有新事件时也会按时取消）
+
+        Args:
+            event_source: 接收 stream_id、返回 SSE 事件迭代器的函数，
+                通常是 lambda sid: stream_response.to_sse(sid)
+            stream_id: 指定流ID，默认自动生成
+
+        Returns:
+            流ID
+        """
+        stream_id = stream_id or uuid.uuid4().hex
+        entry = _ReplayEntry(stream_id, self.max_events)
+
+        with self._lock:
+            self._purge_locked()
+            self._entries[stream_id] = entry
+            self.streams_started += 1
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="sse-replay-reaper", daemon=True)
+                self._reaper.start()
+
+        thread = threading.Thread(
+            target=self._pump,
+            args=(entry, event_source),
+            name=f"sse-replay-{stream_id[:8]}",
+            daemon=True
+        )
+        thread.start()
+        return stream_id
+
+    def _pump(self, entry: _ReplayEntry, event_source: Callable[[str], Iterable[str]]):
+        """把事件源的输出写入缓冲区"""
+        seq = 0
+        events = iter(event_source(entry.stream_id))
+        try:
+            for event in events:
+                parsed = _parse_event_seq(event)
+                seq = parsed if parsed is not None else seq + 1
+                entry.append(seq, event)
+                
+                if self._cancel_if_orphaned(entry):
+                    # 客户端已离开且未在宽限期内重连，放弃剩余生成
+                    break
+        except Exception as e:
+            error_data = json.dumps({
+                "error": f"服务器错误: {str(e)}",
+                "type": "error"
+            }, ensure_ascii=False)
+            seq += 1
+            entry.append(seq, format_sse_event(error_data, make_event_id(entry.stream_id, seq)))
+            seq += 1
+            entry.append(seq, format_sse_event("[DONE]", make_event_id(entry.stream_id, seq)))
+        finally:
+            # 关闭事件源生成器，触发 to_sse 的断开处理以关闭提供商连接
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+            entry.finish()
+
+    def register_cancel(self, stream_id: str, callback: Callable[[str], None]):
+        """
+        登记取消上游的回调，宽限期内无人重连时以取消原因调用（在清理线程中）
+
+        Args:
+            stream_id: 流ID
+            callback: 通常是 stream_response.close
+        """
+        with self._lock:
+            entry = self._entries.get(stream_id)
+        if entry is None:
+            return
+        with entry.cond:
+            entry.cancel_callback = callback
+
+    def _cancel_if_orphaned(self, entry: _ReplayEntry) -> bool:
+        """无人跟随超过宽限期时取消流（只取消一次），返回流是否已被取消"""
+        with entry.cond:
+            if entry.cancelled:
+                return True
+            if entry.done or entry.orphaned_since is None or time.time() - entry.orphaned_since <= self.grace:
+                return False
+            entry.cancelled = True
+            callback = entry.cancel_callback
+        with self._lock:
+            self.cancelled += 1
+        if callback is not None:
+            try:
+                callback("orphaned")
+            except Exception as e:
+                print(f"SSE replay cancel callback failed: {e}")
+        return True
+
+    def _reap(self):
+        """后台清理线程：按时取消超过宽限期的无人跟随流，清理过期的流"""
+        interval = max(0.05, min(REAPER_INTERVAL, self.grace / 2))
+        while not self._stopped.wait(interval):
+            with self._lock:
+                self._purge_locked()
+                entries = list(self._entries.values())
+            for entry in entries:
+                self._cancel_if_orphaned(entry)
+
+    def close(self):
+        """停止后台清理线程"""
+        self._stopped.set()
+
+    def _purge_locked(self):
+        """清理过期的流并把数量控制在上限内，仍在生成或有客户端跟随的流不淘汰（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            stream_id for stream_id, entry in self._entries.items()
+            if entry.done and entry.followers == 0 and now - entry.last_access > self.ttl
+        ]
+        for stream_id in expired:
+            del self._entries[stream_id]
+
+        # 超出上限时按创建顺序淘汰已结束的流；全部仍在生成时暂时超出上限（数量受服务并发上限约束）
+        evictable = [
+            stream_id for stream_id, entry in self._entries.items()
+            if entry.done and entry.followers == 0
+        ]
+        for stream_id in evictable[:max(0, len(self._entries) - self.max_streams + 1)]:
+            del self._entries[stream_id]
+
+    def can_resume(self, stream_id: str, last_seq: int) -> bool:
+        """
+        判断是否可以从指定序号之后续传
+
+        Args:
+            stream_id: 流ID
+            last_seq: 客户端最后收到的事件序号
+
+        Returns:
+            所需事件仍在缓冲区内时返回 True
+        """
+        with self._lock:
+            entry = self._entries.get(stream_id)
+        if entry is None:
+            return False
+        with entry.cond:
+            return entry.first_seq <= last_seq + 1 and last_seq <= entry.last_seq
+
+    def follow(self, stream_id: str, last_seq: int = 0) -> Generator[str, None, None]:
+        """
+        从指定序号之后读取事件，追上后继续跟随实时输出直到流结束
+
+        Args:
+            stream_id: 流ID
+            last_seq: 客户端最后收到的事件序号，0 表示从头读取
+
+        Yields:
+            SSE 事件文本
+        """
+        with self._lock:
+            entry = self._entries.get(stream_id)
+            if entry is None:
+                return
+            self._entries.move_to_end(stream_id)
+            if last_seq > 0:
+                self.resumes += 1
+
+        with entry.cond:
+            entry.followers += 1
+            entry.orphaned_since = None
+        try:
+            cursor = last_seq
+            while True:
+                with entry.cond:
+                    pending = entry.events_after(cursor)
+                    if not pending and not entry.done:
+                        entry.cond.wait(timeout=KEEPALIVE_INTERVAL)
+                        pending = entry.events_after(cursor)
+                    done = entry.done
+                    entry.last_access = time.time()
+
+                if not pending:
+                    if done:
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+
+                for seq, event in pending:
+                    yield event
+                    cursor = seq
+        finally:
+            with entry.cond:
+                entry.followers -= 1
+                entry.last_access = time.time()
+                if entry.followers == 0:
+                    entry.orphaned_since = entry.last_access
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        with self._lock:
+            entries = list(self._entries.values())
+            return {
+                "streams": len(entries),
+                "active_streams": sum(1 for entry in entries if not entry.done),
+                "buffered_events": sum(len(entry.events) for entry in entries),
+                "streams_started": self.streams_started,
+                "resumes": self.resumes,
+                "cancelled": self.cancelled
+            }
+
+
+# 进程级 SSE 续传存储
+sse_replay_store = SSEReplayStore()
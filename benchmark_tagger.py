@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+标签器输出模式基准测试
+对同一批查询分别用 JSON 输出模式和紧凑输出模式（5 位 0/1）调用 CandidateTagger，
+比较输出 token 数、延迟、两种模式结果的一致率，以及紧凑模式退回 JSON 的次数
+
+使用方法:
+    python benchmark_tagger.py --provider gemini --model gemini-2.5-flash-lite
+    python benchmark_tagger.py --provider openai --model gpt-4.1-nano --file queries.txt --limit 200
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from api.llm import LLMClient
+from api.stream_metrics import summarize_samples
+from function.candidate_tagger import CandidateTagger
+
+
+# 未指定 --file 时使用的查询
+SAMPLE_QUERIES = [
+    "We are looking for a backend engineer for our financial department. We hope this candidate have more than 5 years",
+    "Looking for Python developers in New York with machine learning experience",
+    "Senior product manager, fintech, remote",
+    "3-5年Java开发经验，上海，熟悉Spring Boot",
+    "Head of Sales for a SaaS startup in London",
+    "Data scientist with PhD, NLP and PyTorch",
+    "Registered nurse, night shifts, Chicago hospital",
+    "10+ years in semiconductor design, Verilog, Austin TX",
+    "实习生 市场营销 北京",
+    "Looking for someone great to join our team",
+]
+
+
+def load_queries(file_path: str, limit: int) -> List[str]:
+    """读取查询文件（每行一条），未指定文件时使用内置样例"""
+    if file_path:
+        queries = [line.strip() for line in Path(file_path).read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        queries = list(SAMPLE_QUERIES)
+    return queries[:limit] if limit else queries
+
+
+def run_mode(tagger: CandidateTagger, queries: List[str]) -> List[Dict[str, Any]]:
+    """逐条调用（串行，避免并发影响延迟测量），记录耗时"""
+    runs = []
+    for query in queries:
+        start = time.time()
+        result = tagger.analyze_text(query)
+        result["latency"] = time.time() - start
+        runs.append(result)
+    return runs
+
+
+def summarize_mode(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    succeeded = [run for run in runs if run.get("success") and run.get("result")]
+    completion_tokens = [
+        run["usage"]["completion_tokens"] for run in succeeded
+        if isinstance(run.get("usage"), dict) and run["usage"].get("completion_tokens") is not None
+    ]
+    return {
+        "succeeded": len(succeeded),
+        "total": len(runs),
+        "output_tokens": summarize_samples(completion_tokens),
+        "latency": summarize_samples([run["latency"] for run in runs]),
+        "fallbacks": sum(1 for run in runs if run.get("output_mode") == "json_fallback")
+    }
+
+
+def agreement(json_runs: List[Dict[str, Any]], bitmask_runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """两种模式都成功的查询中，五个维度完全一致的比例和逐维度一致的比例"""
+    compared = 0
+    exact = 0
+    dimensions = 0
+    for json_run, bitmask_run in zip(json_runs, bitmask_runs):
+        if not (json_run.get("result") and bitmask_run.get("result")):
+            continue
+        json_bits = [item["containsCriteria"] for item in json_run["result"]["result"]]
+        bitmask_bits = [item["containsCriteria"] for item in bitmask_run["result"]["result"]]
+        compared += 1
+        exact += json_bits == bitmask_bits
+        dimensions += sum(a == b for a, b in zip(json_bits, bitmask_bits))
+    return {
+        "compared": compared,
+        "exact": exact / compared if compared else None,
+        "per_dimension": dimensions / (compared * 5) if compared else None
+    }
+
+
+def _fmt(value, unit: str = "") -> str:
+    return "-" if value is None else f"{value:.3f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标签器 JSON / 紧凑输出模式基准测试")
+    parser.add_argument("--provider", default="gemini")
+    parser.add_argument("--model", default="gemini-2.5-flash-lite")
+    parser.add_argument("--file", default="", help="查询文件，每行一条；默认使用内置样例")
+    parser.add_argument("--limit", type=int, default=0, help="最多测试的查询数")
+    args = parser.parse_args()
+
+    queries = load_queries(args.file, args.limit)
+    client = LLMClient()
+    taggers = {
+        mode: CandidateTagger(model=args.model, provider=args.provider, llm_client=client, output_mode=mode)
+        for mode in ("json", "bitmask")
+    }
+
+    print(f"🧪 {len(queries)} 条查询，{args.provider}/{args.model}")
+    runs = {}
+    summaries = {}
+    for mode, tagger in taggers.items():
+        print(f"⏳ {mode} 模式...")
+        runs[mode] = run_mode(tagger, queries)
+        summaries[mode] = summarize_mode(runs[mode])
+
+    print("=" * 72)
+    print(f"{'模式':<10}{'成功':>8}{'输出token均值':>16}{'延迟p50':>12}{'延迟p95':>12}{'退回JSON':>12}")
+    for mode, summary in summaries.items():
+        print(
+            f"{mode:<10}{summary['succeeded']:>6}/{summary['total']:<2}"
+            f"{_fmt(summary['output_tokens']['mean']):>14}"
+            f"{_fmt(summary['latency']['p50'], 's'):>12}"
+            f"{_fmt(summary['latency']['p95'], 's'):>12}"
+            f"{summary['fallbacks']:>12}"
+        )
+
+    json_tokens = summaries["json"]["output_tokens"]["mean"]
+    bitmask_tokens = summaries["bitmask"]["output_tokens"]["mean"]
+    if json_tokens and bitmask_tokens:
+        print(f"📉 输出 token 减少 {(1 - bitmask_tokens / json_tokens) * 100:.1f}%")
+    json_p50 = summaries["json"]["latency"]["p50"]
+    bitmask_p50 = summaries["bitmask"]["latency"]["p50"]
+    if json_p50 and bitmask_p50:
+        print(f"⏱️ 延迟 p50 降低 {(1 - bitmask_p50 / json_p50) * 100:.1f}%")
+
+    match = agreement(runs["json"], runs["bitmask"])
+    print(f"🎯 结果一致率（{match['compared']} 条）: 完全一致 {_fmt(match['exact'])}，逐维度 {_fmt(match['per_dimension'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,6 +55,97 @@ class Config:
         self.REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
         self.MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
         self.RETRY_DELAY = float(os.getenv("RETRY_DELAY", "1.0"))
+        self.HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+        self.HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "1000"))
+        
+        # 本地桩服务配置（OpenAI 兼容，用于压测）
+        self.STUB_API_BASE = os.getenv("STUB_API_BASE", "http://127.0.0.1:8900/v1")
+        
+        # 提供商速率限制（每分钟请求数，0 表示不限速），批量调用按此平滑发送
+        self.OPENAI_RATE_LIMIT_RPM = float(os.getenv("OPENAI_RATE_LIMIT_RPM", "0"))
+        self.PERPLEXITY_RATE_LIMIT_RPM = float(os.getenv("PERPLEXITY_RATE_LIMIT_RPM", "0"))
+        self.GROQ_RATE_LIMIT_RPM = float(os.getenv("GROQ_RATE_LIMIT_RPM", "0"))
+        self.ALI_RATE_LIMIT_RPM = float(os.getenv("ALI_RATE_LIMIT_RPM", "0"))
+        self.GEMINI_RATE_LIMIT_RPM = float(os.getenv("GEMINI_RATE_LIMIT_RPM", "0"))
+        self.STUB_RATE_LIMIT_RPM = float(os.getenv("STUB_RATE_LIMIT_RPM", "0"))
+        
+        # 标签批量分析配置
+        self.TAGGER_BATCH_MAX_WORKERS = int(os.getenv("TAGGER_BATCH_MAX_WORKERS", "8"))
+        self.TAGGER_PACK_SIZE = int(os.getenv("TAGGER_PACK_SIZE", "20"))
+        self.RULE_TAGGER_ENABLED = os.getenv("RULE_TAGGER_ENABLED", "True").lower() == "true"
+        self.RULE_TAGGER_CONFIDENCE = float(os.getenv("RULE_TAGGER_CONFIDENCE", "0.9"))
+        self.RULE_TAGGER_MAX_CHARS = int(os.getenv("RULE_TAGGER_MAX_CHARS", "200"))
+        self.LOCAL_TAGGER_MODEL_PATH = os.getenv("LOCAL_TAGGER_MODEL_PATH", "model/candidate_tagger_local.npz")
+        self.LOCAL_TAGGER_TARGET_PRECISION = float(os.getenv("LOCAL_TAGGER_TARGET_PRECISION", "0.97"))
+        self.LOCAL_TAGGER_FALLBACK_PROVIDER = os.getenv("LOCAL_TAGGER_FALLBACK_PROVIDER", "openai")
+        self.LOCAL_TAGGER_FALLBACK_MODEL = os.getenv("LOCAL_TAGGER_FALLBACK_MODEL", "")
+        self.TYPEAHEAD_DEBOUNCE = float(os.getenv("TYPEAHEAD_DEBOUNCE", "0.3"))
+        self.TYPEAHEAD_CACHE_SIZE = int(os.getenv("TYPEAHEAD_CACHE_SIZE", "256"))
+        
+        # 流式配置
+        self.STREAM_STALL_THRESHOLD = float(os.getenv("STREAM_STALL_THRESHOLD", "2.0"))
+        self.STREAM_BROADCAST_MAX_CHUNKS = int(os.getenv("STREAM_BROADCAST_MAX_CHUNKS", "2000"))
+        self.STREAM_BROADCAST_MAX_REPLAY_CHARS = int(os.getenv("STREAM_BROADCAST_MAX_REPLAY_CHARS", "200000"))
+        self.STREAM_RESUME_MAX_STREAMS = int(os.getenv("STREAM_RESUME_MAX_STREAMS", "200"))
+        self.STREAM_RESUME_MAX_EVENTS = int(os.getenv("STREAM_RESUME_MAX_EVENTS", "5000"))
+        self.STREAM_RESUME_TTL = float(os.getenv("STREAM_RESUME_TTL", "300"))
+        self.STREAM_RESUME_GRACE = float(os.getenv("STREAM_RESUME_GRACE", "10"))
+        self.STREAM_INACTIVITY_TIMEOUT = float(os.getenv("STREAM_INACTIVITY_TIMEOUT", "15"))
+        self.STREAM_TOTAL_DEADLINE = float(os.getenv("STREAM_TOTAL_DEADLINE", "120"))
+        self.STREAM_FALLBACKS = os.getenv("STREAM_FALLBACKS", "groq:llama-3.1-8b-instant,gemini:gemini-2.5-flash-lite")
+        self.STREAM_BUFFER_MAX_CHUNKS = int(os.getenv("STREAM_BUFFER_MAX_CHUNKS", "1000"))
+        self.STREAM_BUFFER_POLICY = os.getenv("STREAM_BUFFER_POLICY", "coalesce")
+        self.STREAM_BUFFER_MAX_CHARS = int(os.getenv("STREAM_BUFFER_MAX_CHARS", "262144"))
+        
+        # 服务配置
+        self.SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+        self.SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+        self.SERVER_MAX_CONCURRENT_STREAMS = int(os.getenv("SERVER_MAX_CONCURRENT_STREAMS", "5000"))
+        self.SERVER_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+        self.SERVER_FAILOVER = os.getenv("SERVER_FAILOVER", "False").lower() == "true"
+        self.SERVER_STREAM_BUFFER = os.getenv("SERVER_STREAM_BUFFER", "False").lower() == "true"
+        self.BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+        self.BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+        self.BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+        self.WS_MAX_STREAMS_PER_CONNECTION = int(os.getenv("WS_MAX_STREAMS_PER_CONNECTION", "100"))
+        
+        # 准入控制配置（优先级通道：interactive > batch > background）
+        self.ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "5000"))
+        self.ADMISSION_INTERACTIVE_RESERVED = int(os.getenv("ADMISSION_INTERACTIVE_RESERVED", "500"))
+        self.ADMISSION_INTERACTIVE_QUEUE = int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "1000"))
+        self.ADMISSION_BATCH_QUEUE = int(os.getenv("ADMISSION_BATCH_QUEUE", "2000"))
+        self.ADMISSION_BACKGROUND_QUEUE = int(os.getenv("ADMISSION_BACKGROUND_QUEUE", "2000"))
+        self.ADMISSION_INTERACTIVE_DEADLINE = float(os.getenv("ADMISSION_INTERACTIVE_DEADLINE", "5"))
+        self.ADMISSION_BATCH_DEADLINE = float(os.getenv("ADMISSION_BATCH_DEADLINE", "120"))
+        self.ADMISSION_BACKGROUND_DEADLINE = float(os.getenv("ADMISSION_BACKGROUND_DEADLINE", "600"))
+        
+        # 响应缓存配置（低温度提取调用按 ETag 缓存）
+        self.RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+        self.RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+        self.RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+        self.RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+        self.RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "3600"))
+        
+        # 近似重复输入缓存配置（NEAR_DUPLICATE_FUNCTIONS 为启用的提取器，逗号分隔，如 "candidate_tagger,job_parser"）
+        self.NEAR_DUPLICATE_FUNCTIONS = os.getenv("NEAR_DUPLICATE_FUNCTIONS", "")
+        self.NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+        self.NEAR_DUPLICATE_NUM_PERM = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "64"))
+        self.NEAR_DUPLICATE_BANDS = int(os.getenv("NEAR_DUPLICATE_BANDS", "16"))
+        self.NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "10000"))
+        self.NEAR_DUPLICATE_TTL = float(os.getenv("NEAR_DUPLICATE_TTL", "86400"))
+        # 职位描述批量解析与去重配置（回填前聚类近似重复的输入，只有每个簇的代表调用 LLM）
+        self.JOB_PARSER_BATCH_MAX_WORKERS = int(os.getenv("JOB_PARSER_BATCH_MAX_WORKERS", "8"))
+        # 与代表的 Jaccard 相似度阈值（规范化后的 3 词片段）：0.9 约相当于 300 词的职位描述中最多 5 处单词改动，
+        # 改动落在代表抽取出的值上（如公司、地点）时成员仍会单独解析
+        self.BATCH_DEDUP_THRESHOLD = float(os.getenv("BATCH_DEDUP_THRESHOLD", "0.9"))
+        self.BATCH_DEDUP_SPILL_AFTER = int(os.getenv("BATCH_DEDUP_SPILL_AFTER", "100000"))
+        
+        # 职位描述样板剥离配置（BOILERPLATE_FUNCTIONS 为 HTTP 服务中启用的提取器，逗号分隔，如 "job_parser,job_analyzer"）
+        self.BOILERPLATE_FUNCTIONS = os.getenv("BOILERPLATE_FUNCTIONS", "")
+        self.BOILERPLATE_CATEGORIES = os.getenv("BOILERPLATE_CATEGORIES", "eeo,legal,privacy,apply,benefits")
+        self.BOILERPLATE_FINGERPRINTS_PATH = os.getenv("BOILERPLATE_FINGERPRINTS_PATH", "model/boilerplate_fingerprints.json")
+        self.BOILERPLATE_MIN_DOCUMENTS = int(os.getenv("BOILERPLATE_MIN_DOCUMENTS", "5"))
+        self.BOILERPLATE_MIN_CHARS = int(os.getenv("BOILERPLATE_MIN_CHARS", "80"))
         
         # 日志配置
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -7,7 +7,7 @@
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Generator
 import time
 import re
 
@@ -16,25 +16,43 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from api.llm import LLMClient
+from api.stream import create_stream_response
+from api.response_cache import prompt_version
+from util.batch_dedup import fits_member
+from util.near_duplicate import NearDuplicateCache
+from util.streaming_json import IncrementalJSONParser
 
 
 class CandidateParser:
     """候选人描述解析器"""
     
-    def __init__(self, model: str = "gemini-2.5-flash-lite", provider: str = "gemini"):
+    def __init__(
+        self,
+        model: str = "gemini-2.5-flash-lite",
+        provider: str = "gemini",
+        llm_client: Optional[LLMClient] = None,
+        near_duplicate_cache: Optional[NearDuplicateCache] = None
+    ):
         """
         初始化解析器
         
         Args:
             model: LLM模型名称
             provider: LLM提供商
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
+            near_duplicate_cache: 近似重复输入缓存（见 util/near_duplicate.py）；设置后规范化后相近的输入直接返回缓存结果，
+                metadata 另含 "near_duplicate": {"score": 相似度}
         """
         self.model = model
         self.provider = provider
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or LLMClient()
         
         # 读取提示词模板
         self.prompt_template = self._load_prompt_template()
+        self.near_duplicate_cache = near_duplicate_cache
+        self.near_duplicate_namespace = (
+            f"candidate_parser:{self.provider}:{self.model}:{prompt_version(self.prompt_template)}"
+        )
     
     def _load_prompt_template(self) -> str:
         """加载提示词模板"""
@@ -79,25 +97,20 @@ Convert all content to English. Return only the JSON object.
                 "metadata": Dict
             }
         """
+        if self.near_duplicate_cache is not None:
+            # 抽取出的原文值（地点、技能等）在新输入中找不到时不算命中
+            hit = self.near_duplicate_cache.lookup(self.near_duplicate_namespace, description, accept=fits_member)
+            if hit is not None:
+                result, score = hit
+                result["metadata"]["near_duplicate"] = {"score": score}
+                return result
+        
         try:
             # 构建消息
-            messages = [
-                {
-                    "role": "system", 
-                    "content": self.prompt_template
-                },
-                {
-                    "role": "user", 
-                    "content": f"Parse this candidate description:\n\n{description}"
-                }
-            ]
+            messages = self._build_messages(description)
             
             # 设置LLM参数
-            llm_params = {
-                "temperature": 0.1,  # 低温度确保结构化输出
-                "max_tokens": 800,
-                **kwargs
-            }
+            llm_params = self._build_llm_params(**kwargs)
             
             # 调用LLM
             start_time = time.time()
@@ -135,31 +148,22 @@ Convert all content to English. Return only the JSON object.
                     }
                 }
             
-            # 解析JSON结果
-            parsed_data = self._parse_json_response(content)
-            
-            # 验证和清理数据
-            validated_data = self._validate_and_clean_data(parsed_data)
+            # 解析JSON结果（无法解析时退回手动提取，手动提取的结果不写入缓存）
+            parsed_data = self._load_json_response(content)
+            parsed_as_json = parsed_data is not None
+            if not parsed_as_json:
+                parsed_data = self._manual_parse_response(content)
             
-            return {
-                "success": True,
-                "parsed_data": validated_data,
-                "raw_response": content.strip(),
-                "metadata": {
-                    "provider": self.provider,
-                    "model": self.model,
-                    "duration": end_time - start_time,
-                    "usage": response.get("data", {}).get("usage", {}),
-                    "field_counts": {
-                        "jobTitles": len(validated_data.get("jobTitles", [])),
-                        "requiredSkills": len(validated_data.get("requiredSkills", [])),
-                        "preferredSkills": len(validated_data.get("preferredSkills", [])),
-                        "industry": len(validated_data.get("industry", [])),
-                        "Location": len(validated_data.get("Location", [])),
-                        "Keywords": len(validated_data.get("Keywords", []))
-                    }
-                }
-            }
+            result = self._build_success_result(
+                content,
+                parsed_data,
+                duration=end_time - start_time,
+                usage=response.get("data", {}).get("usage", {})
+            )
+            if self.near_duplicate_cache is not None and parsed_as_json \
+                    and result["parsed_data"] != self._get_empty_structure():
+                self.near_duplicate_cache.store(self.near_duplicate_namespace, description, result)
+            return result
             
         except Exception as e:
             return {
@@ -172,6 +176,144 @@ Convert all content to English. Return only the JSON object.
                 }
             }
     
+    def stream_parse_candidate_description(
+        self,
+        description: str,
+        **kwargs
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        流式解析候选人描述，每个顶层字段生成完毕就立即推送，无需等待完整响应
+        
+        Args:
+            description: 候选人描述文本
+            **kwargs: 额外的LLM参数
+            
+        Yields:
+            字段事件：{"type": "field", "field": str, "value": Any, "elapsed": float}，
+            value 已经过与最终结果相同的清理；
+            最后一个事件为 {"type": "result", ...}，其余内容与 parse_candidate_description 的返回值相同
+        """
+        llm_params = self._build_llm_params(**kwargs)
+        empty_structure = self._get_empty_structure()
+        parser = IncrementalJSONParser()
+        content = ""
+        stream = None
+        start_time = time.time()
+        
+        try:
+            raw_stream = self.llm_client.stream_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=self._build_messages(description),
+                **llm_params
+            )
+            stream = create_stream_response(
+                raw_stream, self.provider, start_time=start_time, max_tokens=llm_params.get("max_tokens")
+            ).stream
+            
+            for chunk in stream:
+                if chunk.error:
+                    yield self._build_stream_error(chunk.error, start_time)
+                    return
+                
+                content += chunk.content
+                for event in parser.feed(chunk.content):
+                    if event["type"] != "field" or event["key"] not in empty_structure:
+                        continue
+                    yield {
+                        "type": "field",
+                        "field": event["key"],
+                        "value": self._validate_and_clean_data({event["key"]: event["value"]})[event["key"]],
+                        "elapsed": round(time.time() - start_time, 3)
+                    }
+            
+            if not content:
+                yield self._build_stream_error("LLM返回空内容", start_time)
+                return
+            
+            # 优先使用增量解析结果，不完整时回退到常规解析
+            parsed_data = parser.result if isinstance(parser.result, dict) else self._parse_json_response(content)
+            result = self._build_success_result(
+                content,
+                parsed_data,
+                duration=time.time() - start_time,
+                usage=stream.metrics.usage or {}
+            )
+            result["metadata"]["latency"] = stream.metrics.to_dict()
+            yield {"type": "result", **result}
+            
+        except Exception as e:
+            yield self._build_stream_error(f"解析过程异常: {str(e)}", start_time)
+        finally:
+            # 调用方提前停止读取时关闭提供商连接
+            if stream is not None and not stream.finished:
+                stream.close("client_disconnect")
+    
+    def _build_messages(self, description: str) -> List[Dict[str, str]]:
+        """构建LLM消息"""
+        return [
+            {
+                "role": "system", 
+                "content": self.prompt_template
+            },
+            {
+                "role": "user", 
+                "content": f"Parse this candidate description:\n\n{description}"
+            }
+        ]
+    
+    def _build_llm_params(self, **kwargs) -> Dict[str, Any]:
+        """构建LLM参数，传入的参数会覆盖默认值"""
+        return {
+            "temperature": 0.1,  # 低温度确保结构化输出
+            "max_tokens": 800,
+            **kwargs
+        }
+    
+    def _build_success_result(
+        self,
+        content: str,
+        parsed_data: Dict[str, Any],
+        duration: float,
+        usage: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """验证清理解析数据并构建成功结果"""
+        validated_data = self._validate_and_clean_data(parsed_data)
+        
+        return {
+            "success": True,
+            "parsed_data": validated_data,
+            "raw_response": content.strip(),
+            "metadata": {
+                "provider": self.provider,
+                "model": self.model,
+                "duration": duration,
+                "usage": usage,
+                "field_counts": {
+                    "jobTitles": len(validated_data.get("jobTitles", [])),
+                    "requiredSkills": len(validated_data.get("requiredSkills", [])),
+                    "preferredSkills": len(validated_data.get("preferredSkills", [])),
+                    "industry": len(validated_data.get("industry", [])),
+                    "Location": len(validated_data.get("Location", [])),
+                    "Keywords": len(validated_data.get("Keywords", []))
+                }
+            }
+        }
+    
+    def _build_stream_error(self, error: str, start_time: float) -> Dict[str, Any]:
+        """构建流式解析的失败结果事件"""
+        return {
+            "type": "result",
+            "success": False,
+            "error": error,
+            "parsed_data": self._get_empty_structure(),
+            "metadata": {
+                "provider": self.provider,
+                "model": self.model,
+                "duration": time.time() - start_time
+            }
+        }
+    
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
         """
         解析LLM返回的JSON响应
@@ -182,6 +324,22 @@ Convert all content to English. Return only the JSON object.
         Returns:
             解析后的JSON对象
         """
+        parsed = self._load_json_response(content)
+        if parsed is None:
+            # 如果仍然无法解析，尝试手动构建
+            return self._manual_parse_response(content)
+        return parsed
+    
+    def _load_json_response(self, content: str) -> Optional[Dict[str, Any]]:
+        """
+        把LLM返回内容解析为JSON（整体解析，失败时提取最大的JSON块）
+        
+        Args:
+            content: LLM返回的原始内容
+            
+        Returns:
+            解析后的JSON对象，无法解析时返回 None
+        """
         try:
             # 尝试直接解析
             return json.loads(content.strip())
@@ -201,8 +359,7 @@ Convert all content to English. Return only the JSON object.
                 except json.JSONDecodeError:
                     pass
             
-            # 如果仍然无法解析，尝试手动构建
-            return self._manual_parse_response(content)
+            return None
     
     def _manual_parse_response(self, content: str) -> Dict[str, Any]:
         """
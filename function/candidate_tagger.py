@@ -1,14 +1,43 @@
 import json
 import os
+import re
 import sys
-from typing import Dict, Any, Optional
+import time
+from functools import partial
+from typing import Dict, Any, Optional, List, Generator, Callable
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from config import config
 from api.llm import LLMClient
+from api.rate_limit import get_rate_limiter
+from api.stream import create_stream_response
+from api.response_cache import prompt_version
+from function.rule_tagger import RuleTagger
+from function.local_tagger import LocalTagger, get_local_tagger
+from function.typeahead import TypeaheadSession
+from util.batch import run_batch_calls, is_rate_limited_result
+from util.near_duplicate import NearDuplicateCache, same_token_set
+from util.streaming_json import IncrementalJSONParser
+
+
+# 五个维度标签，顺序与 prompt 中的响应格式一致
+TAG_LABELS = ["Location", "Job Title", "Years of Experience", "Industry", "Skills"]
+
+# 紧凑输出模式：按维度顺序输出 5 位 0/1
+BITMASK_PATTERN = re.compile(r"^[01]{5}$")
+
+# 紧凑输出模式的最大 token 数（5 位数字在常见分词器中占 1~5 个 token）
+BITMASK_MAX_TOKENS = 8
+
+# 标签器输出模式
+OUTPUT_MODES = ("json", "bitmask")
+
+# 打包模式中每条文本预留的输出 token 数（紧凑 JSON 每条约 60 个 token，另含 id 和余量）
+PACKED_TOKENS_PER_TEXT = 100
 
 
 class CandidateTagger:
@@ -25,21 +54,42 @@ class CandidateTagger:
         max_tokens: int = 500,
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
-        presence_penalty: float = 0.0
+        presence_penalty: float = 0.0,
+        llm_client: Optional[LLMClient] = None,
+        output_mode: str = "json",
+        rule_tagger: Optional[RuleTagger] = None,
+        local_tagger: Optional[LocalTagger] = None,
+        near_duplicate_cache: Optional[NearDuplicateCache] = None
     ):
         """
         初始化候选人标签器
         
         Args:
             model: 使用的模型名称
-            provider: LLM提供商 ("openai" 或 "perplexity")
+            provider: LLM提供商 ("openai" 或 "perplexity")；"local" 表示先用本地模型（见 function/local_tagger.py），
+                没把握时交给 LOCAL_TAGGER_FALLBACK_PROVIDER / LOCAL_TAGGER_FALLBACK_MODEL
             temperature: 温度参数 (0-2)，默认0.1确保一致性
             max_tokens: 最大token数，默认500
             top_p: 核采样参数 (0-1)，默认1.0
             frequency_penalty: 频率惩罚 (-2.0 to 2.0)，默认0.0
             presence_penalty: 存在惩罚 (-2.0 to 2.0)，默认0.0
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
+            output_mode: 输出模式，"json"（默认）或 "bitmask"（模型只输出 5 位 0/1，见 analyze_text_bitmask）
+            rule_tagger: 规则预分类器；设置后 analyze_text 和打包模式先用规则判断，五个维度都有把握时不调用 LLM
+            local_tagger: 本地标签模型，provider 为 "local" 时默认加载 LOCAL_TAGGER_MODEL_PATH
+            near_duplicate_cache: 近似重复输入缓存（见 util/near_duplicate.py）；设置后规范化后相近的输入直接返回缓存结果，
+                结果另含 "near_duplicate": {"score": 相似度}
         """
-        self.llm_client = LLMClient()
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unsupported output_mode: {output_mode}. Supported: {', '.join(OUTPUT_MODES)}")
+        self.output_mode = output_mode
+        self.rule_tagger = rule_tagger
+        self.local_tagger = local_tagger
+        if provider == "local":
+            self.local_tagger = local_tagger or get_local_tagger()
+            provider = config.LOCAL_TAGGER_FALLBACK_PROVIDER
+            model = config.LOCAL_TAGGER_FALLBACK_MODEL or model
+        self.llm_client = llm_client or LLMClient()
         self.model = model
         self.provider = provider
         self.temperature = temperature
@@ -48,6 +98,12 @@ class CandidateTagger:
         self.frequency_penalty = frequency_penalty
         self.presence_penalty = presence_penalty
         self.prompt_template = self._load_prompt_template()
+        self.packed_prompt_template = self._load_packed_prompt_template()
+        self.bitmask_prompt_template = self._load_bitmask_prompt_template()
+        self.near_duplicate_cache = near_duplicate_cache
+        self.near_duplicate_namespace = (
+            f"candidate_tagger:{self.provider}:{self.model}:{self.output_mode}:{prompt_version(self.prompt_template)}"
+        )
     
     def _load_prompt_template(self) -> str:
         """
@@ -68,6 +124,47 @@ class CandidateTagger:
             print(f"Error loading prompt template: {e}")
             return self._get_default_prompt()
     
+    def _load_packed_prompt_template(self) -> str:
+        """
+        从文件加载打包模式（一次标注多条文本）的prompt模板
+        
+        Returns:
+            prompt模板字符串
+        """
+        prompt_file = project_root / "prompt" / "candidate_tagger_packed_prompt.md"
+        
+        try:
+            with open(prompt_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception:
+            # 文件不存在时在单条模板上说明批量格式
+            return (
+                f"{self._get_default_prompt()}\n\n"
+                "The input is a numbered list of texts in the form [id] \"text\". Analyze each text independently and "
+                "respond with one JSON object: {\"results\": [{\"id\": 1, \"result\": [...]}, ...]}, "
+                "one entry per id in input order.\n\nAnalyze these texts:"
+            )
+    
+    def _load_bitmask_prompt_template(self) -> str:
+        """
+        从文件加载紧凑输出模式的prompt模板
+        
+        Returns:
+            prompt模板字符串
+        """
+        prompt_file = project_root / "prompt" / "candidate_tagger_bitmask_prompt.md"
+        
+        try:
+            with open(prompt_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception:
+            return (
+                f"{self._get_default_prompt()}\n\n"
+                "Instead of JSON, respond with exactly 5 characters: one digit per dimension in the order above, "
+                "1 if the text contains criteria and 0 if it does not (e.g. 01110). Output nothing else.\n\n"
+                "Analyze this text:"
+            )
+    
     def _get_default_prompt(self) -> str:
         """
         获取默认的prompt模板
@@ -105,8 +202,78 @@ Analyze this text:"""
             **kwargs: 传递给LLM的额外参数
             
         Returns:
-            包含分析结果的字典
+            包含分析结果的字典；由规则预分类器或本地模型直接给出的结果 "provider" 为 "rules" 或 "local"，
+            另含各维度 "confidence"
+        """
+        local_result = self.analyze_text_locally(text)
+        if local_result is not None:
+            return local_result
+        return self._analyze_text_llm(text, **kwargs)
+    
+    def _analyze_text_llm(self, text: str, **kwargs) -> Dict[str, Any]:
+        """按输出模式调用 LLM 分析单条文本（不经过规则预分类）"""
+        if self.output_mode == "bitmask":
+            result = self.analyze_text_bitmask(text, **kwargs)
+        else:
+            result = self._analyze_text_json(text, **kwargs)
+        self.remember_result(text, result)
+        return result
+    
+    def analyze_text_locally(self, text: str) -> Optional[Dict[str, Any]]:
         """
+        本地预判：依次尝试近似重复输入缓存、规则预分类器和本地模型，不调用 LLM
+        
+        Args:
+            text: 要分析的文本（职位描述或搜索查询）
+            
+        Returns:
+            命中缓存或五个维度都达到置信度阈值时返回与 analyze_text 格式相同的结果，否则返回 None（需要调用 LLM）
+        """
+        if not text or not text.strip():
+            return None
+        if self.near_duplicate_cache is not None:
+            # 标签结果没有抽取值可核对，只有词集合相同（只差虚词、同义写法、词序）才命中
+            hit = self.near_duplicate_cache.lookup(
+                self.near_duplicate_namespace,
+                text,
+                accept=lambda _, cached_text, new_text: same_token_set(cached_text, new_text)
+            )
+            if hit is not None:
+                result, score = hit
+                result["near_duplicate"] = {"score": score}
+                return result
+        for provider, classifier in (("rules", self.rule_tagger), ("local", self.local_tagger)):
+            if classifier is None:
+                continue
+            classification = classifier.classify(text)
+            if classification["decided"]:
+                return {
+                    "success": True,
+                    "result": classification["result"],
+                    "raw_content": None,
+                    "usage": {},
+                    "model_used": "rules" if provider == "rules" else classifier.name,
+                    "provider": provider,
+                    "confidence": classification["confidence"]
+                }
+        return None
+    
+    def remember_result(self, text: str, result: Dict[str, Any]):
+        """
+        把 LLM 给出的成功结果写入近似重复输入缓存（失败结果和本地给出的结果不写入）
+        
+        Args:
+            text: 分析的文本
+            result: 该文本的分析结果（analyze_text / stream_analyze_text 的返回值）
+        """
+        if self.near_duplicate_cache is None or not result.get("success") or not result.get("result"):
+            return
+        if result.get("provider") in ("rules", "local") or "near_duplicate" in result:
+            return
+        self.near_duplicate_cache.store(self.near_duplicate_namespace, text, result)
+    
+    def _analyze_text_json(self, text: str, **kwargs) -> Dict[str, Any]:
+        """JSON 输出模式的 analyze_text"""
         if not text or not text.strip():
             return {
                 "success": False,
@@ -114,25 +281,10 @@ Analyze this text:"""
                 "result": None
             }
         
-        # 构建完整的prompt
-        full_prompt = f"{self.prompt_template}\n\n{text.strip()}"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": full_prompt
-            }
-        ]
+        messages = self._build_messages(text)
         
         # 合并默认参数和传入参数
-        llm_params = {
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "top_p": self.top_p,
-            "frequency_penalty": self.frequency_penalty,
-            "presence_penalty": self.presence_penalty,
-            **kwargs  # 传入的参数会覆盖默认参数
-        }
+        llm_params = self._build_llm_params(**kwargs)
         
         try:
             # 调用LLM
@@ -180,6 +332,351 @@ Analyze this text:"""
                 "result": None
             }
     
+    def analyze_text_bitmask(self, text: str, **kwargs) -> Dict[str, Any]:
+        """
+        紧凑输出模式：模型按维度顺序只输出 5 位 0/1（如 "01101"），在本地解码为与 analyze_text 相同的结果结构
+        
+        输出约 1~5 个 token，JSON 模式约 60 个；输出不能严格匹配 ^[01]{5}$ 时退回 JSON 模式重新分析
+        
+        Args:
+            text: 要分析的文本（职位描述或搜索查询）
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            与 analyze_text 格式相同的结果字典，另含 "output_mode"（"bitmask" 或退回后的 "json_fallback"）
+        """
+        if not text or not text.strip():
+            return {
+                "success": False,
+                "error": "Input text is empty",
+                "result": None
+            }
+        
+        llm_params = self._build_llm_params(**kwargs)
+        if "max_tokens" not in kwargs:
+            llm_params["max_tokens"] = BITMASK_MAX_TOKENS
+        
+        try:
+            response = self.llm_client.call_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=self._build_messages(text, self.bitmask_prompt_template),
+                **llm_params
+            )
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Analysis failed: {str(e)}",
+                "result": None
+            }
+        
+        if not response.get("success"):
+            return {
+                "success": False,
+                "error": f"LLM call failed: {response.get('error', 'Unknown error')}",
+                "result": None,
+                "raw_response": response
+            }
+        
+        content = self.llm_client.get_response_content(response) or ""
+        decoded = self.decode_bitmask(content)
+        if decoded is None:
+            result = self._analyze_text_json(text, **kwargs)
+            result["output_mode"] = "json_fallback"
+            result["bitmask_content"] = content
+            return result
+        
+        return {
+            "success": True,
+            "result": decoded,
+            "raw_content": content,
+            "usage": response.get("data", {}).get("usage", {}),
+            "model_used": response.get("data", {}).get("model", self.model),
+            "provider": self.provider,
+            "output_mode": "bitmask"
+        }
+    
+    @staticmethod
+    def decode_bitmask(content: str) -> Optional[Dict[str, Any]]:
+        """
+        把 5 位 0/1 解码为 {"result": [{"label", "containsCriteria"}, ...]}
+        
+        Args:
+            content: 模型输出（只去掉首尾空白，其余必须严格匹配 ^[01]{5}$）
+            
+        Returns:
+            结果字典，格式不符时返回 None
+        """
+        content = content.strip()
+        if not BITMASK_PATTERN.match(content):
+            return None
+        return {
+            "result": [
+                {"label": label, "containsCriteria": bit == "1"}
+                for label, bit in zip(TAG_LABELS, content)
+            ]
+        }
+    
+    def typeahead_session(
+        self,
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        debounce: Optional[float] = None,
+        **kwargs
+    ) -> TypeaheadSession:
+        """
+        创建输入联想会话：搜索框每次输入变化时调用 session.update(text)，
+        会话负责防抖、取消过时的调用，并复用归一化后相同的查询的结果（见 function/typeahead.py）
+        
+        Args:
+            on_result: 最新输入有结果时调用 on_result(文本, 结果)
+            debounce: 防抖时间（秒），默认读取配置 TYPEAHEAD_DEBOUNCE
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            TypeaheadSession，用完后调用 close()（或用 with 语句）
+        """
+        return TypeaheadSession(self, debounce=debounce, on_result=on_result, **kwargs)
+    
+    def analyze_text_early_stop(self, text: str, **kwargs) -> Dict[str, Any]:
+        """
+        以流式方式分析文本，五个维度全部判断完毕后立即停止生成并返回
+        
+        省去 result 数组之后的收尾 JSON、代码块标记和说明文字的输出费用和等待时间
+        
+        Args:
+            text: 要分析的文本（职位描述或搜索查询）
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            与 analyze_text 格式相同的结果字典，另含 "early_stop" 统计（是否提前停止、
+            停止时刻和已输出 token 数）
+        """
+        result = None
+        for event in self.stream_analyze_text(text, early_stop=True, **kwargs):
+            if event["type"] == "result":
+                result = event
+        result.pop("type", None)
+        return result
+    
+    def stream_analyze_text(
+        self,
+        text: str,
+        early_stop: bool = False,
+        on_stream: Optional[Callable[[Any], None]] = None,
+        **kwargs
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        流式分析文本，每个维度的判断生成完毕就立即推送
+        
+        Args:
+            text: 要分析的文本（职位描述或搜索查询）
+            early_stop: 五个维度全部通过验证后立即关闭提供商流，不再等待剩余输出
+            on_stream: 提供商流建立后调用 on_stream(stream)，调用方可在其他线程调用 stream.close(reason) 取消请求
+            **kwargs: 传递给LLM的额外参数
+            
+        Yields:
+            标签事件：{"type": "tag", "index": int, "label": str, "containsCriteria": bool, "elapsed": float}；
+            最后一个事件为 {"type": "result", ...}，其余内容与 analyze_text 的返回值相同，
+            early_stop 为 True 时另含 "early_stop" 统计
+        """
+        if not text or not text.strip():
+            yield {
+                "type": "result",
+                "success": False,
+                "error": "Input text is empty",
+                "result": None
+            }
+            return
+        
+        llm_params = self._build_llm_params(**kwargs)
+        parser = IncrementalJSONParser()
+        content = ""
+        tags = []
+        stopped_early = False
+        stream = None
+        start_time = time.time()
+        
+        try:
+            raw_stream = self.llm_client.stream_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=self._build_messages(text),
+                **llm_params
+            )
+            stream = create_stream_response(
+                raw_stream, self.provider, start_time=start_time, max_tokens=llm_params.get("max_tokens")
+            ).stream
+            if on_stream is not None:
+                on_stream(stream)
+            
+            for chunk in stream:
+                if chunk.error:
+                    yield {
+                        "type": "result",
+                        "success": False,
+                        "error": f"LLM call failed: {chunk.error}",
+                        "result": None
+                    }
+                    return
+                
+                content += chunk.content
+                for event in parser.feed(chunk.content):
+                    if event["type"] == "item" and event["key"] == "result" and self._is_valid_tag(event["index"], event["value"]):
+                        tags.append(event["value"])
+                        yield {
+                            "type": "tag",
+                            "index": event["index"],
+                            "label": event["value"]["label"],
+                            "containsCriteria": event["value"]["containsCriteria"],
+                            "elapsed": round(time.time() - start_time, 3)
+                        }
+                
+                if early_stop and len(tags) == len(TAG_LABELS) and not stream.finished:
+                    # 五个维度都已确定，剩余输出只是收尾符号或说明文字
+                    stream.close("early_stop")
+                    stopped_early = True
+                    break
+            
+            if not content:
+                yield {
+                    "type": "result",
+                    "success": False,
+                    "error": "No content in LLM response",
+                    "result": None
+                }
+                return
+            
+            # 优先使用增量解析结果，格式不对时回退到常规解析
+            if stopped_early:
+                parsed_result = {"result": tags}
+            elif isinstance(parser.result, dict) and self._validate_response_format(parser.result):
+                parsed_result = parser.result
+            else:
+                parsed_result = self._parse_llm_response(content)
+            
+            result = {
+                "type": "result",
+                "success": True,
+                "result": parsed_result,
+                "raw_content": content,
+                "usage": stream.metrics.usage or {},
+                "model_used": self.model,
+                "provider": self.provider,
+                "latency": stream.metrics.to_dict()
+            }
+            if early_stop:
+                result["early_stop"] = self._get_early_stop_stats(stream.metrics, stopped_early)
+            yield result
+            
+        except Exception as e:
+            yield {
+                "type": "result",
+                "success": False,
+                "error": f"Analysis failed: {str(e)}",
+                "result": None
+            }
+        finally:
+            # 调用方提前停止读取时关闭提供商连接
+            if stream is not None and not stream.finished:
+                stream.close("client_disconnect")
+    
+    def _get_early_stop_stats(self, metrics, stopped_early: bool) -> Dict[str, Any]:
+        """
+        统计提前停止时的实测数据
+        
+        Args:
+            metrics: 流的延迟指标 (StreamMetrics)
+            stopped_early: 是否在提供商结束输出之前关闭了流
+            
+        Returns:
+            提前停止统计字典：是否提前停止、停止时刻（秒）和停止前已输出的 token 数；
+            提供商未输出的剩余内容长度无法得知，不做估算
+        """
+        return {
+            "stopped_early": stopped_early,
+            "stopped_at": round(metrics.duration, 3),
+            "output_tokens": metrics.output_tokens
+        }
+    
+    def _build_messages(self, text: str, prompt_template: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        构建LLM消息
+        
+        Args:
+            text: 要分析的文本
+            prompt_template: prompt模板，默认为 JSON 输出模式的模板
+            
+        Returns:
+            消息列表
+        """
+        # 构建完整的prompt
+        full_prompt = f"{prompt_template or self.prompt_template}\n\n{text.strip()}"
+        
+        return [
+            {
+                "role": "user",
+                "content": full_prompt
+            }
+        ]
+    
+    def _build_packed_messages(self, texts: List[str]) -> List[Dict[str, str]]:
+        """
+        构建打包模式的LLM消息：每条文本编号后以 JSON 字符串列出，文本中的换行不会打乱编号
+        
+        Args:
+            texts: 要分析的文本列表
+            
+        Returns:
+            消息列表
+        """
+        numbered = "\n".join(
+            f"[{position}] {json.dumps(text.strip(), ensure_ascii=False)}"
+            for position, text in enumerate(texts, 1)
+        )
+        return [
+            {
+                "role": "user",
+                "content": f"{self.packed_prompt_template}\n\n{numbered}"
+            }
+        ]
+    
+    def _build_llm_params(self, **kwargs) -> Dict[str, Any]:
+        """
+        合并默认参数和传入参数
+        
+        Args:
+            **kwargs: 传入的参数，会覆盖默认参数
+            
+        Returns:
+            LLM参数字典
+        """
+        return {
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": self.top_p,
+            "frequency_penalty": self.frequency_penalty,
+            "presence_penalty": self.presence_penalty,
+            **kwargs
+        }
+    
+    def _is_valid_tag(self, index: int, item: Any) -> bool:
+        """
+        验证单个维度判断的格式
+        
+        Args:
+            index: 在 result 数组中的位置
+            item: 维度判断对象
+            
+        Returns:
+            是否格式正确
+        """
+        return (
+            isinstance(item, dict)
+            and index < len(TAG_LABELS)
+            and item.get("label") == TAG_LABELS[index]
+            and isinstance(item.get("containsCriteria"), bool)
+        )
+    
     def _parse_llm_response(self, content: str) -> Optional[Dict[str, Any]]:
         """
         解析LLM返回的JSON响应
@@ -192,13 +689,7 @@ Analyze this text:"""
         """
         # 尝试直接解析JSON
         try:
-            # 移除可能的markdown代码块标记
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content.replace("```json", "").replace("```", "").strip()
-            elif content.startswith("```"):
-                content = content.replace("```", "").strip()
-            
+            content = self._strip_code_fences(content)
             result = json.loads(content)
             
             # 验证响应格式
@@ -216,6 +707,50 @@ Analyze this text:"""
             print(f"Response parsing failed: {e}")
             return None
     
+    @staticmethod
+    def _strip_code_fences(content: str) -> str:
+        """移除可能的markdown代码块标记"""
+        content = content.strip()
+        if content.startswith("```json"):
+            content = content.replace("```json", "").replace("```", "").strip()
+        elif content.startswith("```"):
+            content = content.replace("```", "").strip()
+        return content
+    
+    def _parse_packed_response(self, content: str, count: int) -> Dict[int, Dict[str, Any]]:
+        """
+        解析打包模式的响应，逐条用 _validate_response_format 验证
+        
+        Args:
+            content: LLM返回的原始内容
+            count: 本次打包的文本数
+            
+        Returns:
+            {编号(从1开始): 单条结果}，只包含通过验证的条目；整体无法解析时返回空字典
+        """
+        try:
+            data = json.loads(self._strip_code_fences(content))
+        except (json.JSONDecodeError, TypeError):
+            return {}
+        entries = data.get("results") if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return {}
+        
+        parsed = {}
+        for position, entry in enumerate(entries, 1):
+            if not isinstance(entry, dict):
+                continue
+            # 模型偶尔省略 id，此时按位置对应
+            entry_id = entry.get("id", position)
+            if isinstance(entry_id, str) and entry_id.strip().isdigit():
+                entry_id = int(entry_id)
+            if not isinstance(entry_id, int) or not 1 <= entry_id <= count or entry_id in parsed:
+                continue
+            result = {"result": entry.get("result")}
+            if self._validate_response_format(result):
+                parsed[entry_id] = result
+        return parsed
+    
     def _validate_response_format(self, result: Dict[str, Any]) -> bool:
         """
         验证响应格式是否正确
@@ -236,45 +771,211 @@ Analyze this text:"""
                 return False
             
             # 检查每个项目的格式
-            expected_labels = ["Location", "Job Title", "Years of Experience", "Industry", "Skills"]
-            
-            for i, item in enumerate(result_list):
-                if not isinstance(item, dict):
-                    return False
-                if "label" not in item or "containsCriteria" not in item:
-                    return False
-                if item["label"] != expected_labels[i]:
-                    return False
-                if not isinstance(item["containsCriteria"], bool):
-                    return False
-            
-            return True
+            return all(self._is_valid_tag(i, item) for i, item in enumerate(result_list))
             
         except Exception:
             return False
     
-    def batch_analyze(self, texts: list[str], **kwargs) -> list[Dict[str, Any]]:
+    def batch_analyze(
+        self,
+        texts: list[str],
+        max_workers: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any], int, int], None]] = None,
+        rate_limit_rpm: Optional[float] = None,
+        pack_size: Optional[int] = None,
+        **kwargs
+    ) -> list[Dict[str, Any]]:
+        """
+        并发批量分析多个文本
+        
+        LLMClient 是同步客户端，因此用线程池并发：同时进行的调用不超过 max_workers，
+        发请求前从提供商共享的限速器取令牌，遇到限流错误按 RETRY_DELAY 指数退避重试（最多 MAX_RETRIES 次）
+        
+        Args:
+            texts: 要分析的文本列表
+            max_workers: 同时进行的调用上限，默认读取配置 TAGGER_BATCH_MAX_WORKERS；1 表示串行
+            on_result: 每完成一项调用一次 on_result(输入序号, 结果, 已完成数, 总数)，在调用方线程中按完成顺序执行
+            rate_limit_rpm: 每分钟请求数上限，默认读取配置 <PROVIDER>_RATE_LIMIT_RPM；0 表示不限速
+            pack_size: 大于 1 时使用打包模式，每次调用标注 pack_size 条文本（见 analyze_packed），
+                每个包取一个令牌；默认 1（逐条调用）
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            分析结果列表（与输入顺序一致）
+        """
+        total = len(texts)
+        results: list = [None] * total
+        if total == 0:
+            return results
+        
+        # 规则预分类或本地模型能直接给出结果的文本不占用 LLM 调用和限速令牌
+        completed = 0
+        items = []
+        for index, text in enumerate(texts):
+            local_result = self.analyze_text_locally(text)
+            if local_result is None:
+                items.append((index, text))
+                continue
+            results[index] = local_result
+            completed += 1
+            if on_result is not None:
+                on_result(index, local_result, completed, total)
+        if not items:
+            return results
+        
+        pack_size = max(1, pack_size or 1)
+        packs = [tuple(items[start:start + pack_size]) for start in range(0, len(items), pack_size)]
+        max_workers = max(1, min(max_workers or config.TAGGER_BATCH_MAX_WORKERS, len(packs)))
+        limiter = get_rate_limiter(self.provider, rate_limit_rpm)
+        
+        def on_complete(pack: tuple, pack_results: Dict[int, Dict[str, Any]]):
+            nonlocal completed
+            for index, _ in pack:
+                results[index] = pack_results[index]
+                completed += 1
+                if on_result is not None:
+                    on_result(index, results[index], completed, total)
+        
+        def on_error(pack: tuple, error: Exception) -> Dict[int, Dict[str, Any]]:
+            return {
+                index: {"success": False, "error": f"Analysis failed: {str(error)}", "result": None}
+                for index, _ in pack
+            }
+        
+        run_batch_calls(
+            {pack: partial(self._analyze_batch_pack, pack, **kwargs) for pack in packs},
+            max_workers,
+            on_complete,
+            on_error,
+            limiter=limiter,
+            is_rate_limited=lambda pack_results: all(map(is_rate_limited_result, pack_results.values())),
+            thread_name_prefix="tagger-batch"
+        )
+        return results
+    
+    def _analyze_batch_pack(self, pack: tuple, **kwargs) -> Dict[int, Dict[str, Any]]:
+        """分析批量中的一个包（单条时直接调用 LLM）"""
+        if len(pack) == 1:
+            index, text = pack[0]
+            return {index: self._analyze_text_llm(text, **kwargs)}
+        return self._analyze_pack(list(pack), **kwargs)
+    
+    def analyze_packed(self, texts: list[str], pack_size: Optional[int] = None, **kwargs) -> list[Dict[str, Any]]:
         """
-        批量分析多个文本
+        打包模式：一次 LLM 调用标注多条文本，按编号拆回每条结果
+        
+        提示词（candidate_tagger_packed_prompt.md）每个包只发送一次；每条结果用 _validate_response_format 验证，
+        未通过验证的条目单独重新打包重试，整包无法解析时对半拆分后递归重试，拆到单条时退回逐条调用；
+        规则预分类器或本地模型能直接给出结果的文本不参与打包
         
         Args:
             texts: 要分析的文本列表
+            pack_size: 每次调用最多标注的文本数，默认读取配置 TAGGER_PACK_SIZE
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            分析结果列表（与输入顺序一致），每项格式与 analyze_text 相同；打包得到的结果另含 "pack_size"，
+            "usage" 为整包用量按条数平摊
+        """
+        pack_size = max(1, pack_size or config.TAGGER_PACK_SIZE)
+        results: list = [None] * len(texts)
+        items = []
+        for index, text in enumerate(texts):
+            results[index] = self.analyze_text_locally(text)
+            if results[index] is None:
+                items.append((index, text))
+        for start in range(0, len(items), pack_size):
+            pack = items[start:start + pack_size]
+            if len(pack) == 1:
+                index, text = pack[0]
+                results[index] = self._analyze_text_llm(text, **kwargs)
+                continue
+            for index, result in self._analyze_pack(pack, **kwargs).items():
+                results[index] = result
+        return results
+    
+    def _analyze_pack(self, pack: List[tuple], **kwargs) -> Dict[int, Dict[str, Any]]:
+        """
+        标注一个包，递归重试未通过验证的条目
+        
+        Args:
+            pack: [(输入序号, 文本), ...]
             **kwargs: 传递给LLM的额外参数
             
         Returns:
-            分析结果列表
+            {输入序号: 单条结果}
         """
-        results = []
-        for i, text in enumerate(texts):
-            print(f"Analyzing text {i+1}/{len(texts)}...")
-            result = self.analyze_text(text, **kwargs)
-            results.append(result)
+        results = {}
+        pending = []
+        for index, text in pack:
+            if not text or not text.strip():
+                results[index] = {"success": False, "error": "Input text is empty", "result": None}
+            else:
+                pending.append((index, text))
+        if len(pending) <= 1:
+            for index, text in pending:
+                results[index] = self._analyze_text_llm(text, **kwargs)
+            return results
+        
+        llm_params = self._build_llm_params(**kwargs)
+        if "max_tokens" not in kwargs:
+            llm_params["max_tokens"] = max(self.max_tokens, PACKED_TOKENS_PER_TEXT * len(pending))
+        
+        try:
+            response = self.llm_client.call_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=self._build_packed_messages([text for _, text in pending]),
+                **llm_params
+            )
+        except Exception as e:
+            response = {"success": False, "error": str(e)}
+        
+        if not response.get("success"):
+            # 提供商调用失败与打包无关，拆分重试没有意义
+            error = f"LLM call failed: {response.get('error', 'Unknown error')}"
+            for index, _ in pending:
+                results[index] = {"success": False, "error": error, "result": None}
+            return results
+        
+        content = self.llm_client.get_response_content(response)
+        parsed = self._parse_packed_response(content, len(pending)) if content else {}
+        usage = response.get("data", {}).get("usage") or {}
+        shared_usage = {
+            key: round(value / len(pending), 1)
+            for key, value in usage.items() if isinstance(value, (int, float))
+        }
+        
+        failed = []
+        for position, (index, text) in enumerate(pending, 1):
+            result = parsed.get(position)
+            if result is None:
+                failed.append((index, text))
+                continue
+            results[index] = {
+                "success": True,
+                "result": result,
+                "raw_content": json.dumps(result, ensure_ascii=False),
+                "usage": shared_usage,
+                "model_used": response.get("data", {}).get("model", self.model),
+                "provider": self.provider,
+                "pack_size": len(pending)
+            }
+            self.remember_result(text, results[index])
         
+        if len(failed) == len(pending):
+            # 整包无法解析：对半拆分后分别重试
+            middle = len(failed) // 2
+            results.update(self._analyze_pack(failed[:middle], **kwargs))
+            results.update(self._analyze_pack(failed[middle:], **kwargs))
+        elif failed:
+            # 只重试未通过验证的条目
+            results.update(self._analyze_pack(failed, **kwargs))
         return results
     
     def get_summary_stats(self, results: list[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        获取批量分析结果的统计信息
+        获取批量分析结果的统计信息（逐条遍历字典；百万条以上的结果用 function/tag_analytics.py 的 TagResultStore）
         
         Args:
             results: 分析结果列表
@@ -20,17 +20,23 @@ from api.llm import LLMClient
 class CompanyExtractor:
     """公司关键词提取器"""
     
-    def __init__(self, model: str = "gemini-2.5-flash-lite", provider: str = "gemini"):
+    def __init__(
+        self,
+        model: str = "gemini-2.5-flash-lite",
+        provider: str = "gemini",
+        llm_client: Optional[LLMClient] = None
+    ):
         """
         初始化提取器
         
         Args:
             model: LLM模型名称
             provider: LLM提供商
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
         """
         self.model = model
         self.provider = provider
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or LLMClient()
         
         # 读取提示词模板
         self.prompt_template = self._load_prompt_template()
@@ -7,7 +7,8 @@
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
+from functools import partial
+from typing import List, Dict, Any, Optional, Union, Generator, Callable, Tuple
 import time
 import re
 
@@ -15,26 +16,52 @@ import re
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from config import config
 from api.llm import LLMClient
+from api.rate_limit import get_rate_limiter
+from api.stream import create_stream_response
+from api.response_cache import prompt_version
+from util.batch import run_batch_calls
+from util.batch_dedup import NearDuplicateClusterer, cluster_sizes, fits_member, with_provenance
+from util.boilerplate import BoilerplateStripper
+from util.near_duplicate import NearDuplicateCache
+from util.streaming_json import IncrementalJSONParser
 
 
 class JobParser:
     """职位描述解析器"""
     
-    def __init__(self, model: str = "gemini-2.5-flash-lite", provider: str = "gemini"):
+    def __init__(
+        self,
+        model: str = "gemini-2.5-flash-lite",
+        provider: str = "gemini",
+        llm_client: Optional[LLMClient] = None,
+        near_duplicate_cache: Optional[NearDuplicateCache] = None,
+        boilerplate_stripper: Optional[BoilerplateStripper] = None
+    ):
         """
         初始化解析器
         
         Args:
             model: LLM模型名称
             provider: LLM提供商
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
+            near_duplicate_cache: 近似重复输入缓存（见 util/near_duplicate.py）；设置后规范化后相近的输入直接返回缓存结果，
+                metadata 另含 "near_duplicate": {"score": 相似度}
+            boilerplate_stripper: 样板剥离器（见 util/boilerplate.py）；设置后先删除平等就业声明、福利等样板段落再解析，
+                metadata 另含 "boilerplate": 节省的 token 数和删除的段落（可用 restore() 还原原文）
         """
         self.model = model
         self.provider = provider
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or LLMClient()
         
         # 读取提示词模板
         self.prompt_template = self._load_prompt_template()
+        self.near_duplicate_cache = near_duplicate_cache
+        self.boilerplate_stripper = boilerplate_stripper
+        self.near_duplicate_namespace = (
+            f"job_parser:{self.provider}:{self.model}:{prompt_version(self.prompt_template)}"
+        )
     
     def _load_prompt_template(self) -> str:
         """加载提示词模板"""
@@ -79,25 +106,24 @@ Convert all content to English. Return only the JSON object.
                 "metadata": Dict
             }
         """
+        job_description, boilerplate = self._strip_boilerplate(job_description)
+        if self.near_duplicate_cache is not None:
+            # 抽取出的原文值（地点、公司等）在新输入中找不到时不算命中
+            hit = self.near_duplicate_cache.lookup(self.near_duplicate_namespace, job_description, accept=fits_member)
+            if hit is not None:
+                result, score = hit
+                result["metadata"]["near_duplicate"] = {"score": score}
+                result["metadata"].pop("boilerplate", None)
+                if boilerplate is not None:
+                    result["metadata"]["boilerplate"] = boilerplate
+                return result
+        
         try:
             # 构建消息
-            messages = [
-                {
-                    "role": "system", 
-                    "content": self.prompt_template
-                },
-                {
-                    "role": "user", 
-                    "content": f"Parse this job description:\n\n{job_description}"
-                }
-            ]
+            messages = self._build_messages(job_description)
             
             # 设置LLM参数
-            llm_params = {
-                "temperature": 0.1,  # 低温度确保结构化输出
-                "max_tokens": 1000,
-                **kwargs
-            }
+            llm_params = self._build_llm_params(**kwargs)
             
             # 调用LLM
             start_time = time.time()
@@ -135,42 +161,283 @@ Convert all content to English. Return only the JSON object.
                     }
                 }
             
-            # 解析JSON结果
-            parsed_data = self._parse_json_response(content)
+            # 解析JSON结果（无法解析时退回手动提取，手动提取的结果不写入缓存）
+            parsed_data = self._load_json_response(content)
+            parsed_as_json = parsed_data is not None
+            if not parsed_as_json:
+                parsed_data = self._manual_parse_response(content)
             
-            # 验证和清理数据
-            validated_data = self._validate_and_clean_data(parsed_data)
+            result = self._build_success_result(
+                content,
+                parsed_data,
+                duration=end_time - start_time,
+                usage=response.get("data", {}).get("usage", {})
+            )
+            if boilerplate is not None:
+                result["metadata"]["boilerplate"] = boilerplate
+            if self.near_duplicate_cache is not None and parsed_as_json \
+                    and result["parsed_data"] != self._get_empty_structure():
+                self.near_duplicate_cache.store(self.near_duplicate_namespace, job_description, result)
+            return result
             
+        except Exception as e:
             return {
-                "success": True,
-                "parsed_data": validated_data,
-                "raw_response": content.strip(),
+                "success": False,
+                "error": f"解析过程异常: {str(e)}",
+                "parsed_data": self._get_empty_structure(),
                 "metadata": {
                     "provider": self.provider,
-                    "model": self.model,
-                    "duration": end_time - start_time,
-                    "usage": response.get("data", {}).get("usage", {}),
-                    "field_counts": {
-                        "jobTitles": len(validated_data.get("jobTitles", [])),
-                        "requiredSkills": len(validated_data.get("requiredSkills", [])),
-                        "preferredSkills": len(validated_data.get("preferredSkills", [])),
-                        "industry": len(validated_data.get("industry", [])),
-                        "Location": len(validated_data.get("Location", [])),
-                        "Keywords": len(validated_data.get("Keywords", []))
-                    }
+                    "model": self.model
                 }
             }
+    
+    def stream_parse_job_description(
+        self,
+        job_description: str,
+        **kwargs
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        流式解析职位描述，每个顶层字段生成完毕就立即推送，无需等待完整响应
+        
+        Args:
+            job_description: 职位描述文本
+            **kwargs: 额外的LLM参数
+            
+        Yields:
+            字段事件：{"type": "field", "field": str, "value": Any, "elapsed": float}，
+            value 已经过与最终结果相同的清理；
+            最后一个事件为 {"type": "result", ...}，其余内容与 parse_job_description 的返回值相同
+        """
+        job_description, boilerplate = self._strip_boilerplate(job_description)
+        llm_params = self._build_llm_params(**kwargs)
+        empty_structure = self._get_empty_structure()
+        parser = IncrementalJSONParser()
+        content = ""
+        stream = None
+        start_time = time.time()
+        
+        try:
+            raw_stream = self.llm_client.stream_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=self._build_messages(job_description),
+                **llm_params
+            )
+            stream = create_stream_response(
+                raw_stream, self.provider, start_time=start_time, max_tokens=llm_params.get("max_tokens")
+            ).stream
+            
+            for chunk in stream:
+                if chunk.error:
+                    yield self._build_stream_error(chunk.error, start_time)
+                    return
+                
+                content += chunk.content
+                for event in parser.feed(chunk.content):
+                    if event["type"] != "field" or event["key"] not in empty_structure:
+                        continue
+                    yield {
+                        "type": "field",
+                        "field": event["key"],
+                        "value": self._validate_and_clean_data({event["key"]: event["value"]})[event["key"]],
+                        "elapsed": round(time.time() - start_time, 3)
+                    }
+            
+            if not content:
+                yield self._build_stream_error("LLM返回空内容", start_time)
+                return
+            
+            # 优先使用增量解析结果，不完整时回退到常规解析
+            parsed_data = parser.result if isinstance(parser.result, dict) else self._parse_json_response(content)
+            result = self._build_success_result(
+                content,
+                parsed_data,
+                duration=time.time() - start_time,
+                usage=stream.metrics.usage or {}
+            )
+            result["metadata"]["latency"] = stream.metrics.to_dict()
+            if boilerplate is not None:
+                result["metadata"]["boilerplate"] = boilerplate
+            yield {"type": "result", **result}
             
         except Exception as e:
+            yield self._build_stream_error(f"解析过程异常: {str(e)}", start_time)
+        finally:
+            # 调用方提前停止读取时关闭提供商连接
+            if stream is not None and not stream.finished:
+                stream.close("client_disconnect")
+    
+    def batch_parse(
+        self,
+        job_descriptions: List[str],
+        max_workers: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any], int, int], None]] = None,
+        rate_limit_rpm: Optional[float] = None,
+        dedup: bool = True,
+        dedup_threshold: Optional[float] = None,
+        spill_path: Optional[str] = None,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        并发批量解析（回填），先聚类近似重复的职位描述，每个簇只解析代表
+        
+        重复发布和只改了公司名、地点的模板会被聚成一簇（见 util/batch_dedup.py），代表的结果复制给成员；
+        代表抽取出的原文值（如地点、公司）在成员原文中找不到时，该成员单独解析（metadata["dedup"]["reparsed"] 为 True）。
+        metadata["dedup"] 记录来源：{"representative": 代表的输入序号, "similarity": 与代表的相似度, "cluster_size": 簇大小}
+        
+        Args:
+            job_descriptions: 职位描述列表
+            max_workers: 同时进行的调用上限，默认读取配置 JOB_PARSER_BATCH_MAX_WORKERS
+            on_result: 每完成一项调用一次 on_result(输入序号, 结果, 已完成数, 总数)，在调用方线程中按完成顺序执行
+            rate_limit_rpm: 每分钟请求数上限，默认读取配置 <PROVIDER>_RATE_LIMIT_RPM；0 表示不限速
+            dedup: 是否去重，False 时逐条解析
+            dedup_threshold: 加入簇需要的最低相似度，默认读取配置 BATCH_DEDUP_THRESHOLD
+            spill_path: 聚类索引的 SQLite 转存文件（代表数超过 BATCH_DEDUP_SPILL_AFTER 时使用），默认使用临时文件
+            **kwargs: 额外的LLM参数
+            
+        Returns:
+            解析结果列表（与输入顺序一致）
+        """
+        total = len(job_descriptions)
+        results: list = [None] * total
+        if total == 0:
+            return results
+        
+        if dedup:
+            with NearDuplicateClusterer(threshold=dedup_threshold, spill_path=spill_path) as clusterer:
+                assignments = clusterer.cluster(job_descriptions)
+        else:
+            assignments = [(index, 1.0) for index in range(total)]
+        sizes = cluster_sizes(assignments)
+        members: Dict[int, List[int]] = {}
+        for index, (representative, _) in enumerate(assignments):
+            members.setdefault(representative, []).append(index)
+        
+        max_workers = max(1, min(max_workers or config.JOB_PARSER_BATCH_MAX_WORKERS, len(members)))
+        limiter = get_rate_limiter(self.provider, rate_limit_rpm)
+        completed = 0
+        reparse: List[int] = []
+        
+        def deliver(index: int, result: Dict[str, Any]):
+            nonlocal completed
+            results[index] = result
+            completed += 1
+            if on_result is not None:
+                on_result(index, result, completed, total)
+        
+        def on_complete(index: int, result: Dict[str, Any]):
+            representative, similarity = assignments[index]
+            if not dedup:
+                deliver(index, result)
+            elif index != representative:
+                # 单独解析的成员
+                deliver(index, with_provenance(
+                    result, index, representative, similarity, sizes[representative], reparsed=True
+                ))
+            else:
+                for member in members[representative]:
+                    if member != representative and not fits_member(
+                        result, job_descriptions[representative], job_descriptions[member]
+                    ):
+                        reparse.append(member)
+                        continue
+                    deliver(member, with_provenance(
+                        result, member, representative, assignments[member][1], sizes[representative]
+                    ))
+        
+        def on_error(index: int, error: Exception) -> Dict[str, Any]:
             return {
                 "success": False,
-                "error": f"解析过程异常: {str(e)}",
+                "error": f"解析过程异常: {str(error)}",
                 "parsed_data": self._get_empty_structure(),
-                "metadata": {
-                    "provider": self.provider,
-                    "model": self.model
+                "metadata": {"provider": self.provider, "model": self.model}
+            }
+        
+        # 先解析代表，再单独解析抽取值与代表不同的成员
+        pending = list(members)
+        while pending:
+            run_batch_calls(
+                {index: partial(self.parse_job_description, job_descriptions[index], **kwargs) for index in pending},
+                max_workers,
+                on_complete,
+                on_error,
+                limiter=limiter,
+                thread_name_prefix="job-parser-batch"
+            )
+            pending, reparse = reparse, []
+        return results
+    
+    def _strip_boilerplate(self, job_description: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """启用样板剥离时返回 (剥离后的文本, 剥离报告)，否则返回 (原文, None)"""
+        if self.boilerplate_stripper is None:
+            return job_description, None
+        stripped = self.boilerplate_stripper.strip(job_description)
+        return stripped["text"], {key: value for key, value in stripped.items() if key != "text"}
+    
+    def _build_messages(self, job_description: str) -> List[Dict[str, str]]:
+        """构建LLM消息"""
+        return [
+            {
+                "role": "system", 
+                "content": self.prompt_template
+            },
+            {
+                "role": "user", 
+                "content": f"Parse this job description:\n\n{job_description}"
+            }
+        ]
+    
+    def _build_llm_params(self, **kwargs) -> Dict[str, Any]:
+        """构建LLM参数，传入的参数会覆盖默认值"""
+        return {
+            "temperature": 0.1,  # 低温度确保结构化输出
+            "max_tokens": 1000,
+            **kwargs
+        }
+    
+    def _build_success_result(
+        self,
+        content: str,
+        parsed_data: Dict[str, Any],
+        duration: float,
+        usage: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """验证清理解析数据并构建成功结果"""
+        validated_data = self._validate_and_clean_data(parsed_data)
+        
+        return {
+            "success": True,
+            "parsed_data": validated_data,
+            "raw_response": content.strip(),
+            "metadata": {
+                "provider": self.provider,
+                "model": self.model,
+                "duration": duration,
+                "usage": usage,
+                "field_counts": {
+                    "jobTitles": len(validated_data.get("jobTitles", [])),
+                    "requiredSkills": len(validated_data.get("requiredSkills", [])),
+                    "preferredSkills": len(validated_data.get("preferredSkills", [])),
+                    "industry": len(validated_data.get("industry", [])),
+                    "Location": len(validated_data.get("Location", [])),
+                    "Keywords": len(validated_data.get("Keywords", []))
                 }
             }
+        }
+    
+    def _build_stream_error(self, error: str, start_time: float) -> Dict[str, Any]:
+        """构建流式解析的失败结果事件"""
+        return {
+            "type": "result",
+            "success": False,
+            "error": error,
+            "parsed_data": self._get_empty_structure(),
+            "metadata": {
+                "provider": self.provider,
+                "model": self.model,
+                "duration": time.time() - start_time
+            }
+        }
     
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
         """
@@ -182,6 +449,22 @@ Convert all content to English. Return only the JSON object.
         Returns:
             解析后的JSON对象
         """
+        parsed = self._load_json_response(content)
+        if parsed is None:
+            # 如果仍然无法解析，尝试手动构建
+            return self._manual_parse_response(content)
+        return parsed
+    
+    def _load_json_response(self, content: str) -> Optional[Dict[str, Any]]:
+        """
+        把LLM返回内容解析为JSON（整体解析，失败时提取最大的JSON块）
+        
+        Args:
+            content: LLM返回的原始内容
+            
+        Returns:
+            解析后的JSON对象，无法解析时返回 None
+        """
         try:
             # 尝试直接解析
             return json.loads(content.strip())
@@ -201,8 +484,7 @@ Convert all content to English. Return only the JSON object.
                 except json.JSONDecodeError:
                     pass
             
-            # 如果仍然无法解析，尝试手动构建
-            return self._manual_parse_response(content)
+            return None
     
     def _manual_parse_response(self, content: str) -> Dict[str, Any]:
         """
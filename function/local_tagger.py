@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+本地标签模型
+用 CandidateTagger 记录下来的 (输入文本, LLM 标注结果) 训练一个轻量多标签模型：
+字符/词 n-gram 特征哈希 + NumPy 逻辑回归（每个维度一个二分类器），只用 CPU
+
+训练时留出一部分样本为每个维度校准置信度阈值（该阈值以上的预测精确率达到 LOCAL_TAGGER_TARGET_PRECISION），
+推理时五个维度都达到阈值才直接返回结果，否则交给 LLM；模型保存为一个压缩的 .npz 文件
+
+使用方法:
+    python function/local_tagger.py train --data tagger_labels.jsonl --output model/candidate_tagger_local.npz
+    python function/local_tagger.py predict "Senior Python developer in Berlin"
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 五个维度，顺序与 CandidateTagger 的 TAG_LABELS 一致
+DIMENSIONS = ["Location", "Job Title", "Years of Experience", "Industry", "Skills"]
+
+# 特征哈希空间大小（2 ** HASH_BITS）
+DEFAULT_HASH_BITS = 18
+
+# 字符 n-gram 长度范围
+CHAR_NGRAM_RANGE = (2, 4)
+
+# 词切分：字母数字及 + # . - 组成的词；连续的中文作为一个词（中文主要靠字符 n-gram）
+WORD_PATTERN = re.compile(r"[^\W_][\w+#.\-]*")
+
+# 合并空白
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 这些提供商的结果来自本地预判而不是 LLM，不能作为训练标签
+LOCAL_PROVIDERS = ("rules", "local")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("本地标签模型需要安装 numpy: pip install numpy")
+
+
+def extract_features(text: str, hash_bits: int = DEFAULT_HASH_BITS) -> Tuple[Any, Any]:
+    """
+    把文本转换为哈希特征
+
+    Args:
+        text: 输入文本
+        hash_bits: 哈希空间位数
+
+    Returns:
+        (特征下标数组, 特征值数组)，特征值为二值出现后做 L2 归一化
+    """
+    mask = (1 << hash_bits) - 1
+    normalized = WHITESPACE_PATTERN.sub(" ", text.lower()).strip()
+    hashed = set()
+
+    words = WORD_PATTERN.findall(normalized)
+    previous = "<s>"
+    for word in words:
+        hashed.add(zlib.crc32(f"w:{word}".encode("utf-8")) & mask)
+        hashed.add(zlib.crc32(f"b:{previous} {word}".encode("utf-8")) & mask)
+        previous = word
+
+    padded = f" {normalized} "
+    low, high = CHAR_NGRAM_RANGE
+    for size in range(low, high + 1):
+        for start in range(len(padded) - size + 1):
+            hashed.add(zlib.crc32(f"c:{padded[start:start + size]}".encode("utf-8")) & mask)
+
+    indices = np.fromiter(hashed, dtype=np.int64, count=len(hashed))
+    values = np.full(len(indices), 1.0 / np.sqrt(len(indices)) if len(indices) else 0.0)
+    return indices, values
+
+
+def labels_from_result(result: Any) -> Optional[List[int]]:
+    """
+    从 CandidateTagger 的结果中取出五个维度的 0/1 标签
+
+    Args:
+        result: analyze_text 返回的完整字典、其中的 "result" 字段，或 [{"label", "containsCriteria"}, ...] 列表
+
+    Returns:
+        [0/1, ...]（按 DIMENSIONS 顺序），结构不完整时返回 None
+    """
+    if isinstance(result, dict) and "success" in result:
+        if not result.get("success") or result.get("provider") in LOCAL_PROVIDERS:
+            return None
+        result = result.get("result")
+    if isinstance(result, dict):
+        result = result.get("result")
+    if not isinstance(result, list) or len(result) != len(DIMENSIONS):
+        return None
+
+    labels = []
+    for label, item in zip(DIMENSIONS, result):
+        if not isinstance(item, dict) or item.get("label") != label or not isinstance(item.get("containsCriteria"), bool):
+            return None
+        labels.append(int(item["containsCriteria"]))
+    return labels
+
+
+def load_labeled_samples(file_path: str) -> List[Tuple[str, List[int]]]:
+    """
+    读取标注记录（JSONL，每行一条）
+
+    每行需要 "text"，标签取 "labels"（5 个 0/1 或布尔值）或 "result"（CandidateTagger 的结果）；
+    规则预分类器或本地模型给出的结果会被跳过，避免用模型自己的输出训练自己
+
+    Args:
+        file_path: JSONL 文件路径
+
+    Returns:
+        [(文本, 标签), ...]
+    """
+    samples = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            text = record.get("text") if isinstance(record, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                continue
+            labels = record.get("labels")
+            if isinstance(labels, list) and len(labels) == len(DIMENSIONS):
+                labels = [int(bool(value)) for value in labels]
+            else:
+                labels = labels_from_result(record.get("result"))
+            if labels is not None:
+                samples.append((text, labels))
+    return samples
+
+
+def _build_matrix(texts: List[str], hash_bits: int) -> Tuple[Any, Any, Any]:
+    """把文本列表转换为 CSR 形式的稀疏矩阵：(特征下标, 特征值, 每行起始位置)"""
+    indices = []
+    values = []
+    offsets = [0]
+    for text in texts:
+        row_indices, row_values = extract_features(text, hash_bits)
+        indices.append(row_indices)
+        values.append(row_values)
+        offsets.append(offsets[-1] + len(row_indices))
+    return np.concatenate(indices), np.concatenate(values), np.array(offsets, dtype=np.int64)
+
+
+def _sigmoid(logits):
+    return 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+
+
+class LocalTagger:
+    """
+    本地标签模型
+
+    用法：
+        model, report = train_local_tagger(load_labeled_samples("tagger_labels.jsonl"))
+        model.save("model/candidate_tagger_local.npz")
+        tagger = CandidateTagger(provider="local")   # 本地模型没把握时交给 LOCAL_TAGGER_FALLBACK_PROVIDER
+    """
+
+    def __init__(
+        self,
+        weights,
+        bias,
+        thresholds,
+        hash_bits: int = DEFAULT_HASH_BITS,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        初始化模型
+
+        Args:
+            weights: 权重矩阵，形状 (2 ** hash_bits, 5)
+            bias: 偏置，形状 (5,)
+            thresholds: 每个维度的置信度阈值，形状 (5,)
+            hash_bits: 特征哈希空间位数
+            metadata: 训练信息（样本数、验证集指标等）
+        """
+        _require_numpy()
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.hash_bits = hash_bits
+        self.metadata = metadata or {}
+        self.name = self.metadata.get("name", "local")
+
+        self.classified = 0
+        self.decided = 0
+        self.total_time = 0.0
+
+    @classmethod
+    def load(cls, file_path: str, thresholds: Optional[List[float]] = None) -> "LocalTagger":
+        """
+        从 .npz 文件加载模型
+
+        Args:
+            file_path: 模型文件路径
+            thresholds: 覆盖训练时校准的每个维度阈值
+
+        Returns:
+            LocalTagger
+        """
+        _require_numpy()
+        with np.load(file_path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            metadata.setdefault("name", Path(file_path).stem)
+            return cls(
+                weights=data["weights"],
+                bias=data["bias"],
+                thresholds=thresholds if thresholds is not None else data["thresholds"],
+                hash_bits=int(data["hash_bits"]),
+                metadata=metadata
+            )
+
+    def save(self, file_path: str) -> int:
+        """
+        保存为压缩的 .npz 文件（权重以 float16 存储）
+
+        Returns:
+            文件字节数
+        """
+        path = Path(file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights.astype(np.float16),
+                bias=self.bias,
+                thresholds=self.thresholds,
+                hash_bits=np.array(self.hash_bits),
+                metadata=np.array(json.dumps(self.metadata, ensure_ascii=False))
+            )
+        return path.stat().st_size
+
+    def predict_proba(self, texts: List[str]):
+        """
+        批量预测每个维度 "包含" 的概率
+
+        Returns:
+            形状 (len(texts), 5) 的概率矩阵
+        """
+        probabilities = np.empty((len(texts), len(DIMENSIONS)))
+        for row, text in enumerate(texts):
+            indices, values = extract_features(text, self.hash_bits)
+            logits = values @ self.weights[indices] + self.bias
+            probabilities[row] = _sigmoid(logits)
+        return probabilities
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        预测五个维度
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            {
+                "decided": bool,            # 五个维度的置信度都达到阈值，可以跳过 LLM
+                "result": {"result": [{"label", "containsCriteria"}, ...]},   # 与 CandidateTagger 结果结构相同
+                "confidence": [float, ...], # 每个维度的置信度 max(p, 1 - p)
+                "probabilities": [float, ...]
+            }
+        """
+        start = time.perf_counter()
+        try:
+            probabilities = self.predict_proba([text])[0]
+            confidence = np.maximum(probabilities, 1.0 - probabilities)
+            decided = bool(np.all(confidence >= self.thresholds))
+            if decided:
+                self.decided += 1
+            return {
+                "decided": decided,
+                "result": {
+                    "result": [
+                        {"label": label, "containsCriteria": bool(probability >= 0.5)}
+                        for label, probability in zip(DIMENSIONS, probabilities)
+                    ]
+                },
+                "confidence": [round(float(value), 4) for value in confidence],
+                "probabilities": [round(float(value), 4) for value in probabilities]
+            }
+        finally:
+            self.classified += 1
+            self.total_time += time.perf_counter() - start
+
+    def reset_stats(self):
+        self.classified = 0
+        self.decided = 0
+        self.total_time = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计：预测次数、本地直接给出结果（避免的 LLM 调用）次数、平均耗时"""
+        return {
+            "model": self.name,
+            "classified": self.classified,
+            "llm_avoided": self.decided,
+            "escalated": self.classified - self.decided,
+            "avoided_rate": round(self.decided / self.classified, 4) if self.classified else 0.0,
+            "avg_classify_us": round(self.total_time / self.classified * 1e6, 1) if self.classified else 0.0,
+            "thresholds": [round(float(value), 4) for value in self.thresholds]
+        }
+
+
+def calibrate_thresholds(probabilities, labels, target_precision: float):
+    """
+    为每个维度选择置信度阈值：置信度不低于阈值的验证样本中，预测精确率不低于 target_precision，且阈值尽量低
+
+    没有满足条件的阈值时该维度阈值为 inf（总是交给 LLM）
+    """
+    thresholds = np.full(len(DIMENSIONS), np.inf)
+    for dimension in range(len(DIMENSIONS)):
+        probability = probabilities[:, dimension]
+        confidence = np.maximum(probability, 1.0 - probability)
+        correct = (probability >= 0.5) == (labels[:, dimension] == 1)
+        order = np.argsort(-confidence, kind="stable")
+        precision = np.cumsum(correct[order]) / np.arange(1, len(order) + 1)
+        passing = np.nonzero(precision >= target_precision)[0]
+        if len(passing):
+            thresholds[dimension] = confidence[order][passing[-1]]
+    return thresholds
+
+
+def train_local_tagger(
+    samples: List[Tuple[str, List[int]]],
+    hash_bits: int = DEFAULT_HASH_BITS,
+    epochs: int = 10,
+    learning_rate: float = 0.5,
+    l2: float = 1e-6,
+    batch_size: int = 256,
+    validation_split: float = 0.1,
+    target_precision: Optional[float] = None,
+    seed: int = 0
+) -> Tuple[LocalTagger, Dict[str, Any]]:
+    """
+    训练本地标签模型（Adagrad 优化的多标签逻辑回归）
+
+    Args:
+        samples: [(文本, 五个维度的 0/1 标签), ...]
+        hash_bits: 特征哈希空间位数
+        epochs: 训练轮数
+        learning_rate: Adagrad 学习率
+        l2: L2 正则系数
+        batch_size: 每个小批量的样本数
+        validation_split: 留出用于校准阈值和评估的样本比例
+        target_precision: 校准阈值时要求的精确率，默认读取配置 LOCAL_TAGGER_TARGET_PRECISION
+        seed: 随机种子
+
+    Returns:
+        (模型, 训练报告)
+    """
+    _require_numpy()
+    if not samples:
+        raise ValueError("No labeled samples to train on")
+    target_precision = target_precision or config.LOCAL_TAGGER_TARGET_PRECISION
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(samples))
+    validation_count = int(len(samples) * validation_split)
+    if len(samples) - validation_count < 1:
+        validation_count = 0
+    validation = [samples[i] for i in order[:validation_count]]
+    training = [samples[i] for i in order[validation_count:]]
+
+    start = time.time()
+    indices, values, offsets = _build_matrix([text for text, _ in training], hash_bits)
+    labels = np.array([sample_labels for _, sample_labels in training], dtype=np.float64)
+    row_ids = np.repeat(np.arange(len(training)), np.diff(offsets))
+
+    weights = np.zeros((1 << hash_bits, len(DIMENSIONS)))
+    bias = np.zeros(len(DIMENSIONS))
+    weights_sq = np.zeros_like(weights)
+    bias_sq = np.zeros_like(bias)
+    eps = 1e-8
+
+    batch_starts = np.arange(0, len(training), batch_size)
+    for _ in range(epochs):
+        for batch_start in rng.permutation(batch_starts):
+            batch_end = min(batch_start + batch_size, len(training))
+            low, high = offsets[batch_start], offsets[batch_end]
+            batch_indices = indices[low:high]
+            batch_values = values[low:high, None]
+            batch_rows = row_ids[low:high] - batch_start
+
+            logits = np.zeros((batch_end - batch_start, len(DIMENSIONS)))
+            np.add.at(logits, batch_rows, weights[batch_indices] * batch_values)
+            error = (_sigmoid(logits + bias) - labels[batch_start:batch_end]) / (batch_end - batch_start)
+
+            # 只更新本批次出现过的特征
+            unique, inverse = np.unique(batch_indices, return_inverse=True)
+            gradient = np.zeros((len(unique), len(DIMENSIONS)))
+            np.add.at(gradient, inverse, error[batch_rows] * batch_values)
+            gradient += l2 * weights[unique]
+            weights_sq[unique] += gradient ** 2
+            weights[unique] -= learning_rate * gradient / (np.sqrt(weights_sq[unique]) + eps)
+
+            bias_gradient = error.sum(axis=0)
+            bias_sq += bias_gradient ** 2
+            bias -= learning_rate * bias_gradient / (np.sqrt(bias_sq) + eps)
+
+    model = LocalTagger(weights, bias, np.full(len(DIMENSIONS), np.inf), hash_bits)
+    report: Dict[str, Any] = {
+        "train_samples": len(training),
+        "validation_samples": len(validation),
+        "train_seconds": round(time.time() - start, 2),
+        "target_precision": target_precision
+    }
+
+    if validation:
+        validation_labels = np.array([sample_labels for _, sample_labels in validation])
+        probabilities = model.predict_proba([text for text, _ in validation])
+        model.thresholds = calibrate_thresholds(probabilities, validation_labels, target_precision)
+
+        predicted = (probabilities >= 0.5).astype(int)
+        confidence = np.maximum(probabilities, 1.0 - probabilities)
+        decided = np.all(confidence >= model.thresholds, axis=1)
+        report.update({
+            "accuracy": [round(float(value), 4) for value in (predicted == validation_labels).mean(axis=0)],
+            "exact_match": round(float(np.all(predicted == validation_labels, axis=1).mean()), 4),
+            "decided_rate": round(float(decided.mean()), 4),
+            "decided_exact_match": (
+                round(float(np.all(predicted[decided] == validation_labels[decided], axis=1).mean()), 4)
+                if decided.any() else None
+            ),
+        })
+    report["thresholds"] = [round(float(value), 4) if np.isfinite(value) else None for value in model.thresholds]
+    model.metadata = {"name": "local", "hash_bits": hash_bits, **report}
+    return model, report
+
+
+_models: Dict[str, LocalTagger] = {}
+
+
+def get_local_tagger(model_path: Optional[str] = None) -> LocalTagger:
+    """
+    获取（并缓存）本地模型，同一进程内同一文件只加载一次
+
+    Args:
+        model_path: 模型文件路径，默认读取配置 LOCAL_TAGGER_MODEL_PATH（相对路径相对项目根目录）
+    """
+    path = Path(model_path or config.LOCAL_TAGGER_MODEL_PATH)
+    if not path.is_absolute():
+        path = project_root / path
+    key = str(path)
+    model = _models.get(key)
+    if model is None:
+        if not path.exists():
+            raise FileNotFoundError(f"Local tagger model not found: {path}（先运行 python function/local_tagger.py train）")
+        model = _models.setdefault(key, LocalTagger.load(key))
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地标签模型训练与预测")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="用标注记录（JSONL）训练模型")
+    train_parser.add_argument("--data", required=True, help="JSONL 文件，每行含 text 和 labels 或 result")
+    train_parser.add_argument("--output", default=None, help="模型文件路径，默认 LOCAL_TAGGER_MODEL_PATH")
+    train_parser.add_argument("--hash-bits", type=int, default=DEFAULT_HASH_BITS)
+    train_parser.add_argument("--epochs", type=int, default=10)
+    train_parser.add_argument("--target-precision", type=float, default=None)
+
+    predict_parser = subparsers.add_parser("predict", help="用已训练的模型预测")
+    predict_parser.add_argument("texts", nargs="+")
+    predict_parser.add_argument("--model", default=None, help="模型文件路径，默认 LOCAL_TAGGER_MODEL_PATH")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        samples = load_labeled_samples(args.data)
+        print(f"📚 {len(samples)} 条标注样本")
+        model, report = train_local_tagger(
+            samples, hash_bits=args.hash_bits, epochs=args.epochs, target_precision=args.target_precision
+        )
+        output = Path(args.output or config.LOCAL_TAGGER_MODEL_PATH)
+        if not output.is_absolute() and not args.output:
+            output = project_root / output
+        size = model.save(str(output))
+        print(f"✅ 模型已保存: {output}（{size / 1024:.1f} KB）")
+        print(f"📊 {json.dumps(report, ensure_ascii=False)}")
+        return
+
+    model = get_local_tagger(args.model)
+    for text in args.texts:
+        classification = model.classify(text)
+        status = "✅ 本地结果" if classification["decided"] else "➡️ 交给 LLM"
+        bits = "".join("1" if item["containsCriteria"] else "0" for item in classification["result"]["result"])
+        print(f"{status}  {bits}  置信度 {classification['confidence']}  {text}")
+
+    # 粗略测量吞吐量
+    start = time.perf_counter()
+    for _ in range(1000):
+        model.classify(args.texts[0])
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {1000 / elapsed:.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+规则预分类器
+在 CandidateTagger 调用 LLM 之前，用本地规则（经验年限正则、地点词表、职位词表、行业词表、技能词典）
+判断短查询的五个维度；五个维度都有足够把握时直接返回，不调用 LLM，否则交给 LLM
+
+置信度：
+- 命中规则的维度使用该规则的精确率（默认值为人工估计，可用 calibrate() 按 LLM 标注结果校准）
+- 未命中的维度只有在查询中每个词都能被规则或常见虚词解释时才判为不包含，置信度为 "absent" 规则的精确率
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from util.industry_extractor import extract_linkedin_industry_labels
+
+
+# 五个维度，顺序与 CandidateTagger 的 TAG_LABELS 一致
+DIMENSIONS = ["Location", "Job Title", "Years of Experience", "Industry", "Skills"]
+
+# 各规则命中时的默认置信度（精确率估计）
+DEFAULT_RULE_CONFIDENCE = {
+    "experience": 0.98,
+    "seniority": 0.93,
+    "location": 0.95,
+    "work_mode": 0.95,
+    "job_title": 0.93,
+    "industry": 0.9,
+    "skill": 0.93,
+    "absent": 0.95,
+}
+
+# 经验年限："5+ years"、"3-5 yrs"、"10 years of"、"3-5年"、"五年以上"（最多两位数，"2024年" 这类年份不算）
+EXPERIENCE_PATTERNS = [
+    r"(?<!\d)\d{1,2}\s*\+?(?:\s*(?:-|–|~|to)\s*\d{1,2})?\s*\+?\s*(?:years?|yrs?)\b",
+    r"(?<!\d)\d{1,2}(?:\s*(?:-|~|到|至)\s*\d{1,2})?\s*年(?:以上|以下|左右)?(?:工作)?(?:经验)?",
+    r"[一二三四五六七八九十两]+年(?:以上|以下|左右)?(?:工作)?(?:经验)?",
+]
+
+# 资历等级（提示词约定 "senior developer" 隐含经验要求）
+SENIORITY_TERMS = [
+    "senior", "sr", "junior", "jr", "entry level", "entry-level", "mid level", "mid-level", "mid-senior",
+    "principal", "staff", "lead", "veteran", "experienced", "graduate", "new grad", "intern", "internship",
+    "资深", "高级", "中级", "初级", "应届", "实习", "实习生", "专家",
+]
+
+# 远程/混合办公
+WORK_MODE_TERMS = ["remote", "fully remote", "hybrid", "onsite", "on-site", "in office", "wfh", "远程", "居家办公"]
+
+# 地点词表（常见城市、国家、地区）
+LOCATION_TERMS = [
+    # 北美
+    "usa", "united states", "america", "canada", "new york", "nyc", "san francisco", "sf", "bay area",
+    "silicon valley", "los angeles", "seattle", "boston", "chicago", "austin", "denver", "atlanta", "miami",
+    "dallas", "houston", "washington dc", "dc", "toronto", "vancouver", "montreal", "san jose", "san diego",
+    "portland", "philadelphia", "phoenix", "new jersey", "california", "texas", "florida", "tx", "ca", "ny", "wa",
+    # 欧洲
+    "uk", "united kingdom", "london", "manchester", "edinburgh", "dublin", "ireland", "germany", "berlin",
+    "munich", "hamburg", "france", "paris", "amsterdam", "netherlands", "spain", "madrid", "barcelona", "italy",
+    "milan", "zurich", "switzerland", "stockholm", "sweden", "copenhagen", "oslo", "helsinki", "warsaw",
+    "poland", "lisbon", "portugal", "vienna", "prague", "europe", "emea",
+    # 亚太
+    "china", "beijing", "shanghai", "shenzhen", "guangzhou", "hangzhou", "chengdu", "hong kong", "hk", "taiwan",
+    "taipei", "singapore", "japan", "tokyo", "osaka", "korea", "seoul", "india", "bangalore", "bengaluru",
+    "mumbai", "delhi", "hyderabad", "pune", "sydney", "melbourne", "australia", "new zealand", "auckland",
+    "malaysia", "kuala lumpur", "vietnam", "ho chi minh", "hanoi", "thailand", "bangkok", "indonesia",
+    "jakarta", "philippines", "manila", "dubai", "uae", "israel", "tel aviv", "apac", "asia", "latam",
+    "brazil", "sao paulo", "mexico", "mexico city", "argentina", "buenos aires",
+    "北京", "上海", "深圳", "广州", "杭州", "成都", "南京", "武汉", "西安", "苏州", "天津", "重庆", "厦门",
+    "长沙", "青岛", "合肥", "香港", "台北", "新加坡", "东京", "首尔", "伦敦", "纽约", "硅谷", "海外", "国内",
+    "中国", "美国", "日本", "英国", "德国",
+]
+
+# 职位词表
+JOB_TITLE_TERMS = [
+    "engineer", "engineers", "developer", "developers", "programmer", "architect", "scientist", "scientists",
+    "analyst", "analysts", "manager", "managers", "director", "designer", "designers", "consultant",
+    "administrator", "admin", "specialist", "coordinator", "recruiter", "sourcer", "accountant", "auditor",
+    "nurse", "nurses", "physician", "doctor", "pharmacist", "therapist", "teacher", "tutor", "lawyer",
+    "attorney", "paralegal", "researcher", "technician", "operator", "assistant", "executive", "officer",
+    "representative", "rep", "associate", "advisor", "strategist", "writer", "editor", "marketer",
+    "salesperson", "account executive", "account manager", "product manager", "project manager",
+    "program manager", "product owner", "scrum master", "head of", "vp", "vice president", "cto", "ceo", "cfo",
+    "coo", "cmo", "cio", "ciso", "founder", "co-founder", "devops", "sre", "qa", "tester", "data scientist",
+    "data engineer", "data analyst", "full stack", "fullstack", "frontend", "front-end", "backend", "back-end",
+    "sales", "bdr", "sdr", "hr", "hrbp", "controller", "bookkeeper", "cashier", "driver", "chef", "pilot",
+    "工程师", "开发", "程序员", "架构师", "科学家", "分析师", "经理", "总监", "主管", "设计师", "顾问", "专员",
+    "助理", "会计", "审计", "护士", "医生", "药剂师", "教师", "老师", "律师", "研究员", "技术员", "运营",
+    "销售", "市场", "产品经理", "项目经理", "测试", "算法", "前端", "后端", "全栈", "总裁", "副总裁", "合伙人",
+    "猎头", "招聘", "人事", "财务", "客服",
+]
+
+# 行业词表（LinkedIn 行业分类不可用时使用，可用时合并）
+INDUSTRY_TERMS = [
+    "fintech", "finance", "financial", "financial services", "banking", "bank", "insurance", "insurtech",
+    "investment", "asset management", "private equity", "venture capital", "hedge fund", "accounting",
+    "healthcare", "health care", "hospital", "medical", "medtech", "biotech", "pharma", "pharmaceutical",
+    "life sciences", "saas", "e-commerce", "ecommerce", "retail", "consumer goods", "cpg", "fmcg",
+    "semiconductor", "semiconductors", "automotive", "manufacturing", "aerospace", "defense", "energy",
+    "oil and gas", "renewable", "telecom", "telecommunications", "media", "entertainment", "gaming", "games",
+    "education", "edtech", "real estate", "proptech", "construction", "logistics", "supply chain",
+    "transportation", "hospitality", "travel", "food and beverage", "agriculture", "government", "public sector",
+    "nonprofit", "non-profit", "legal", "consulting", "advertising", "adtech", "marketing agency", "crypto",
+    "blockchain", "web3", "cybersecurity", "startup", "startups", "b2b", "b2c",
+    "金融", "银行", "保险", "证券", "基金", "互联网", "医疗", "医药", "生物", "电商", "零售", "快消", "半导体",
+    "芯片", "汽车", "新能源", "制造", "航空", "能源", "通信", "传媒", "游戏", "教育", "房地产", "物流",
+    "供应链", "酒店", "旅游", "餐饮", "农业", "政府", "法律", "咨询", "广告", "区块链", "网络安全", "云计算",
+    "人工智能", "外企", "国企", "创业公司",
+]
+
+# 技能词典
+SKILL_TERMS = [
+    "python", "java", "javascript", "typescript", "golang", "rust", "ruby", "php", "scala", "kotlin", "swift",
+    "objective-c", "c++", "c#", ".net", "sql", "nosql", "mysql", "postgresql", "postgres", "mongodb", "redis",
+    "kafka", "spark", "hadoop", "flink", "airflow", "dbt", "snowflake", "databricks", "tableau", "power bi",
+    "excel", "aws", "azure", "gcp", "kubernetes", "k8s", "docker", "terraform", "linux", "git", "ci/cd",
+    "react", "vue", "angular", "node", "node.js", "nodejs", "django", "flask", "fastapi", "spring",
+    "spring boot", "graphql", "restful", "microservices", "machine learning", "ml", "deep learning", "nlp",
+    "computer vision", "llm", "pytorch", "tensorflow", "scikit-learn", "pandas", "statistics", "r",
+    "matlab", "verilog", "vhdl", "fpga", "embedded", "ios", "android", "figma", "sketch", "photoshop",
+    "salesforce", "sap", "erp", "crm", "seo", "sem", "agile", "scrum", "pmp", "cpa", "cfa", "six sigma",
+    "mandarin", "english", "japanese", "german", "french", "spanish", "communication", "leadership",
+    "negotiation", "excel vba",
+    "英语", "日语", "普通话", "粤语", "机器学习", "深度学习", "自然语言处理", "计算机视觉", "大模型",
+    "数据分析", "沟通", "领导力", "谈判",
+]
+
+# 不影响任何维度的常见虚词（判断 "查询已被完全解释" 时忽略）
+FILLER_TERMS = [
+    "a", "an", "the", "and", "or", "of", "in", "at", "on", "for", "with", "to", "from", "by", "as", "is", "are",
+    "be", "we", "our", "us", "you", "your", "i", "am", "who", "that", "this", "some", "any", "plus", "preferred",
+    "required", "looking", "look", "seeking", "seek", "hiring", "hire", "need", "needed", "needs", "want",
+    "wanted", "find", "search", "searching", "candidate", "candidates", "role", "roles", "position", "positions",
+    "job", "jobs", "opening", "based", "experience", "knowledge", "skills", "skill",
+    "strong", "good", "familiar", "proficient", "background", "level", "years", "year", "yrs", "min", "minimum",
+    "least", "more", "than", "over", "up", "around", "about", "at least", "open", "full time", "full-time",
+    "part time", "part-time", "contract", "permanent", "team", "company", "who has", "have", "has", "having",
+    "招聘", "寻找", "找", "需要", "要求", "的", "和", "与", "及", "或", "有", "在", "熟悉", "精通", "掌握", "了解",
+    "经验", "以上", "以下", "左右", "优先", "岗位", "职位", "候选人", "人选", "方向", "相关", "能力", "背景",
+    "全职", "兼职", "工作", "公司", "团队", "一名", "名", "位",
+]
+
+
+# ASCII 词切分：字母数字及 + # . / - 组成的词（"c++"、"c#"、".net"、"node.js"、"ci/cd"、"front-end"）
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*|\.[a-z0-9]+")
+
+# 计算覆盖率时不计入的字符（空白和标点）
+NON_CONTENT_PATTERN = re.compile(r"[^\w+#]+")
+
+# 规则 -> 维度下标（虚词不属于任何维度）
+RULE_DIMENSIONS = {
+    "location": 0, "work_mode": 0, "job_title": 1, "experience": 2, "seniority": 2,
+    "industry": 3, "skill": 4, "filler": None,
+}
+
+
+def _build_lexicon(rule_terms: Dict[str, Iterable[str]]) -> Tuple[Dict[str, Tuple[str, ...]], int, Optional[re.Pattern]]:
+    """
+    把各规则的词表编译为查找结构
+
+    ASCII 词按切分后的词序列放进字典（"spring boot" -> ("skill",)），匹配时从每个词开始做最长匹配，
+    不用带单词边界的大正则，夹在中文里的英文词（"3-5年Java开发"）也能命中；中文词没有分词，编译为一个长词优先的正则
+
+    Returns:
+        (词序列 -> 规则名元组, 最长词序列的词数, 中文词正则)
+    """
+    phrases: Dict[str, Tuple[str, ...]] = {}
+    cjk_terms: Dict[str, Tuple[str, ...]] = {}
+    for rule_name, terms in rule_terms.items():
+        for term in terms:
+            term = term.strip().lower()
+            if not term:
+                continue
+            if term.isascii():
+                key = " ".join(TOKEN_PATTERN.findall(term))
+                if key and rule_name not in phrases.get(key, ()):
+                    phrases[key] = phrases.get(key, ()) + (rule_name,)
+            elif rule_name not in cjk_terms.get(term, ()):
+                cjk_terms[term] = cjk_terms.get(term, ()) + (rule_name,)
+
+    # 中文词的规则名与 ASCII 词放在同一个字典里，按匹配到的原文查找
+    for term, rule_names in cjk_terms.items():
+        phrases[term] = rule_names
+    max_words = max((key.count(" ") + 1 for key in phrases if key.isascii()), default=1)
+    cjk_pattern = None
+    if cjk_terms:
+        cjk_pattern = re.compile("|".join(re.escape(term) for term in sorted(cjk_terms, key=len, reverse=True)))
+    return phrases, max_words, cjk_pattern
+
+
+def load_industry_terms(json_file_path: Optional[str] = None) -> List[str]:
+    """
+    行业词表：内置词表合并 LinkedIn 行业分类标签（util/industry_extractor.py 读取的文件不存在时只用内置词表）
+    """
+    terms = list(INDUSTRY_TERMS)
+    try:
+        terms.extend(extract_linkedin_industry_labels(json_file_path))
+    except (FileNotFoundError, ValueError):
+        pass
+    return terms
+
+
+class RuleTagger:
+    """
+    规则预分类器
+
+    用法：
+        rules = RuleTagger()
+        tagger = CandidateTagger(rule_tagger=rules)   # analyze_text 先走规则，无把握时才调用 LLM
+        rules.get_stats()["llm_avoided"]
+    """
+
+    def __init__(
+        self,
+        confidence_threshold: Optional[float] = None,
+        max_chars: Optional[int] = None,
+        industries_file: Optional[str] = None
+    ):
+        """
+        初始化预分类器
+
+        Args:
+            confidence_threshold: 每个维度的置信度都不低于该值时才跳过 LLM，默认读取配置 RULE_TAGGER_CONFIDENCE
+            max_chars: 只对不超过该长度的查询使用规则（长职位描述直接交给 LLM），默认读取配置 RULE_TAGGER_MAX_CHARS
+            industries_file: LinkedIn 行业分类 JSON 文件路径，默认使用 util/industry_extractor.py 的默认路径
+        """
+        self.confidence_threshold = confidence_threshold or config.RULE_TAGGER_CONFIDENCE
+        self.max_chars = max_chars or config.RULE_TAGGER_MAX_CHARS
+        self.rule_confidence = dict(DEFAULT_RULE_CONFIDENCE)
+
+        self.experience_pattern = re.compile("|".join(EXPERIENCE_PATTERNS))
+        self.phrases, self.max_words, self.cjk_pattern = _build_lexicon({
+            "location": LOCATION_TERMS,
+            "work_mode": WORK_MODE_TERMS,
+            "job_title": JOB_TITLE_TERMS,
+            "seniority": SENIORITY_TERMS,
+            "industry": load_industry_terms(industries_file),
+            "skill": SKILL_TERMS,
+            "filler": FILLER_TERMS,
+        })
+
+        self.classified = 0
+        self.decided = 0
+        self.skipped_long = 0
+        self.total_time = 0.0
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        用规则判断五个维度
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            {
+                "decided": bool,            # 五个维度都达到置信度阈值，可以跳过 LLM
+                "result": {"result": [{"label", "containsCriteria"}, ...]},   # 与 CandidateTagger 结果结构相同
+                "confidence": [float, ...], # 每个维度的置信度
+                "rules": [str or None, ...],# 每个维度命中的规则（未命中为 None）
+                "coverage": float           # 查询中被规则或虚词解释的字符比例
+            }
+        """
+        start = time.perf_counter()
+        try:
+            if len(text) > self.max_chars:
+                self.skipped_long += 1
+                return self._undecided()
+
+            lowered = text.lower()
+            spans: List[Tuple[int, int]] = []
+            fired: List[Optional[str]] = [None] * 5
+
+            def fire(rule_names: Tuple[str, ...], span: Tuple[int, int]):
+                spans.append(span)
+                for rule_name in rule_names:
+                    dimension = RULE_DIMENSIONS[rule_name]
+                    if dimension is None:
+                        continue
+                    current = fired[dimension]
+                    if current is None or self.rule_confidence[rule_name] > self.rule_confidence[current]:
+                        fired[dimension] = rule_name
+
+            for match in self.experience_pattern.finditer(lowered):
+                fire(("experience",), match.span())
+            if self.cjk_pattern is not None and not lowered.isascii():
+                for match in self.cjk_pattern.finditer(lowered):
+                    fire(self.phrases[match.group()], match.span())
+
+            # ASCII 词：从每个词开始取最长的已知词序列
+            tokens = []
+            for match in TOKEN_PATTERN.finditer(lowered):
+                token = match.group().rstrip(".-/")
+                tokens.append((token, match.start(), match.start() + len(token)))
+            position = 0
+            while position < len(tokens):
+                for length in range(min(self.max_words, len(tokens) - position), 0, -1):
+                    window = tokens[position:position + length]
+                    rule_names = self.phrases.get(" ".join(token for token, _, _ in window))
+                    if rule_names:
+                        fire(rule_names, (window[0][1], window[-1][2]))
+                        position += length
+                        break
+                else:
+                    position += 1
+
+            coverage = self._coverage(lowered, spans)
+            confidence = []
+            for rule_name in fired:
+                if rule_name is not None:
+                    confidence.append(self.rule_confidence[rule_name])
+                else:
+                    # 只有整句都被解释时，"没命中" 才意味着 "不包含"
+                    confidence.append(self.rule_confidence["absent"] * coverage)
+
+            decided = all(value >= self.confidence_threshold for value in confidence)
+            if decided:
+                self.decided += 1
+            return {
+                "decided": decided,
+                "result": {
+                    "result": [
+                        {"label": label, "containsCriteria": rule_name is not None}
+                        for label, rule_name in zip(DIMENSIONS, fired)
+                    ]
+                },
+                "confidence": [round(value, 4) for value in confidence],
+                "rules": fired,
+                "coverage": round(coverage, 4)
+            }
+        finally:
+            self.classified += 1
+            self.total_time += time.perf_counter() - start
+
+    @staticmethod
+    def _coverage(text: str, spans: List[Tuple[int, int]]) -> float:
+        """被解释的非空白、非标点字符比例"""
+        total = len(NON_CONTENT_PATTERN.sub("", text))
+        if not total:
+            return 0.0
+        remaining = []
+        cursor = 0
+        for start, end in sorted(spans):
+            if start > cursor:
+                remaining.append(text[cursor:start])
+            cursor = max(cursor, end)
+        remaining.append(text[cursor:])
+        unexplained = len(NON_CONTENT_PATTERN.sub("", "".join(remaining)))
+        return (total - unexplained) / total
+
+    @staticmethod
+    def _undecided() -> Dict[str, Any]:
+        return {"decided": False, "result": None, "confidence": [0.0] * 5, "rules": [None] * 5, "coverage": 0.0}
+
+    def calibrate(self, samples: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        用 LLM 标注结果校准各规则的置信度（拉普拉斯平滑后的精确率）
+
+        Args:
+            samples: [(查询文本, CandidateTagger 结果中的 "result" 字段)]
+
+        Returns:
+            {规则名: {"correct": int, "total": int, "confidence": float}}
+        """
+        counts = {name: [0, 0] for name in self.rule_confidence}
+        for text, labeled in samples:
+            if not labeled or len(text) > self.max_chars:
+                continue
+            classification = self.classify(text)
+            for index, item in enumerate(labeled["result"]):
+                rule_name = classification["rules"][index]
+                if rule_name is None:
+                    if classification["coverage"] < 1.0:
+                        continue
+                    rule_name = "absent"
+                predicted = rule_name != "absent"
+                counts[rule_name][1] += 1
+                counts[rule_name][0] += predicted == item["containsCriteria"]
+
+        report = {}
+        for name, (correct, total) in counts.items():
+            if total:
+                self.rule_confidence[name] = (correct + 1) / (total + 2)
+            report[name] = {"correct": correct, "total": total, "confidence": round(self.rule_confidence[name], 4)}
+        # 校准过程中的调用不计入统计
+        self.reset_stats()
+        return report
+
+    def reset_stats(self):
+        self.classified = 0
+        self.decided = 0
+        self.skipped_long = 0
+        self.total_time = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计：分类次数、规则直接给出结果（避免的 LLM 调用）次数、平均耗时"""
+        return {
+            "classified": self.classified,
+            "llm_avoided": self.decided,
+            "escalated": self.classified - self.decided,
+            "skipped_long": self.skipped_long,
+            "avoided_rate": round(self.decided / self.classified, 4) if self.classified else 0.0,
+            "avg_classify_us": round(self.total_time / self.classified * 1e6, 1) if self.classified else 0.0
+        }
+
+
+if __name__ == "__main__":
+    queries = sys.argv[1:] or [
+        "Senior Python developer in Berlin, 5+ years fintech",
+        "3-5年Java开发经验，上海，熟悉Spring Boot",
+        "remote product manager",
+        "Looking for Python developers in New York with machine learning experience",
+        "Looking for someone great to join our team",
+        "data scientist",
+    ]
+
+    rules = RuleTagger()
+    print("🧩 规则预分类")
+    print("=" * 50)
+    for query in queries:
+        classification = rules.classify(query)
+        status = "✅ 跳过 LLM" if classification["decided"] else "➡️ 交给 LLM"
+        print(f"{status}  {query}")
+        if classification["result"]:
+            bits = "".join("1" if item["containsCriteria"] else "0" for item in classification["result"]["result"])
+            print(f"   {bits}  置信度 {classification['confidence']}  覆盖率 {classification['coverage']}")
+
+    # 粗略测量单条耗时
+    start = time.perf_counter()
+    for _ in range(1000):
+        for query in queries:
+            rules.classify(query)
+    elapsed = (time.perf_counter() - start) / (1000 * len(queries))
+    print("=" * 50)
+    print(f"⏱️ 平均 {elapsed * 1e6:.1f} µs/条")
+    print(f"📊 {rules.get_stats()}")
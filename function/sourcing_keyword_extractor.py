@@ -26,7 +26,8 @@ class SourcingKeywordExtractor:
         max_tokens: int = 2000,
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
-        presence_penalty: float = 0.0
+        presence_penalty: float = 0.0,
+        llm_client: Optional[LLMClient] = None
     ):
         """
         初始化寻访关键词提取器
@@ -39,8 +40,9 @@ class SourcingKeywordExtractor:
             top_p: 核采样参数 (0-1)，默认1.0
             frequency_penalty: 频率惩罚 (-2.0 to 2.0)，默认0.0
             presence_penalty: 存在惩罚 (-2.0 to 2.0)，默认0.0
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
         """
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or LLMClient()
         self.model = model
         self.provider = provider
         self.temperature = temperature
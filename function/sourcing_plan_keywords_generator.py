@@ -1,15 +1,18 @@
 import json
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 import re
 import sys
+import time
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from api.llm import LLMClient
+from api.stream import StreamResponse, create_stream_response
+from util.boilerplate import BoilerplateStripper
 
 
 class SourcingPlanGenerator:
@@ -26,7 +29,9 @@ class SourcingPlanGenerator:
         max_tokens: int = 4000,
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
-        presence_penalty: float = 0.0
+        presence_penalty: float = 0.0,
+        llm_client: Optional[LLMClient] = None,
+        boilerplate_stripper: Optional[BoilerplateStripper] = None
     ):
         """
         初始化寻访策略生成器
@@ -39,8 +44,11 @@ class SourcingPlanGenerator:
             top_p: 核采样参数 (0-1)，默认1.0
             frequency_penalty: 频率惩罚 (-2.0 to 2.0)，默认0.0
             presence_penalty: 存在惩罚 (-2.0 to 2.0)，默认0.0
+            llm_client: 共享的 LLM 客户端（复用连接池），默认新建
+            boilerplate_stripper: 样板剥离器（见 util/boilerplate.py）；设置后职位描述先删除平等就业声明、福利等样板段落，
+                结果另含 "boilerplate": 节省的 token 数和删除的段落；input_info 中仍为原文
         """
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or LLMClient()
         self.model = model
         self.provider = provider
         self.temperature = temperature
@@ -48,6 +56,7 @@ class SourcingPlanGenerator:
         self.top_p = top_p
         self.frequency_penalty = frequency_penalty
         self.presence_penalty = presence_penalty
+        self.boilerplate_stripper = boilerplate_stripper
         self.prompt_template = self._load_prompt_template()
     
     def _load_prompt_template(self) -> str:
@@ -131,34 +140,171 @@ Detect the input language and respond in the same language (Chinese or English).
             包含寻访策略的字典
         """
         # 验证输入
-        if not jd_content or not jd_content.strip():
+        input_error = self._validate_inputs(jd_content, company_name, position_title)
+        if input_error:
             return {
                 "success": False,
-                "error": "Job description content is empty",
+                "error": input_error,
                 "result": None
             }
         
-        if not company_name or not company_name.strip():
+        detected_language = self._resolve_language(jd_content, company_name, position_title, output_language)
+        prompt_jd, boilerplate = self._strip_boilerplate(jd_content)
+        messages = self._build_messages(prompt_jd, company_name, position_title, detected_language)
+        
+        # 合并默认参数和传入参数
+        llm_params = self._build_llm_params(**kwargs)
+        
+        try:
+            # 调用LLM
+            response = self.llm_client.call_llm(
+                provider=self.provider,
+                model=self.model,
+                messages=messages,
+                **llm_params
+            )
+            
+            if not response.get("success"):
+                return {
+                    "success": False,
+                    "error": f"LLM call failed: {response.get('error', 'Unknown error')}",
+                    "result": None,
+                    "raw_response": response
+                }
+            
+            # 提取响应内容
+            content = self.llm_client.get_response_content(response)
+            if not content:
+                return {
+                    "success": False,
+                    "error": "No content in LLM response",
+                    "result": None,
+                    "raw_response": response
+                }
+            
+            return self._build_success_result(
+                content,
+                jd_content,
+                company_name,
+                position_title,
+                detected_language,
+                usage=response.get("data", {}).get("usage", {}),
+                model_used=response.get("data", {}).get("model", self.model),
+                boilerplate=boilerplate
+            )
+            
+        except Exception as e:
             return {
                 "success": False,
-                "error": "Company name is empty",
+                "error": f"Sourcing plan generation failed: {str(e)}",
                 "result": None
             }
+    
+    def stream_generate_sourcing_plan(
+        self, 
+        jd_content: str, 
+        company_name: str, 
+        position_title: str,
+        output_language: str = "auto",
+        **kwargs
+    ) -> StreamResponse:
+        """
+        流式生成寻访策略，使用与 generate_sourcing_plan 相同的 prompt，首个 token 生成后即可开始展示
         
+        Args:
+            jd_content: 职位描述内容
+            company_name: 公司名称
+            position_title: 岗位标题
+            output_language: 输出语言 ("auto", "chinese", "english")
+            **kwargs: 传递给LLM的额外参数
+            
+        Returns:
+            StreamResponse: 流式响应对象；流正常结束后发送 type 为 "result" 的块，
+            其 metadata.result 与 generate_sourcing_plan 的返回值相同
+            
+        Raises:
+            ValueError: 输入为空
+        """
+        input_error = self._validate_inputs(jd_content, company_name, position_title)
+        if input_error:
+            raise ValueError(input_error)
+        
+        detected_language = self._resolve_language(jd_content, company_name, position_title, output_language)
+        prompt_jd, boilerplate = self._strip_boilerplate(jd_content)
+        messages = self._build_messages(prompt_jd, company_name, position_title, detected_language)
+        llm_params = self._build_llm_params(**kwargs)
+        
+        start_time = time.time()
+        raw_stream = self.llm_client.stream_llm(
+            provider=self.provider,
+            model=self.model,
+            messages=messages,
+            **llm_params
+        )
+        
+        return create_stream_response(
+            raw_stream,
+            self.provider,
+            start_time=start_time,
+            max_tokens=llm_params.get("max_tokens"),
+            result_builder=lambda content, usage: self._build_success_result(
+                content,
+                jd_content,
+                company_name,
+                position_title,
+                detected_language,
+                usage=usage,
+                model_used=self.model,
+                boilerplate=boilerplate
+            )
+        )
+    
+    def _validate_inputs(self, jd_content: str, company_name: str, position_title: str) -> Optional[str]:
+        """
+        验证输入
+        
+        Returns:
+            错误信息，输入有效时返回 None
+        """
+        if not jd_content or not jd_content.strip():
+            return "Job description content is empty"
+        if not company_name or not company_name.strip():
+            return "Company name is empty"
         if not position_title or not position_title.strip():
-            return {
-                "success": False,
-                "error": "Position title is empty", 
-                "result": None
-            }
+            return "Position title is empty"
+        return None
+    
+    def _resolve_language(
+        self, 
+        jd_content: str, 
+        company_name: str, 
+        position_title: str,
+        output_language: str
+    ) -> str:
+        """
+        确定输出语言
         
-        # 确定输出语言
+        Returns:
+            语言类型 ("chinese" 或 "english" 等)
+        """
         if output_language == "auto":
             combined_text = f"{jd_content} {company_name} {position_title}"
-            detected_language = self._detect_language(combined_text)
-        else:
-            detected_language = output_language.lower()
+            return self._detect_language(combined_text)
+        return output_language.lower()
+    
+    def _build_messages(
+        self, 
+        jd_content: str, 
+        company_name: str, 
+        position_title: str,
+        detected_language: str
+    ) -> List[Dict[str, str]]:
+        """
+        构建LLM消息
         
+        Returns:
+            消息列表
+        """
         # 根据语言设置添加语言指定指令
         language_instruction = ""
         if detected_language == "chinese":
@@ -182,73 +328,62 @@ Detect the input language and respond in the same language (Chinese or English).
 
 Please generate a comprehensive sourcing plan following the framework provided above.{language_instruction}"""
         
-        messages = [
+        return [
             {
                 "role": "user",
                 "content": full_prompt
             }
         ]
-        
-        # 合并默认参数和传入参数
-        llm_params = {
+    
+    def _strip_boilerplate(self, jd_content: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """启用样板剥离时返回 (剥离后的职位描述, 剥离报告)，否则返回 (原文, None)"""
+        if self.boilerplate_stripper is None:
+            return jd_content, None
+        stripped = self.boilerplate_stripper.strip(jd_content)
+        return stripped["text"], {key: value for key, value in stripped.items() if key != "text"}
+    
+    def _build_llm_params(self, **kwargs) -> Dict[str, Any]:
+        """合并默认参数和传入参数，传入的参数会覆盖默认参数"""
+        return {
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "top_p": self.top_p,
             "frequency_penalty": self.frequency_penalty,
             "presence_penalty": self.presence_penalty,
-            **kwargs  # 传入的参数会覆盖默认参数
+            **kwargs
         }
-        
-        try:
-            # 调用LLM
-            response = self.llm_client.call_llm(
-                provider=self.provider,
-                model=self.model,
-                messages=messages,
-                **llm_params
-            )
-            
-            if not response.get("success"):
-                return {
-                    "success": False,
-                    "error": f"LLM call failed: {response.get('error', 'Unknown error')}",
-                    "result": None,
-                    "raw_response": response
-                }
-            
-            # 提取响应内容
-            content = self.llm_client.get_response_content(response)
-            if not content:
-                return {
-                    "success": False,
-                    "error": "No content in LLM response",
-                    "result": None,
-                    "raw_response": response
-                }
-            
-            return {
-                "success": True,
-                "result": {
-                    "sourcing_plan": content,
-                    "input_info": {
-                        "jd_content": jd_content,
-                        "company_name": company_name,
-                        "position_title": position_title
-                    },
-                    "detected_language": detected_language
+    
+    def _build_success_result(
+        self,
+        content: str,
+        jd_content: str, 
+        company_name: str, 
+        position_title: str,
+        detected_language: str,
+        usage: Dict[str, Any],
+        model_used: str,
+        boilerplate: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """构建成功结果字典（阻塞调用和流式调用共用）"""
+        result = {
+            "success": True,
+            "result": {
+                "sourcing_plan": content,
+                "input_info": {
+                    "jd_content": jd_content,
+                    "company_name": company_name,
+                    "position_title": position_title
                 },
-                "raw_content": content,
-                "usage": response.get("data", {}).get("usage", {}),
-                "model_used": response.get("data", {}).get("model", self.model),
-                "provider": self.provider
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Sourcing plan generation failed: {str(e)}",
-                "result": None
-            }
+                "detected_language": detected_language
+            },
+            "raw_content": content,
+            "usage": usage,
+            "model_used": model_used,
+            "provider": self.provider
+        }
+        if boilerplate is not None:
+            result["boilerplate"] = boilerplate
+        return result
     
     def save_sourcing_plan(
         self, 
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+标签结果分析
+把 CandidateTagger 的结果存为列式结构：每行一个 uint8 五位掩码（第 i 位对应 DIMENSIONS[i]）、成功标记、
+提供商编号、时间戳和查询文本哈希；汇总统计、维度共现矩阵、提供商之间的一致率、按时间分桶的频率都用 NumPy 向量化计算
+
+掩码只有 32 种取值，大部分统计先用 np.bincount 得到掩码直方图，再乘以 32x5 的位表，千万行也只需一次线性扫描；
+存储为一个目录（每列一个 .npy 文件 + meta.json），加载时用内存映射，不需要把一个月的数据读进内存
+
+使用方法:
+    python function/tag_analytics.py build --data tagger_results.jsonl --output analytics/2025-06
+    python function/tag_analytics.py report analytics/2025-06 --bucket 86400
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 五个维度，顺序与 CandidateTagger 的 TAG_LABELS 一致
+DIMENSIONS = ["Location", "Job Title", "Years of Experience", "Industry", "Skills"]
+
+# 列名 -> dtype
+COLUMNS = {
+    "masks": "uint8",
+    "success": "bool",
+    "providers": "uint8",
+    "timestamps": "int64",
+    "keys": "uint64",
+}
+
+# 初始容量
+INITIAL_CAPACITY = 1024
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("标签结果分析需要安装 numpy: pip install numpy")
+
+
+def _bit_table():
+    """(32, 5) 位表：第 m 行为掩码 m 在五个维度上的 0/1"""
+    return (np.arange(32)[:, None] >> np.arange(len(DIMENSIONS))) & 1
+
+
+def text_key(text: Optional[str]) -> int:
+    """查询文本的 64 位哈希（忽略大小写和首尾空白），没有文本时为 0"""
+    if not text:
+        return 0
+    digest = hashlib.blake2b(text.strip().lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def result_mask(result: Dict[str, Any]) -> Optional[int]:
+    """
+    把 CandidateTagger 的单条结果转换为五位掩码
+
+    Returns:
+        0~31 的掩码，失败或结构不完整时返回 None
+    """
+    if not result.get("success"):
+        return None
+    tags = result.get("result")
+    tags = tags.get("result") if isinstance(tags, dict) else None
+    if not isinstance(tags, list) or len(tags) != len(DIMENSIONS):
+        return None
+    mask = 0
+    for bit, item in enumerate(tags):
+        if not isinstance(item, dict):
+            return None
+        if item.get("containsCriteria"):
+            mask |= 1 << bit
+    return mask
+
+
+class TagResultStore:
+    """
+    列式标签结果存储
+
+    用法：
+        store = TagResultStore()
+        store.extend(results, texts=texts)
+        store.summary_stats()
+        store.save("analytics/2025-06")
+        store = TagResultStore.load("analytics/2025-06")   # 内存映射，只读；追加时才复制到内存
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self._columns = {name: np.zeros(INITIAL_CAPACITY, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._size = 0
+        self.provider_names: List[str] = []
+        self._provider_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, name: str):
+        """列的只读视图（长度为实际行数）"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def _provider_code(self, provider: Optional[str]) -> int:
+        provider = provider or ""
+        code = self._provider_codes.get(provider)
+        if code is None:
+            if len(self.provider_names) >= 256:
+                raise ValueError("Too many providers (max 256)")
+            code = self._provider_codes[provider] = len(self.provider_names)
+            self.provider_names.append(provider)
+        return code
+
+    def _reserve(self, count: int):
+        """保证还能再放 count 行；内存映射的列在第一次追加时复制到内存"""
+        needed = self._size + count
+        capacity = len(self._columns["masks"])
+        if needed <= capacity and not isinstance(self._columns["masks"], np.memmap):
+            return
+        capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        for name, array in self._columns.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            self._columns[name] = grown
+
+    def append(
+        self,
+        result: Dict[str, Any],
+        text: Optional[str] = None,
+        timestamp: Optional[float] = None
+    ):
+        """
+        追加一条结果
+
+        Args:
+            result: CandidateTagger.analyze_text 的返回值
+            text: 查询文本（用于比较不同提供商对同一查询的结果），可省略
+            timestamp: Unix 时间戳（秒），默认当前时间
+        """
+        self._reserve(1)
+        mask = result_mask(result)
+        row = self._size
+        self._columns["masks"][row] = mask or 0
+        self._columns["success"][row] = mask is not None
+        self._columns["providers"][row] = self._provider_code(result.get("provider"))
+        self._columns["timestamps"][row] = int(time.time() if timestamp is None else timestamp)
+        self._columns["keys"][row] = text_key(text)
+        self._size += 1
+
+    def extend(
+        self,
+        results: Iterable[Dict[str, Any]],
+        texts: Optional[Iterable[Optional[str]]] = None,
+        timestamps: Optional[Iterable[float]] = None
+    ):
+        """
+        批量追加结果（如 batch_analyze 的返回值）
+
+        Args:
+            results: 结果列表
+            texts: 与 results 等长的查询文本
+            timestamps: 与 results 等长的时间戳，默认当前时间
+        """
+        results = list(results)
+        texts = list(texts) if texts is not None else [None] * len(results)
+        now = time.time()
+        timestamps = list(timestamps) if timestamps is not None else [now] * len(results)
+        if not len(texts) == len(timestamps) == len(results):
+            raise ValueError("results, texts and timestamps must have the same length")
+        self._reserve(len(results))
+        for result, text, timestamp in zip(results, texts, timestamps):
+            self.append(result, text, timestamp)
+
+    @classmethod
+    def from_jsonl(cls, file_path: str) -> "TagResultStore":
+        """
+        从结果日志（JSONL，每行 {"text", "result", "timestamp"}，result 为 analyze_text 的返回值）构建
+        """
+        store = cls()
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and isinstance(record.get("result"), dict):
+                    store.append(record["result"], record.get("text"), record.get("timestamp"))
+        return store
+
+    def save(self, directory: str):
+        """保存为目录：每列一个 .npy 文件（可内存映射）和 meta.json"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in COLUMNS:
+            np.save(path / f"{name}.npy", self._columns[name][:self._size])
+        meta = {"rows": self._size, "dimensions": DIMENSIONS, "providers": self.provider_names}
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "TagResultStore":
+        """
+        加载 save() 保存的目录
+
+        Args:
+            directory: 目录路径
+            mmap: 以只读内存映射方式打开列文件（默认），False 时读入内存
+        """
+        _require_numpy()
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("dimensions", DIMENSIONS) != DIMENSIONS:
+            raise ValueError(f"Dimension mismatch in {directory}: {meta.get('dimensions')}")
+
+        store = cls.__new__(cls)
+        store._columns = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None) for name in COLUMNS
+        }
+        store._size = int(meta["rows"])
+        store.provider_names = list(meta.get("providers", []))
+        store._provider_codes = {name: code for code, name in enumerate(store.provider_names)}
+        return store
+
+    def _selection(self, provider: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None):
+        """按提供商和时间范围 [start, end) 筛选的布尔数组，不筛选时返回 None"""
+        selection = None
+        if provider is not None:
+            code = self._provider_codes.get(provider)
+            selection = self.column("providers") == (code if code is not None else -1)
+        if start is not None or end is not None:
+            timestamps = self.column("timestamps")
+            in_range = np.ones(self._size, dtype=bool)
+            if start is not None:
+                in_range &= timestamps >= start
+            if end is not None:
+                in_range &= timestamps < end
+            selection = in_range if selection is None else selection & in_range
+        return selection
+
+    def _histogram(self, selection=None):
+        """成功结果的掩码直方图（长度 32）和总行数"""
+        masks = self.column("masks")
+        success = self.column("success")
+        if selection is not None:
+            masks = masks[selection]
+            success = success[selection]
+        return np.bincount(masks[success], minlength=32), len(masks)
+
+    def summary_stats(
+        self,
+        provider: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        汇总统计，格式与 CandidateTagger.get_summary_stats 相同
+
+        Args:
+            provider: 只统计该提供商的结果
+            start: 起始时间戳（含）
+            end: 结束时间戳（不含）
+        """
+        histogram, total = self._histogram(self._selection(provider, start, end))
+        successful = int(histogram.sum())
+        frequencies = histogram @ _bit_table()
+        dimension_stats = {label: int(count) for label, count in zip(DIMENSIONS, frequencies)}
+        return {
+            "total_analyzed": total,
+            "successful": successful,
+            "failed": total - successful,
+            "success_rate": successful / total if total > 0 else 0,
+            "dimension_frequencies": dimension_stats,
+            "dimension_percentages": {
+                k: v / successful * 100 if successful > 0 else 0
+                for k, v in dimension_stats.items()
+            }
+        }
+
+    def cooccurrence(self, provider: Optional[str] = None) -> Dict[str, Any]:
+        """
+        维度共现矩阵：counts[i][j] 为同时包含维度 i 和 j 的成功结果数（对角线为各维度频率）
+
+        Returns:
+            {"labels": DIMENSIONS, "counts": 5x5 列表, "conditional": P(j | i) 的 5x5 列表}
+        """
+        histogram, _ = self._histogram(self._selection(provider))
+        bits = _bit_table()
+        counts = bits.T @ (histogram[:, None] * bits)
+        diagonal = np.diag(counts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            conditional = np.where(diagonal[:, None] > 0, counts / diagonal[:, None], 0.0)
+        return {
+            "labels": DIMENSIONS,
+            "counts": counts.astype(int).tolist(),
+            "conditional": np.round(conditional, 4).tolist()
+        }
+
+    def provider_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """每个提供商的结果数、成功率和维度频率（一次 bincount 计算全部提供商）"""
+        providers = self.column("providers").astype(np.int64)
+        success = self.column("success")
+        totals = np.bincount(providers, minlength=len(self.provider_names))
+        combined = providers[success] * 32 + self.column("masks")[success]
+        histograms = np.bincount(combined, minlength=len(self.provider_names) * 32).reshape(-1, 32)
+        frequencies = histograms @ _bit_table()
+
+        breakdown = {}
+        for code, name in enumerate(self.provider_names):
+            successful = int(histograms[code].sum())
+            breakdown[name] = {
+                "total": int(totals[code]),
+                "successful": successful,
+                "success_rate": successful / int(totals[code]) if totals[code] else 0,
+                "dimension_frequencies": {label: int(count) for label, count in zip(DIMENSIONS, frequencies[code])}
+            }
+        return breakdown
+
+    def _latest_by_key(self, code: int):
+        """某个提供商每个查询（按文本哈希）最近一次成功结果：(排序后的哈希, 对应掩码)"""
+        selection = (self.column("providers") == code) & self.column("success") & (self.column("keys") != 0)
+        keys = self.column("keys")[selection]
+        masks = self.column("masks")[selection]
+        if not len(keys):
+            return keys, masks
+        # 非稳定排序比 np.unique(return_index=True) 的稳定排序快得多；同一哈希取行号最大（最近）的一条
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        return sorted_keys[starts], masks[np.maximum.reduceat(order, starts)]
+
+    def provider_agreement(self) -> Dict[str, Dict[str, Any]]:
+        """
+        提供商两两之间对同一查询（按文本哈希匹配，各取最近一次成功结果）的一致率
+
+        Returns:
+            {"提供商A|提供商B": {"compared": 共同查询数, "exact": 五个维度完全一致的比例, "per_dimension": {维度: 一致率}}}
+        """
+        latest = {code: self._latest_by_key(code) for code in range(len(self.provider_names))}
+        agreement = {}
+        for a in range(len(self.provider_names)):
+            for b in range(a + 1, len(self.provider_names)):
+                keys_a, masks_a = latest[a]
+                keys_b, masks_b = latest[b]
+                _, index_a, index_b = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+                if not len(index_a):
+                    continue
+                differ = masks_a[index_a] ^ masks_b[index_b]
+                per_dimension = 1.0 - ((differ[:, None] >> np.arange(len(DIMENSIONS))) & 1).mean(axis=0)
+                agreement[f"{self.provider_names[a]}|{self.provider_names[b]}"] = {
+                    "compared": int(len(index_a)),
+                    "exact": round(float((differ == 0).mean()), 4),
+                    "per_dimension": {label: round(float(rate), 4) for label, rate in zip(DIMENSIONS, per_dimension)}
+                }
+        return agreement
+
+    def time_buckets(self, bucket_seconds: int = 3600, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        按时间分桶的结果数和维度频率
+
+        Args:
+            bucket_seconds: 桶宽（秒），按 Unix 时间对齐（86400 为按 UTC 自然日）
+            provider: 只统计该提供商的结果
+
+        Returns:
+            [{"start": 桶起始时间戳, "total", "successful", "dimension_frequencies": {维度: 次数}}, ...]，只含非空桶
+        """
+        if self._size == 0:
+            return []
+        timestamps = self.column("timestamps")
+        masks = self.column("masks")
+        success = self.column("success")
+        selection = self._selection(provider)
+        if selection is not None:
+            timestamps, masks, success = timestamps[selection], masks[selection], success[selection]
+        if not len(timestamps):
+            return []
+
+        buckets = timestamps // bucket_seconds
+        first = int(buckets.min())
+        offsets = buckets - first
+        count = int(offsets.max()) + 1
+        totals = np.bincount(offsets, minlength=count)
+        histograms = np.bincount(offsets[success] * 32 + masks[success], minlength=count * 32).reshape(count, 32)
+        frequencies = histograms @ _bit_table()
+        successful = histograms.sum(axis=1)
+
+        return [
+            {
+                "start": int((first + index) * bucket_seconds),
+                "total": int(totals[index]),
+                "successful": int(successful[index]),
+                "dimension_frequencies": {label: int(value) for label, value in zip(DIMENSIONS, frequencies[index])}
+            }
+            for index in np.nonzero(totals)[0]
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标签结果列式存储与分析")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="从结果日志（JSONL）构建存储")
+    build_parser.add_argument("--data", required=True, help="JSONL 文件，每行含 text、result、timestamp")
+    build_parser.add_argument("--output", required=True, help="存储目录")
+
+    report_parser = subparsers.add_parser("report", help="输出分析报告")
+    report_parser.add_argument("store", help="存储目录")
+    report_parser.add_argument("--bucket", type=int, default=86400, help="时间分桶宽度（秒）")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        store = TagResultStore.from_jsonl(args.data)
+        store.save(args.output)
+        print(f"✅ {len(store)} 条结果已保存到 {args.output}")
+        return
+
+    start = time.perf_counter()
+    store = TagResultStore.load(args.store)
+    report = {
+        "summary": store.summary_stats(),
+        "cooccurrence": store.cooccurrence(),
+        "providers": store.provider_breakdown(),
+        "agreement": store.provider_agreement(),
+        "buckets": store.time_buckets(args.bucket),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"⏱️ {len(store)} 条结果，分析耗时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
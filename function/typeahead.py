@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+输入联想（typeahead）标签会话
+搜索框在用户输入时反复给查询打标签；每个会话：
+- 防抖：停止输入 TYPEAHEAD_DEBOUNCE 秒后才调用
+- 取消：新的输入让进行中的调用过时时，立即关闭提供商连接
+- 复用：查询归一化后（大小写、标点、空白、末尾虚词）与已标注过的文本相同时直接返回缓存结果，不调用 LLM
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+
+
+# 归一化时当作分隔符的字符（保留 "c++"、"c#" 中的 + 和 #）
+SEPARATOR_PATTERN = re.compile(r"[^\w+#]+")
+
+# 出现在末尾时不会改变任何维度的词（用户正在输入下一个词）
+TRAILING_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "at", "on", "for", "with", "to", "from", "by", "as",
+    "who", "that", "is", "are", "和", "与", "及", "或", "的", "在",
+}
+
+
+def normalize_query(text: str) -> str:
+    """
+    归一化查询：小写、标点和空白合并为单个空格、去掉末尾虚词；归一化结果相同的查询标签结果相同
+
+    Args:
+        text: 查询文本
+
+    Returns:
+        归一化后的文本（可能为空字符串）
+    """
+    words = SEPARATOR_PATTERN.sub(" ", text.lower()).split()
+    while words and words[-1] in TRAILING_STOPWORDS:
+        words.pop()
+    return " ".join(words)
+
+
+class TypeaheadSession:
+    """
+    输入联想标签会话（一个搜索框一个会话）
+
+    用法：
+        session = tagger.typeahead_session(on_result=lambda text, result: ...)
+        session.update("senior python")         # 每次输入变化时调用，命中缓存时直接返回结果
+        session.update("senior python dev")
+        result = session.wait(timeout=5)        # 等待最新输入的结果
+        session.close()
+    """
+
+    def __init__(
+        self,
+        tagger,
+        debounce: Optional[float] = None,
+        cache_size: Optional[int] = None,
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        **kwargs
+    ):
+        """
+        初始化会话并启动后台线程
+
+        Args:
+            tagger: CandidateTagger 实例
+            debounce: 防抖时间（秒），默认读取配置 TYPEAHEAD_DEBOUNCE
+            cache_size: 会话内缓存的归一化查询数，默认读取配置 TYPEAHEAD_CACHE_SIZE
+            on_result: 最新输入有结果时调用 on_result(文本, 结果)，在后台线程或 update 的调用方线程中执行
+            **kwargs: 传递给LLM的额外参数
+        """
+        self.tagger = tagger
+        self.debounce = config.TYPEAHEAD_DEBOUNCE if debounce is None else debounce
+        self.cache_size = cache_size or config.TYPEAHEAD_CACHE_SIZE
+        self.on_result = on_result
+        self.llm_kwargs = kwargs
+
+        self._condition = threading.Condition()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._closed = False
+
+        # 最新一次输入
+        self._latest_text: Optional[str] = None
+        self._latest_key: Optional[str] = None
+        self._latest_result: Optional[Dict[str, Any]] = None
+        self._delivered_key: Optional[str] = None
+        self._sequence = 0
+        self._delivered_sequence = 0
+
+        # 等待防抖的输入
+        self._pending_text: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._pending_at = 0.0
+
+        # 进行中的调用
+        self._inflight_key: Optional[str] = None
+        self._inflight_stream = None
+        self._inflight_cancelled = False
+
+        self.updates = 0
+        self.llm_calls = 0
+        self.local_hits = 0
+        self.cache_hits = 0
+        self.unchanged = 0
+        self.cancelled = 0
+
+        self._thread = threading.Thread(target=self._run, name="typeahead", daemon=True)
+        self._thread.start()
+
+    def update(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        输入变化时调用
+
+        Args:
+            text: 当前输入框中的完整文本
+
+        Returns:
+            归一化后与已标注的文本相同时立即返回结果（"typeahead.source" 为 "unchanged" 或 "cache"），
+            否则返回 None，结果在防抖和调用结束后通过 on_result / wait() / latest() 获得
+        """
+        key = normalize_query(text or "")
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Typeahead session is closed")
+            self.updates += 1
+            self._sequence += 1
+            self._latest_text = text
+            self._latest_key = key
+            self._pending_text = None
+
+            if self._inflight_key is not None and self._inflight_key != key:
+                self._cancel_inflight()
+
+            if not key:
+                # 输入清空：没有可标注的内容
+                self._latest_result = None
+                self._delivered_sequence = self._sequence
+                self._condition.notify_all()
+                return None
+
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                if key == self._delivered_key:
+                    self.unchanged += 1
+                    source = "unchanged"
+                else:
+                    self.cache_hits += 1
+                    source = "cache"
+                result = self._deliver(text, key, cached, source)
+            elif self._inflight_key == key and not self._inflight_cancelled:
+                # 相同查询已在进行中（如只多输入了空格），等它的结果
+                return None
+            else:
+                self._pending_text = text
+                self._pending_key = key
+                self._pending_at = time.monotonic()
+                self._condition.notify_all()
+                return None
+
+        self._notify(text, result)
+        return result
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最新输入的结果，尚未得到时返回 None"""
+        with self._condition:
+            if self._delivered_sequence == self._sequence:
+                return self._latest_result
+            return None
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        等待最新输入的结果
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            结果，超时或输入为空时返回 None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._delivered_sequence != self._sequence and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._latest_result if self._delivered_sequence == self._sequence else None
+
+    def close(self):
+        """结束会话：取消进行中的调用并停止后台线程"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_text = None
+            self._cancel_inflight()
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计：输入次数、LLM 调用次数、各种复用次数、取消次数"""
+        with self._condition:
+            return {
+                "updates": self.updates,
+                "llm_calls": self.llm_calls,
+                "local_hits": self.local_hits,
+                "cache_hits": self.cache_hits,
+                "unchanged": self.unchanged,
+                "cancelled": self.cancelled,
+                "calls_per_update": round(self.llm_calls / self.updates, 4) if self.updates else 0.0
+            }
+
+    def _cancel_inflight(self):
+        """取消进行中的调用（调用方持有锁）"""
+        if self._inflight_key is None or self._inflight_cancelled:
+            return
+        self._inflight_cancelled = True
+        if self._inflight_stream is not None:
+            self._inflight_stream.close("superseded")
+
+    def _register_stream(self, stream):
+        """提供商流建立后登记，以便新的输入可以关闭它"""
+        with self._condition:
+            if self._inflight_cancelled:
+                stream.close("superseded")
+            else:
+                self._inflight_stream = stream
+
+    def _deliver(self, text: str, key: str, result: Dict[str, Any], source: str) -> Dict[str, Any]:
+        """记录最新输入的结果（调用方持有锁）"""
+        result = dict(result)
+        result["typeahead"] = {"source": source, "text": text}
+        self._latest_result = result
+        self._delivered_key = key
+        self._delivered_sequence = self._sequence
+        self._condition.notify_all()
+        return result
+
+    def _notify(self, text: str, result: Dict[str, Any]):
+        if self.on_result is not None:
+            try:
+                self.on_result(text, result)
+            except Exception as e:
+                print(f"Typeahead on_result callback failed: {e}")
+
+    def _run(self):
+        """后台线程：等待防抖时间到期后标注最新输入"""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._pending_text is not None:
+                        remaining = self._pending_at + self.debounce - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                text, key = self._pending_text, self._pending_key
+                self._pending_text = None
+                self._inflight_key = key
+                self._inflight_stream = None
+                self._inflight_cancelled = False
+
+            try:
+                result, source = self._tag(text)
+            except Exception as e:
+                result, source = {"success": False, "error": f"Analysis failed: {str(e)}", "result": None}, "llm"
+
+            with self._condition:
+                cancelled = self._inflight_cancelled
+                self._inflight_key = None
+                self._inflight_stream = None
+                if cancelled:
+                    self.cancelled += 1
+                    continue
+                if result.get("success") and result.get("result"):
+                    self._cache[key] = result
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                if key != self._latest_key:
+                    continue
+                # 调用期间可能又输入了归一化结果相同的文本（如多了空格），按最新输入交付
+                text = self._latest_text
+                delivered = self._deliver(text, key, result, source)
+            self._notify(text, delivered)
+
+    def _tag(self, text: str):
+        """规则预分类或本地模型能给出结果时不调用 LLM，否则流式调用（可被取消，五个维度齐了就停止）"""
+        local_result = self.tagger.analyze_text_locally(text)
+        if local_result is not None:
+            with self._condition:
+                self.local_hits += 1
+            source = "near_duplicate" if "near_duplicate" in local_result else local_result["provider"]
+            return local_result, source
+
+        with self._condition:
+            self.llm_calls += 1
+        result = None
+        for event in self.tagger.stream_analyze_text(
+            text, early_stop=True, on_stream=self._register_stream, **self.llm_kwargs
+        ):
+            if event["type"] == "result":
+                result = event
+        result.pop("type", None)
+        self.tagger.remember_result(text, result)
+        return result, "llm"
+
+
+if __name__ == "__main__":
+    from function.candidate_tagger import CandidateTagger
+    from function.rule_tagger import RuleTagger
+
+    query = sys.argv[1] if len(sys.argv) > 1 else "Senior backend engineer in fintech, 5+ years, Go and Kafka "
+    tagger = CandidateTagger(model="gpt-4.1-nano", provider="openai", rule_tagger=RuleTagger())
+
+    def show(text: str, result: Dict[str, Any]):
+        bits = "".join("1" if item["containsCriteria"] else "0" for item in result["result"]["result"]) \
+            if result.get("result") else "-----"
+        print(f"   {bits}  [{result['typeahead']['source']}]  {text!r}")
+
+    print("⌨️ 模拟逐字输入（每个字符间隔 80ms，每个词后停顿 400ms）")
+    with tagger.typeahead_session(on_result=show) as session:
+        for position in range(1, len(query) + 1):
+            session.update(query[:position])
+            time.sleep(0.4 if query[position - 1] == " " else 0.08)
+        session.wait(timeout=30)
+        stats = session.get_stats()
+    print("=" * 50)
+    print(f"📊 {stats}")
+    print(f"📉 逐次调用需要 {stats['updates']} 次 LLM 调用，实际 {stats['llm_calls']} 次")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+SSE 并发压测
+包含一个 OpenAI 兼容的本地桩服务（按固定间隔流式输出 token）和一个异步压测客户端，
+只依赖标准库，用于验证 web_server.py 单机能同时保持的 SSE 流数量
+
+使用方法:
+    # 1. 启动本地桩服务（每个流 100 个 token，间隔 0.1s，约 10s）
+    python loadtest_stream.py stub --port 8900 --tokens 100 --interval 0.1
+
+    # 2. 启动服务，指向桩服务
+    STUB_API_BASE=http://127.0.0.1:8900/v1 python web_server.py
+
+    # 3. 发起 5000 个并发 SSE 流
+    python loadtest_stream.py run --url http://127.0.0.1:8000 --concurrency 5000 --ramp 5
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlencode
+
+
+def raise_fd_limit():
+    """把文件描述符上限提高到系统允许的最大值"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+# ==================== 本地桩服务 ====================
+
+def _sse_chunk(model: str, content: Optional[str], finish_reason: Optional[str] = None) -> bytes:
+    delta = {"content": content} if content is not None else {}
+    data = {
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(data)}\n\n".encode()
+
+
+def _http_chunk(payload: bytes) -> bytes:
+    """HTTP/1.1 chunked 编码的一个分块"""
+    return f"{len(payload):x}\r\n".encode() + payload + b"\r\n"
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """读取一个 HTTP 请求，连接关闭时返回 None"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    body = b""
+    length = int(headers.get("content-length", "0"))
+    if length:
+        body = await reader.readexactly(length)
+    return {"method": method, "path": path, "headers": headers, "body": body}
+
+
+def make_stub_handler(tokens: int, interval: float):
+    """
+    创建桩服务连接处理函数
+
+    Args:
+        tokens: 每个流输出的 token 数
+        interval: token 之间的间隔（秒）
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # 支持 keep-alive，验证服务端连接池复用
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                try:
+                    payload = json.loads(request["body"] or b"{}")
+                except ValueError:
+                    payload = {}
+                model = payload.get("model", "stub")
+
+                if not payload.get("stream"):
+                    text = " ".join(f"token{i}" for i in range(tokens))
+                    body = json.dumps({
+                        "object": "chat.completion",
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]
+                    }).encode()
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                    )
+                    await writer.drain()
+                    continue
+
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+                for i in range(tokens):
+                    writer.write(_http_chunk(_sse_chunk(model, f"token{i} ")))
+                    await writer.drain()
+                    await asyncio.sleep(interval)
+                writer.write(_http_chunk(_sse_chunk(model, None, "stop")))
+                writer.write(_http_chunk(b"data: [DONE]\n\n"))
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def run_stub(host: str, port: int, tokens: int, interval: float):
+    raise_fd_limit()
+    server = await asyncio.start_server(make_stub_handler(tokens, interval), host, port, backlog=8192)
+    print(f"🧪 本地桩服务: http://{host}:{port}/v1 （{tokens} tokens，间隔 {interval}s）")
+    async with server:
+        await server.serve_forever()
+
+
+# ==================== 压测客户端 ====================
+
+class LoadStats:
+    """压测统计"""
+
+    def __init__(self):
+        self.open_streams = 0
+        self.peak_open_streams = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.ttfts: List[float] = []
+        self.durations: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def error(self, message: str):
+        self.failed += 1
+        self.errors[message] = self.errors.get(message, 0) + 1
+
+
+async def sse_client(url: str, params: Dict[str, str], stats: LoadStats, timeout: float):
+    """打开一个 SSE 流并读到 [DONE]"""
+    parts = urlsplit(url)
+    path = f"{parts.path.rstrip('/')}/stream?{urlencode(params)}"
+    start = time.time()
+    opened = False
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or 80), timeout
+        )
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: text/event-stream\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        status = status_line.split(b" ")[1] if b" " in status_line else b"?"
+        if status in (b"503", b"429"):
+            stats.rejected += 1
+            return
+        if status != b"200":
+            stats.error(f"HTTP {status.decode()}")
+            return
+
+        buffer = b""
+        while True:
+            data = await asyncio.wait_for(reader.read(4096), timeout)
+            if not data:
+                stats.error("closed before [DONE]")
+                return
+            if not opened and b"data:" in data:
+                opened = True
+                stats.ttfts.append(time.time() - start)
+                stats.open_streams += 1
+                stats.peak_open_streams = max(stats.peak_open_streams, stats.open_streams)
+            buffer = (buffer + data)[-64:]
+            if b"[DONE]" in buffer:
+                stats.completed += 1
+                stats.durations.append(time.time() - start)
+                return
+    except asyncio.TimeoutError:
+        stats.error("timeout")
+    except OSError as e:
+        stats.error(type(e).__name__)
+    finally:
+        if opened:
+            stats.open_streams -= 1
+        if writer is not None:
+            writer.close()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run_load(url: str, concurrency: int, ramp: float, provider: str, model: str, timeout: float):
+    fd_limit = raise_fd_limit()
+    if fd_limit < concurrency + 100:
+        print(f"⚠️ 文件描述符上限 {fd_limit} 小于并发数，请先执行 ulimit -n")
+
+    stats = LoadStats()
+    params = {"message": "load test", "provider": provider, "model": model}
+    print(f"🚀 {concurrency} 个并发 SSE 流 -> {url}/stream （{ramp}s 内逐步建立）")
+
+    async def report():
+        while True:
+            await asyncio.sleep(1)
+            print(f"   open={stats.open_streams} peak={stats.peak_open_streams} "
+                  f"done={stats.completed} failed={stats.failed} rejected={stats.rejected}")
+
+    reporter = asyncio.create_task(report())
+    start = time.time()
+    tasks = []
+    for i in range(concurrency):
+        tasks.append(asyncio.create_task(sse_client(url, params, stats, timeout)))
+        if ramp > 0:
+            await asyncio.sleep(ramp / concurrency)
+    await asyncio.gather(*tasks)
+    reporter.cancel()
+    elapsed = time.time() - start
+
+    print("=" * 50)
+    print(f"✅ 完成: {stats.completed}/{concurrency}")
+    print(f"❌ 失败: {stats.failed} {stats.errors if stats.errors else ''}")
+    print(f"🚫 拒绝(503/429): {stats.rejected}")
+    print(f"📈 同时打开的流峰值: {stats.peak_open_streams}")
+    print(f"⏱️ TTFT p50={_percentile(stats.ttfts, 0.5):.3f}s p99={_percentile(stats.ttfts, 0.99):.3f}s")
+    print(f"⏱️ 流耗时 p50={_percentile(stats.durations, 0.5):.2f}s p99={_percentile(stats.durations, 0.99):.2f}s")
+    print(f"🕐 总耗时: {elapsed:.1f}s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE 并发压测")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stub = subparsers.add_parser("stub", help="启动 OpenAI 兼容的本地桩服务")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8900)
+    stub.add_argument("--tokens", type=int, default=100, help="每个流输出的 token 数")
+    stub.add_argument("--interval", type=float, default=0.1, help="token 间隔（秒）")
+
+    run = subparsers.add_parser("run", help="对服务发起并发 SSE 流")
+    run.add_argument("--url", default="http://127.0.0.1:8000")
+    run.add_argument("--concurrency", type=int, default=5000)
+    run.add_argument("--ramp", type=float, default=5.0, help="在多少秒内建立全部连接")
+    run.add_argument("--provider", default="stub")
+    run.add_argument("--model", default="stub")
+    run.add_argument("--timeout", type=float, default=60.0, help="单次读取超时（秒）")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "stub":
+            asyncio.run(run_stub(args.host, args.port, args.tokens, args.interval))
+        else:
+            stats = asyncio.run(run_load(args.url, args.concurrency, args.ramp, args.provider, args.model, args.timeout))
+            sys.exit(0 if stats.failed == 0 else 1)
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+批量调用执行器
+标签器和职位描述解析器的批量接口共用：线程池并发调用，每次调用前先取限速令牌，
+因提供商限流失败时指数退避重试（MAX_RETRIES / RETRY_DELAY），在调用方线程中按完成顺序回调
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Hashable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from api.rate_limit import RateLimiter, is_rate_limit_error
+
+
+def is_rate_limited_result(result: Dict[str, Any]) -> bool:
+    """结果字典是否为因提供商限流而失败"""
+    return not result.get("success") and is_rate_limit_error(result.get("error"))
+
+
+def call_with_retry(
+    call: Callable[[], Any],
+    limiter: Optional[RateLimiter] = None,
+    is_rate_limited: Callable[[Any], bool] = is_rate_limited_result
+) -> Any:
+    """
+    限速后调用，结果因提供商限流失败时指数退避重试
+
+    Args:
+        call: 无参调用，返回结果
+        limiter: 限速器，None 表示不限速
+        is_rate_limited: 判断结果是否因限流失败，默认按 {"success": ..., "error": ...} 结果字典判断
+
+    Returns:
+        最后一次调用的结果
+    """
+    for attempt in range(config.MAX_RETRIES + 1):
+        if limiter is not None:
+            limiter.acquire()
+        result = call()
+        if not is_rate_limited(result):
+            break
+        if attempt < config.MAX_RETRIES:
+            time.sleep(config.RETRY_DELAY * (2 ** attempt))
+    return result
+
+
+def run_batch_calls(
+    calls: Dict[Hashable, Callable[[], Any]],
+    max_workers: int,
+    on_complete: Callable[[Hashable, Any], None],
+    on_error: Callable[[Hashable, Exception], Any],
+    limiter: Optional[RateLimiter] = None,
+    is_rate_limited: Callable[[Any], bool] = is_rate_limited_result,
+    thread_name_prefix: str = "batch"
+):
+    """
+    并发执行一批调用（每次调用经过 call_with_retry），每完成一项在调用方线程中调用 on_complete(键, 结果)
+
+    Args:
+        calls: {键: 无参调用}
+        max_workers: 线程数
+        on_complete: 完成回调，按完成顺序执行；抛出异常时不再开始排队中的调用
+        on_error: 调用抛出异常时生成该项结果 on_error(键, 异常)，结果同样交给 on_complete
+        limiter: 限速器，None 表示不限速
+        is_rate_limited: 判断结果是否因限流失败
+        thread_name_prefix: 线程名前缀
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=thread_name_prefix)
+    try:
+        futures = {
+            executor.submit(call_with_retry, call, limiter, is_rate_limited): key
+            for key, call in calls.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = on_error(key, e)
+            on_complete(key, result)
+    finally:
+        # 回调抛出异常或被中断时不再开始排队中的调用
+        executor.shutdown(wait=True, cancel_futures=True)
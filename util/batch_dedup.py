@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+批量去重（回填前的近似重复聚类）
+回填几十万条抓取的职位描述时，大量是重复发布或只改了公司名、地点的模板。本模块在提交 LLM 之前把批量输入聚类：
+- 与 util/near_duplicate.py 相同的规范化和片段（shingle），MinHash/LSH 找候选，精确 Jaccard 相似度确认
+- 按输入顺序贪心聚类：每条输入与已有的代表比较，达到阈值即加入该簇，否则成为新簇的代表（簇内每条都与代表足够相似，不会链式漂移）
+- 只有代表需要调用 LLM，结果复制给簇内成员并带上来源（representative 为代表的输入序号）；
+  代表抽取出的原文值（地点、公司、技能等）在成员原文中找不到时，该成员单独解析（见 fits_member）
+- 代表数超过 spill_after 时 LSH 索引和代表片段转存到 SQLite 文件，内存占用不随批量大小增长
+"""
+
+import copy
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from util.near_duplicate import MinHasher, canonicalize, shingles, hash_items
+
+
+class _MemoryIndex:
+    """内存中的 LSH 索引：分段键 -> 代表序号，代表序号 -> 片段哈希集合"""
+
+    def __init__(self):
+        self.buckets: Dict[bytes, List[int]] = {}
+        self.items: Dict[int, frozenset] = {}
+        self.exact: Dict[bytes, int] = {}
+
+    def find_exact(self, digest: bytes) -> Optional[int]:
+        return self.exact.get(digest)
+
+    def candidates(self, band_keys: List[bytes]) -> set:
+        found = set()
+        for key in band_keys:
+            found.update(self.buckets.get(key, ()))
+        return found
+
+    def get_items(self, representative: int) -> frozenset:
+        return self.items[representative]
+
+    def add(self, representative: int, digest: bytes, band_keys: List[bytes], items: frozenset):
+        self.exact[digest] = representative
+        self.items[representative] = items
+        for key in band_keys:
+            self.buckets.setdefault(key, []).append(representative)
+
+    def close(self):
+        self.buckets.clear()
+        self.items.clear()
+        self.exact.clear()
+
+
+class _SqliteIndex:
+    """转存到 SQLite 文件的 LSH 索引（只由聚类线程访问）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE IF NOT EXISTS buckets (key BLOB NOT NULL, representative INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS buckets_key ON buckets (key);
+            CREATE TABLE IF NOT EXISTS items (representative INTEGER PRIMARY KEY, hashes BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS exact (digest BLOB PRIMARY KEY, representative INTEGER NOT NULL);
+        """)
+
+    def find_exact(self, digest: bytes) -> Optional[int]:
+        row = self.connection.execute("SELECT representative FROM exact WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def candidates(self, band_keys: List[bytes]) -> set:
+        placeholders = ",".join("?" * len(band_keys))
+        rows = self.connection.execute(
+            f"SELECT representative FROM buckets WHERE key IN ({placeholders})", band_keys
+        )
+        return {row[0] for row in rows}
+
+    def get_items(self, representative: int) -> frozenset:
+        row = self.connection.execute(
+            "SELECT hashes FROM items WHERE representative = ?", (representative,)
+        ).fetchone()
+        return frozenset(array("Q", row[0]))
+
+    def add(self, representative: int, digest: bytes, band_keys: List[bytes], items: frozenset):
+        self.connection.execute("INSERT OR REPLACE INTO exact VALUES (?, ?)", (digest, representative))
+        self.connection.execute(
+            "INSERT INTO items VALUES (?, ?)", (representative, array("Q", sorted(items)).tobytes())
+        )
+        self.connection.executemany(
+            "INSERT INTO buckets VALUES (?, ?)", [(key, representative) for key in band_keys]
+        )
+
+    def load(self, memory: _MemoryIndex):
+        """把内存索引整体写入"""
+        self.connection.executemany("INSERT OR REPLACE INTO exact VALUES (?, ?)", memory.exact.items())
+        self.connection.executemany(
+            "INSERT INTO items VALUES (?, ?)",
+            ((rep, array("Q", sorted(items)).tobytes()) for rep, items in memory.items.items())
+        )
+        self.connection.executemany(
+            "INSERT INTO buckets VALUES (?, ?)",
+            ((key, rep) for key, reps in memory.buckets.items() for rep in reps)
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class NearDuplicateClusterer:
+    """
+    批量输入的近似重复聚类
+
+    用法：
+        with NearDuplicateClusterer(threshold=0.9) as clusterer:
+            assignments = clusterer.cluster(texts)   # [(代表序号, 与代表的相似度), ...]
+        print(clusterer.get_stats())
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        spill_after: Optional[int] = None,
+        spill_path: Optional[str] = None
+    ):
+        """
+        初始化聚类器
+
+        Args:
+            threshold: 加入簇需要的与代表的最低 Jaccard 相似度，默认读取配置 BATCH_DEDUP_THRESHOLD
+            num_perm: MinHash 签名长度，默认读取配置 NEAR_DUPLICATE_NUM_PERM
+            bands: LSH 分段数（num_perm 须能被整除），默认读取配置 NEAR_DUPLICATE_BANDS
+            spill_after: 代表数超过该值时索引转存到 SQLite，默认读取配置 BATCH_DEDUP_SPILL_AFTER；0 表示不转存
+            spill_path: 转存文件路径，默认在临时目录新建并在 close() 时删除
+        """
+        self.threshold = threshold or config.BATCH_DEDUP_THRESHOLD
+        num_perm = num_perm or config.NEAR_DUPLICATE_NUM_PERM
+        self.bands = bands or config.NEAR_DUPLICATE_BANDS
+        if num_perm % self.bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({self.bands})")
+        self.rows = num_perm // self.bands
+        self.spill_after = config.BATCH_DEDUP_SPILL_AFTER if spill_after is None else spill_after
+        self.spill_path = spill_path
+        self.hasher = MinHasher(num_perm)
+
+        self._index = _MemoryIndex()
+        self._spilled = False
+        self._owns_spill_file = False
+
+        self.total = 0
+        self.representatives = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.duration = 0.0
+
+    def add(self, index: int, text: str) -> Tuple[int, float]:
+        """
+        把一条输入归入已有簇或新建簇（按输入顺序调用）
+
+        Args:
+            index: 输入序号
+            text: 输入文本
+
+        Returns:
+            (代表的输入序号, 与代表的 Jaccard 相似度)；自身为代表时返回 (index, 1.0)
+        """
+        start_time = time.perf_counter()
+        try:
+            return self._add(index, text)
+        finally:
+            self.duration += time.perf_counter() - start_time
+
+    def _add(self, index: int, text: str) -> Tuple[int, float]:
+        self.total += 1
+        tokens = canonicalize(text or "")
+        if not tokens:
+            # 没有可比较的内容，单独处理
+            self.representatives += 1
+            return index, 1.0
+
+        digest = hashlib.blake2b(" ".join(tokens).encode("utf-8"), digest_size=16).digest()
+        representative = self._index.find_exact(digest)
+        if representative is not None:
+            self.exact_duplicates += 1
+            return representative, 1.0
+
+        hashed = hash_items(shingles(tokens))
+        items = frozenset(hashed)
+        signature = self.hasher.signature_from_hashes(hashed)
+        band_keys = [
+            band.to_bytes(2, "little") + array("Q", signature[band * self.rows:(band + 1) * self.rows]).tobytes()
+            for band in range(self.bands)
+        ]
+
+        best, best_score = None, 0.0
+        for candidate in self._index.candidates(band_keys):
+            other = self._index.get_items(candidate)
+            score = len(items & other) / len(items | other)
+            if score > best_score or (score == best_score and best is not None and candidate < best):
+                best, best_score = candidate, score
+        if best is not None and best_score >= self.threshold:
+            self.near_duplicates += 1
+            return best, round(best_score, 4)
+
+        self._index.add(index, digest, band_keys, items)
+        self.representatives += 1
+        if not self._spilled and self.spill_after and self.representatives > self.spill_after:
+            self._spill()
+        return index, 1.0
+
+    def _spill(self):
+        """索引转存到 SQLite"""
+        if self.spill_path is None:
+            handle, self.spill_path = tempfile.mkstemp(prefix="batch_dedup_", suffix=".sqlite3")
+            os.close(handle)
+            self._owns_spill_file = True
+        spilled = _SqliteIndex(self.spill_path)
+        spilled.load(self._index)
+        self._index.close()
+        self._index = spilled
+        self._spilled = True
+
+    def cluster(self, texts: Iterable[str]) -> List[Tuple[int, float]]:
+        """
+        聚类整个批量
+
+        Args:
+            texts: 输入文本（按序号顺序）
+
+        Returns:
+            每条输入的 (代表的输入序号, 与代表的相似度)
+        """
+        return [self.add(index, text) for index, text in enumerate(texts)]
+
+    def close(self):
+        """释放索引，删除自动创建的转存文件"""
+        self._index.close()
+        if self._owns_spill_file and self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计：输入数、代表数（需要调用 LLM 的条数）、重复数、节省比例、聚类耗时"""
+        duplicates = self.exact_duplicates + self.near_duplicates
+        return {
+            "total": self.total,
+            "representatives": self.representatives,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "saved_rate": round(duplicates / self.total, 4) if self.total else 0.0,
+            "spilled": self._spilled,
+            "duration": round(self.duration, 3)
+        }
+
+
+def cluster_sizes(assignments: List[Tuple[int, float]]) -> Dict[int, int]:
+    """每个代表的簇大小（含代表自身）"""
+    sizes: Dict[int, int] = {}
+    for representative, _ in assignments:
+        sizes[representative] = sizes.get(representative, 0) + 1
+    return sizes
+
+
+def _extracted_strings(data: Any) -> Iterable[str]:
+    """递归取出解析结果中的所有字符串值"""
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from _extracted_strings(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            yield from _extracted_strings(value)
+
+
+def _contains_phrase(tokens: List[str], phrase: List[str]) -> bool:
+    """规范化后的文本是否包含该短语（ASCII 短语按整词匹配，中文等无空格文本按子串匹配）"""
+    text = " ".join(tokens)
+    value = " ".join(phrase)
+    if value.isascii():
+        return f" {value} " in f" {text} "
+    return value in text
+
+
+def fits_member(result: Dict[str, Any], representative_text: str, member_text: str) -> bool:
+    """
+    代表的解析结果能否直接复制给簇内成员
+
+    相似度阈值只保证两条输入大部分相同；只改了公司名、地点的模板与代表的差别恰好落在这些字段上。
+    代表结果（"parsed_data"）中在代表原文里出现过的每个值都必须同样出现在成员原文里，
+    否则成员的这些字段与代表不同，需要单独解析。没有 parsed_data 的结果（如标签器）不受影响
+
+    Args:
+        result: 代表的结果
+        representative_text: 代表的输入
+        member_text: 成员的输入
+
+    Returns:
+        True 表示可以复制
+    """
+    data = result.get("parsed_data")
+    if not result.get("success") or not isinstance(data, dict):
+        return True
+    representative_tokens = canonicalize(representative_text)
+    member_tokens = canonicalize(member_text)
+    for value in set(_extracted_strings(data)):
+        phrase = canonicalize(value)
+        if not phrase or not _contains_phrase(representative_tokens, phrase):
+            # 模型归纳出的值（原文中没有）无法按原文核对
+            continue
+        if not _contains_phrase(member_tokens, phrase):
+            return False
+    return True
+
+
+def with_provenance(
+    result: Dict[str, Any],
+    index: int,
+    representative: int,
+    similarity: float,
+    cluster_size: int,
+    reparsed: bool = False
+) -> Dict[str, Any]:
+    """
+    给结果加上去重来源
+
+    结果带 "metadata" 字典时（解析器）写入 metadata["dedup"]，否则写入顶层 "dedup"：
+    {"representative": 代表的输入序号, "similarity": 与代表的相似度, "cluster_size": 簇大小}；
+    成员的结果是代表结果的副本；因抽取值与代表不同而单独解析的成员另含 "reparsed": true
+
+    Args:
+        result: 代表的结果（reparsed 时为成员自己的结果）
+        index: 当前输入序号
+        representative: 代表的输入序号
+        similarity: 与代表的相似度
+        cluster_size: 簇大小
+        reparsed: 成员是否单独解析
+
+    Returns:
+        带来源的结果（代表自身和单独解析的成员为原对象，其余成员为副本）
+    """
+    if index != representative and not reparsed:
+        result = copy.deepcopy(result)
+    provenance = {"representative": representative, "similarity": similarity, "cluster_size": cluster_size}
+    if reparsed:
+        provenance["reparsed"] = True
+    if isinstance(result.get("metadata"), dict):
+        result["metadata"]["dedup"] = provenance
+    else:
+        result["dedup"] = provenance
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="估算批量输入的近似重复比例（不调用 LLM）")
+    parser.add_argument("input", help="每行一个文本，或 JSONL（每行带 text / job_description 字段）")
+    parser.add_argument("--threshold", type=float, default=None, help="相似度阈值，默认 BATCH_DEDUP_THRESHOLD")
+    parser.add_argument("--spill-path", default=None, help="SQLite 转存文件路径")
+    args = parser.parse_args()
+
+    def read_texts(path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("{"):
+                    record = json.loads(line)
+                    yield record.get("text") or record.get("job_description") or ""
+                elif line:
+                    yield line
+
+    with NearDuplicateClusterer(threshold=args.threshold, spill_path=args.spill_path) as clusterer:
+        assignments = clusterer.cluster(read_texts(args.input))
+        stats = clusterer.get_stats()
+    sizes = sorted(cluster_sizes(assignments).items(), key=lambda item: item[1], reverse=True)
+    print(f"📊 {stats}")
+    print(f"💰 需要调用 LLM {stats['representatives']} / {stats['total']} 条")
+    print("🔝 最大的簇（代表序号: 大小）: " + ", ".join(f"{rep}: {size}" for rep, size in sizes[:10]))
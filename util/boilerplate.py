@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+职位描述样板内容剥离
+真实的职位描述常有一半是样板：平等就业声明、福利、"关于我们"、法律声明、投递方式。这些段落不影响解析和分析结果，
+却占用提示词 token。本模块在调用 LLM 之前按段落识别并删除样板：
+- 启发式规则：平等就业、法律、隐私、投递方式等特征句，以及福利、公司介绍等小节标题（直到下一个小节标题）
+- 语料指纹：从自己的职位描述语料中学习在大量不同文档中重复出现的段落（如某公司固定附在每个职位后的介绍）
+- 可还原：记录每个删除段落在原文中的位置和原因，restore() 可逐字还原原文，便于审计
+- 含岗位要求特征（N 年经验、岗位职责、任职要求等）的段落不按启发式删除
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+from util.token_counter import estimate_tokens
+
+
+# 段落分隔：空行
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+
+# 标题装饰：Markdown 标题、加粗、编号
+HEADING_DECORATION = re.compile(r"^[#\s*_]+|[*_]+$")
+
+# 列表项开头（不是小节标题）
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•·▪●◦]|\d+[.)、])\s*")
+
+# 小节标题（规范化后完全匹配）
+SECTION_HEADINGS = {
+    "benefits": re.compile(
+        r"(?:our |the )?(?:benefits?|perks?|perks (?:and|&) benefits|benefits (?:and|&) perks|"
+        r"compensation (?:and|&) benefits|what we offer|what you(?:'ll| will) get|why (?:join|work (?:for|with)) us|"
+        r"福利|福利待遇|薪资福利|薪酬福利|我们提供)"
+    ),
+    "about": re.compile(
+        r"(?:about (?:us|the company|our company)|who we are|company (?:overview|description|profile)|"
+        r"our (?:story|mission|company)|公司介绍|公司简介|关于我们)"
+    ),
+    "eeo": re.compile(r"(?:equal (?:employment )?opportunit(?:y|ies)(?: employer| statement)?|eeo(?: statement)?|"
+                      r"diversity(?:,| and| &) inclusion|平等就业)"),
+    "legal": re.compile(r"(?:disclaimer|legal(?: notice)?|notice to (?:agencies|recruiters)|recruitment fraud(?: warning)?|"
+                        r"免责声明)"),
+    "privacy": re.compile(r"(?:(?:applicant |candidate )?privacy(?: notice| policy)?|data protection|隐私(?:声明|政策))"),
+    "apply": re.compile(r"(?:how to apply|application process|to apply|投递方式|应聘方式|简历投递)"),
+}
+
+# 段落特征句（不需要小节标题）
+PARAGRAPH_PATTERNS = {
+    "eeo": re.compile(
+        r"equal (?:employment )?opportunity employer|without regard to (?:race|age|sex|gender)|"
+        r"protected veteran|affirmative action|reasonable accommodations?|e-verify|"
+        r"regardless of (?:race|age|gender|religion|sexual orientation)|"
+        r"不因(?:性别|民族|种族|宗教|年龄).{0,20}(?:歧视|区别)|平等(?:的)?就业机会",
+        re.IGNORECASE
+    ),
+    "legal": re.compile(
+        r"unsolicited (?:resumes|cvs|candidates)|(?:recruitment|staffing) agenc(?:y|ies) (?:are|is|should)|"
+        r"not (?:intended|designed) to (?:be|cover) (?:an )?(?:exhaustive|comprehensive)|at-will employment|"
+        r"fraudulent (?:job|recruit|offer)|never ask (?:you |candidates )?(?:for|to) (?:pay|money)",
+        re.IGNORECASE
+    ),
+    "privacy": re.compile(
+        r"(?:applicant|candidate|recruitment) privacy (?:notice|policy)|process(?:ing)? (?:of )?your personal (?:data|information)|"
+        r"\bgdpr\b|\bccpa\b|个人信息(?:保护|处理)",
+        re.IGNORECASE
+    ),
+    "apply": re.compile(
+        r"^(?:to apply|interested (?:candidates|applicants)|please (?:send|submit|email) (?:your|a) (?:cv|resume))|"
+        r"请(?:将|把)?简历(?:发送|投递)至|简历请(?:发送|投递)至",
+        re.IGNORECASE
+    ),
+}
+
+# 岗位内容特征：含这些内容的段落不按启发式删除
+JOB_CONTENT_PATTERN = re.compile(
+    r"\b\d+\+?\s*(?:years?|yrs)\b|\bmust have\b|\bdegree in\b|\bproficien|\bresponsibilit|\brequirements?:|"
+    r"\bqualifications?\b|\byou will\b|\byou'll\b|\bexperience (?:in|with)\b|"
+    r"\d+\s*年以上|岗位职责|任职要求|工作职责|任职资格|职位要求",
+    re.IGNORECASE
+)
+
+# 所有类别
+CATEGORIES = tuple(SECTION_HEADINGS)
+
+# 小节标题最大长度（字符）和词数
+MAX_HEADING_CHARS = 60
+MAX_HEADING_WORDS = 8
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, int]]:
+    """
+    按空行切分段落
+
+    Args:
+        text: 原文
+
+    Returns:
+        每个段落的 (起始位置, 结束位置)，结束位置包含段落后的空行，删除段落后不会留下多余空行
+    """
+    spans = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.end()))
+        start = match.end()
+    if start < len(text) and text[start:].strip():
+        spans.append((start, len(text)))
+    return spans
+
+
+def paragraph_fingerprint(paragraph: str, min_chars: int) -> Optional[str]:
+    """
+    段落指纹：小写、数字归零、去掉标点和空白差异后的哈希；过短的段落返回 None
+
+    Args:
+        paragraph: 段落文本
+        min_chars: 规范化后的最短长度
+
+    Returns:
+        十六进制指纹，段落过短时为 None
+    """
+    normalized = " ".join(re.sub(r"[^\w]+", " ", re.sub(r"\d", "0", paragraph.lower())).split())
+    if len(normalized) < min_chars:
+        return None
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def heading_of(paragraph: str) -> Optional[str]:
+    """
+    段落首行为小节标题时返回规范化的标题（小写、去掉装饰和冒号），否则返回 None
+
+    首行为 "Benefits:" 这类短行，或 "Benefits: health, dental" 这类冒号前为短标题的行都视为标题；列表项不是标题
+    """
+    first_line = paragraph.strip().split("\n", 1)[0].strip()
+    if not first_line or BULLET_PATTERN.match(first_line):
+        return None
+    candidate = first_line
+    for separator in (":", "："):
+        prefix, found, _ = first_line.partition(separator)
+        if found:
+            candidate = prefix
+            break
+    else:
+        if first_line.endswith((".", "。", "!", "！", "?", "？")):
+            return None
+    heading = HEADING_DECORATION.sub("", candidate).strip().lower()
+    if not heading or len(heading) > MAX_HEADING_CHARS or len(heading.split()) > MAX_HEADING_WORDS:
+        return None
+    return heading
+
+
+def restore(stripped_text: str, removed: List[Dict[str, Any]]) -> str:
+    """
+    还原原文
+
+    Args:
+        stripped_text: strip() 返回的 "text"
+        removed: strip() 返回的 "removed"
+
+    Returns:
+        与输入 strip() 的原文逐字相同的文本
+    """
+    text = stripped_text
+    for span in sorted(removed, key=lambda item: item["start"]):
+        text = text[:span["start"]] + span["text"] + text[span["start"]:]
+    return text
+
+
+class BoilerplateStripper:
+    """
+    职位描述样板剥离器（线程安全）
+
+    用法：
+        stripper = BoilerplateStripper()           # 自动加载 BOILERPLATE_FINGERPRINTS_PATH 中学习到的指纹
+        stripped = stripper.strip(jd)              # {"text": ..., "removed": [...], "tokens_saved": ...}
+        restore(stripped["text"], stripped["removed"]) == jd
+        parser = JobParser(boilerplate_stripper=stripper)
+    """
+
+    def __init__(
+        self,
+        categories: Optional[Iterable[str]] = None,
+        fingerprints_path: Optional[str] = None
+    ):
+        """
+        初始化剥离器
+
+        Args:
+            categories: 启用的启发式类别（eeo、legal、privacy、apply、benefits、about），默认读取配置 BOILERPLATE_CATEGORIES；
+                "about"（公司介绍）可能含行业信息，默认不启用
+            fingerprints_path: 指纹文件路径，默认读取配置 BOILERPLATE_FINGERPRINTS_PATH（相对路径相对项目根目录）；
+                文件不存在时只用启发式规则
+        """
+        if categories is None:
+            categories = [name.strip() for name in config.BOILERPLATE_CATEGORIES.split(",") if name.strip()]
+        unknown = set(categories) - set(CATEGORIES)
+        if unknown:
+            raise ValueError(f"Unknown boilerplate categories: {', '.join(sorted(unknown))}")
+        self.categories = tuple(categories)
+        self.min_chars = config.BOILERPLATE_MIN_CHARS
+        path = Path(fingerprints_path or config.BOILERPLATE_FINGERPRINTS_PATH)
+        if not path.is_absolute():
+            path = project_root / path
+        self.fingerprints_path = str(path)
+        self.fingerprints: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            self.load_fingerprints(self.fingerprints_path)
+
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.original_tokens = 0
+        self.stripped_tokens = 0
+        self.removed_by_reason: Counter = Counter()
+
+    def learn(
+        self,
+        corpus: Iterable[str],
+        min_documents: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        从职位描述语料学习样板段落指纹（替换已有指纹）
+
+        内容完全相同的文档（重复发布）只计一次；含岗位要求特征的段落不学习，避免把同一模板的要求当作样板
+
+        Args:
+            corpus: 职位描述文本
+            min_documents: 段落至少出现在多少个不同文档中才视为样板，默认读取配置 BOILERPLATE_MIN_DOCUMENTS
+
+        Returns:
+            {"documents": 参与学习的文档数, "fingerprints": 学到的指纹数}
+        """
+        min_documents = min_documents or config.BOILERPLATE_MIN_DOCUMENTS
+        counts: Counter = Counter()
+        samples: Dict[str, str] = {}
+        seen_documents = set()
+        for text in corpus:
+            fingerprints = {}
+            for start, end in split_paragraphs(text or ""):
+                paragraph = text[start:end].strip()
+                if JOB_CONTENT_PATTERN.search(paragraph):
+                    continue
+                fingerprint = paragraph_fingerprint(paragraph, self.min_chars)
+                if fingerprint is not None:
+                    fingerprints[fingerprint] = paragraph
+            document_key = hashlib.blake2b(" ".join(text.lower().split()).encode("utf-8"), digest_size=12).digest()
+            if not fingerprints or document_key in seen_documents:
+                continue
+            seen_documents.add(document_key)
+            counts.update(fingerprints.keys())
+            for fingerprint, paragraph in fingerprints.items():
+                samples.setdefault(fingerprint, paragraph[:120])
+
+        self.fingerprints = {
+            fingerprint: {"documents": count, "sample": samples[fingerprint]}
+            for fingerprint, count in counts.items()
+            if count >= min_documents
+        }
+        return {"documents": len(seen_documents), "fingerprints": len(self.fingerprints)}
+
+    def save_fingerprints(self, file_path: Optional[str] = None) -> str:
+        """
+        保存指纹（JSON，含每个指纹的文档数和样例，便于人工检查）
+
+        Returns:
+            保存的文件路径
+        """
+        file_path = file_path or self.fingerprints_path
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprints": self.fingerprints}, f, ensure_ascii=False, indent=2)
+        return file_path
+
+    def load_fingerprints(self, file_path: str):
+        """加载 save_fingerprints 保存的指纹"""
+        with open(file_path, "r", encoding="utf-8") as f:
+            self.fingerprints = json.load(f).get("fingerprints", {})
+
+    def strip(self, text: str) -> Dict[str, Any]:
+        """
+        删除样板段落
+
+        Args:
+            text: 职位描述原文
+
+        Returns:
+            {
+                "text": 删除样板后的文本,
+                "removed": [{"start": 原文中的位置, "end": 结束位置, "reason": 原因, "text": 删除的原文}, ...],
+                "original_tokens": int,
+                "stripped_tokens": int,
+                "tokens_saved": int
+            }
+            reason 为 "fingerprint" 或启发式类别；删除后没有剩余内容时不删除任何段落
+        """
+        text = text or ""
+        removed = []
+        section = None
+        for start, end in split_paragraphs(text):
+            paragraph = text[start:end].strip()
+            reason = self._classify(paragraph, section)
+            heading = heading_of(paragraph)
+            if heading is not None:
+                # 新的小节：样板小节一直延续到下一个小节标题
+                section = self._section_category(heading)
+            elif reason is None:
+                section = None
+            if reason is not None:
+                removed.append({"start": start, "end": end, "reason": reason, "text": text[start:end]})
+
+        stripped = text
+        for span in reversed(removed):
+            stripped = stripped[:span["start"]] + stripped[span["end"]:]
+        if removed and not stripped.strip():
+            removed, stripped = [], text
+
+        original_tokens = estimate_tokens(text)
+        stripped_tokens = estimate_tokens(stripped)
+        with self._lock:
+            self.documents += 1
+            self.original_tokens += original_tokens
+            self.stripped_tokens += stripped_tokens
+            self.removed_by_reason.update(span["reason"] for span in removed)
+        return {
+            "text": stripped,
+            "removed": removed,
+            "original_tokens": original_tokens,
+            "stripped_tokens": stripped_tokens,
+            "tokens_saved": original_tokens - stripped_tokens
+        }
+
+    def _section_category(self, heading: str) -> Optional[str]:
+        for category in self.categories:
+            if SECTION_HEADINGS[category].fullmatch(heading):
+                return category
+        return None
+
+    def _classify(self, paragraph: str, section: Optional[str]) -> Optional[str]:
+        """段落的删除原因，不删除时返回 None"""
+        fingerprint = paragraph_fingerprint(paragraph, self.min_chars)
+        if fingerprint is not None and fingerprint in self.fingerprints:
+            return "fingerprint"
+        if JOB_CONTENT_PATTERN.search(paragraph):
+            return None
+        for category in self.categories:
+            pattern = PARAGRAPH_PATTERNS.get(category)
+            if pattern is not None and pattern.search(paragraph):
+                return category
+        heading = heading_of(paragraph)
+        if heading is not None:
+            return self._section_category(heading)
+        return section
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计：处理的文档数、原始和剥离后的 token 数、节省比例、各原因删除的段落数"""
+        with self._lock:
+            saved = self.original_tokens - self.stripped_tokens
+            return {
+                "documents": self.documents,
+                "fingerprints": len(self.fingerprints),
+                "original_tokens": self.original_tokens,
+                "stripped_tokens": self.stripped_tokens,
+                "tokens_saved": saved,
+                "saved_rate": round(saved / self.original_tokens, 4) if self.original_tokens else 0.0,
+                "removed_by_reason": dict(self.removed_by_reason)
+            }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="职位描述样板剥离")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    learn_parser = subparsers.add_parser("learn", help="从语料学习样板段落指纹")
+    learn_parser.add_argument("corpus", help="JSONL，每行带 text 或 job_description 字段")
+    learn_parser.add_argument("--min-documents", type=int, default=None, help="默认 BOILERPLATE_MIN_DOCUMENTS")
+    learn_parser.add_argument("--output", default=None, help="默认 BOILERPLATE_FINGERPRINTS_PATH")
+    strip_parser = subparsers.add_parser("strip", help="剥离一个职位描述文件中的样板")
+    strip_parser.add_argument("file", help="职位描述文本文件")
+    args = parser.parse_args()
+
+    stripper = BoilerplateStripper()
+    if args.command == "learn":
+        def read_corpus(path: str):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield record.get("text") or record.get("job_description") or ""
+
+        summary = stripper.learn(read_corpus(args.corpus), min_documents=args.min_documents)
+        output = stripper.save_fingerprints(args.output)
+        print(f"📚 {summary['documents']} 个文档，学到 {summary['fingerprints']} 个样板段落指纹")
+        print(f"💾 已保存到: {output}")
+    else:
+        original = Path(args.file).read_text(encoding="utf-8")
+        result = stripper.strip(original)
+        for span in result["removed"]:
+            print(f"✂️ [{span['reason']}] {span['text'].strip()[:80]!r}")
+        print("=" * 50)
+        print(result["text"])
+        print("=" * 50)
+        print(f"📉 {result['original_tokens']} -> {result['stripped_tokens']} tokens（节省 {result['tokens_saved']}）")
+        print(f"🔁 可还原: {restore(result['text'], result['removed']) == original}")
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+近似重复输入缓存
+按字符串哈希的缓存命中不了 "Senior Python dev, NYC" 和 "senior python developer in NYC" 这类输入。
+本模块先把输入规范化（大小写、空白、标点、同义词、复数、虚词），再用 MinHash/LSH 找出相似的已缓存输入，
+用精确的 Jaccard 相似度确认后返回缓存的结构化结果
+
+- 短输入（不超过 SHORT_TEXT_TOKENS 个词）按词集合比较，与词序无关；长输入（职位描述等）按连续 3 个词的片段比较
+- 规范化后完全相同的输入直接命中，不计算 MinHash
+- 由各提取器按需启用（构造参数 near_duplicate_cache），不同提取器、提供商、模型、提示词版本使用不同的命名空间
+"""
+
+import copy
+import hashlib
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet, Callable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 分隔符（保留 "c++"、"c#" 中的 + 和 #）
+SEPARATOR_PATTERN = re.compile(r"[^\w+#]+")
+
+# 同义词（规范化后的词或词组 -> 标准写法）
+SYNONYMS = {
+    "dev": "developer", "devs": "developer", "sr": "senior", "snr": "senior", "jr": "junior",
+    "mgr": "manager", "eng": "engineer", "engr": "engineer", "swe": "software engineer",
+    "sde": "software engineer", "vp": "vice president", "yr": "years", "yrs": "years", "year": "years",
+    "exp": "experience", "mid level": "mid", "entry level": "junior",
+    "nyc": "new york", "new york city": "new york", "ny": "new york", "sf": "san francisco",
+    "bay area": "san francisco", "uk": "united kingdom", "usa": "united states", "hk": "hong kong",
+    "blr": "bangalore", "bengaluru": "bangalore",
+    "js": "javascript", "ts": "typescript", "golang": "go", "k8s": "kubernetes", "postgres": "postgresql",
+    "ml": "machine learning", "ai": "artificial intelligence", "nlp": "natural language processing",
+    "front end": "frontend", "back end": "backend", "full stack": "fullstack", "wfh": "remote",
+    "北京市": "北京", "上海市": "上海",
+}
+
+# 多词同义词按长度从长到短替换
+MULTIWORD_SYNONYMS = sorted(
+    ((phrase, canonical) for phrase, canonical in SYNONYMS.items() if " " in phrase),
+    key=lambda item: len(item[0]),
+    reverse=True
+)
+
+# 不影响结果的常见虚词
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "at", "on", "for", "with", "to", "from", "by", "as", "is",
+    "are", "be", "we", "our", "who", "that", "this", "looking", "seeking", "hiring", "need", "needed",
+    "want", "wanted", "find", "someone", "candidate", "candidates", "please", "的", "和", "与", "及", "在",
+}
+
+# 按词集合比较的最大词数
+SHORT_TEXT_TOKENS = 20
+
+# 长输入的片段长度（词）
+SHINGLE_SIZE = 3
+
+# MinHash 使用的梅森素数
+MERSENNE_PRIME = (1 << 61) - 1
+
+# a * x + b 按 64 位无符号整数回绕（与 numpy uint64 运算一致）
+UINT64_MASK = (1 << 64) - 1
+
+
+def canonicalize(text: str) -> List[str]:
+    """
+    规范化输入：小写、标点和空白折叠、同义词替换、去复数、去虚词
+
+    Args:
+        text: 原始输入
+
+    Returns:
+        规范化后的词列表
+    """
+    padded = " " + " ".join(SEPARATOR_PATTERN.sub(" ", text.lower()).split()) + " "
+    for phrase, canonical in MULTIWORD_SYNONYMS:
+        if f" {phrase} " in padded:
+            padded = padded.replace(f" {phrase} ", f" {canonical} ")
+
+    tokens = []
+    for token in padded.split():
+        token = SYNONYMS.get(token, token)
+        if " " in token:
+            tokens.extend(token.split())
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and token.isascii():
+            token = token[:-1]
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def shingles(tokens: List[str]) -> FrozenSet[str]:
+    """短输入取词集合，长输入取连续 SHINGLE_SIZE 个词的片段集合"""
+    if len(tokens) <= SHORT_TEXT_TOKENS:
+        return frozenset(tokens)
+    return frozenset(" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def hash_items(items) -> List[int]:
+    """片段的 64 位哈希"""
+    return [int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little") for item in items]
+
+
+class MinHasher:
+    """
+    MinHash 签名：num_perm 个 ((a * x + b) mod 2^64) mod p 形式的哈希函数
+
+    安装了 numpy 时向量化计算（职位描述这类几百个片段的长输入快约 30 倍），结果与纯 Python 计算相同
+    """
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.coefficients = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+        if np is not None:
+            self._a = np.array([a for a, _ in self.coefficients], dtype=np.uint64)
+            self._b = np.array([b for _, b in self.coefficients], dtype=np.uint64)
+
+    def signature(self, items: FrozenSet[str]) -> Tuple[int, ...]:
+        return self.signature_from_hashes(hash_items(items))
+
+    def signature_from_hashes(self, hashed: List[int]) -> Tuple[int, ...]:
+        """
+        由片段哈希计算签名
+
+        Args:
+            hashed: hash_items 的结果
+
+        Returns:
+            长度为 num_perm 的签名
+        """
+        if not hashed:
+            return (MERSENNE_PRIME,) * self.num_perm
+        if np is not None:
+            values = np.array(hashed, dtype=np.uint64)[:, None] * self._a + self._b
+            return tuple((values % np.uint64(MERSENNE_PRIME)).min(axis=0).tolist())
+        return tuple(
+            min(((a * x + b) & UINT64_MASK) % MERSENNE_PRIME for x in hashed) for a, b in self.coefficients
+        )
+
+
+def same_token_set(cached_text: str, text: str) -> bool:
+    """
+    两条输入规范化后的词集合是否相同（只差虚词、同义写法、复数或词序）
+
+    用于没有抽取值可核对的结果（如标签器的五个维度判断）：多了一个城市或技能就可能改变某个维度，不能按相似度命中
+
+    Args:
+        cached_text: 缓存的原文
+        text: 输入文本
+
+    Returns:
+        True 表示缓存结果适用于输入
+    """
+    return set(canonicalize(cached_text)) == set(canonicalize(text))
+
+
+class NearDuplicateCache:
+    """
+    线程安全的近似重复输入缓存（LRU + TTL）
+
+    用法：
+        cache = NearDuplicateCache(threshold=0.9)
+        hit = cache.lookup("candidate_tagger:openai:gpt-4.1-nano", text)   # (结果, 相似度) 或 None
+        cache.store("candidate_tagger:openai:gpt-4.1-nano", text, result)
+
+    相似度高不代表抽取结果相同：只改了地点、公司的职位描述，或多了一个城市、技能的查询，差别恰好落在要抽取的字段上。
+    调用方用 lookup 的 accept 参数核对缓存的结果是否适用于新输入（见 same_token_set 和 util/batch_dedup.fits_member）
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            threshold: 命中需要的最低 Jaccard 相似度，默认读取配置 NEAR_DUPLICATE_THRESHOLD
+            num_perm: MinHash 签名长度，默认读取配置 NEAR_DUPLICATE_NUM_PERM
+            bands: LSH 分段数（num_perm 须能被整除），默认读取配置 NEAR_DUPLICATE_BANDS
+            max_entries: 最多缓存的条目数，默认读取配置 NEAR_DUPLICATE_MAX_ENTRIES
+            ttl: 缓存有效期（秒），默认读取配置 NEAR_DUPLICATE_TTL
+        """
+        self.threshold = threshold or config.NEAR_DUPLICATE_THRESHOLD
+        num_perm = num_perm or config.NEAR_DUPLICATE_NUM_PERM
+        self.bands = bands or config.NEAR_DUPLICATE_BANDS
+        if num_perm % self.bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({self.bands})")
+        self.rows = num_perm // self.bands
+        self.max_entries = max_entries or config.NEAR_DUPLICATE_MAX_ENTRIES
+        self.ttl = ttl or config.NEAR_DUPLICATE_TTL
+        self.hasher = MinHasher(num_perm)
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._buckets: Dict[tuple, set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _band_keys(self, namespace: str, items: FrozenSet[str]) -> List[tuple]:
+        signature = self.hasher.signature(items)
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def lookup(
+        self,
+        namespace: str,
+        text: str,
+        accept: Optional[Callable[[Dict[str, Any], str, str], bool]] = None
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        查找近似重复的已缓存输入
+
+        Args:
+            namespace: 命名空间（提取器、提供商、模型、提示词版本）
+            text: 输入文本
+            accept: 近似命中时调用 accept(缓存结果, 缓存的原文, 输入文本) 核对结果是否适用于新输入，
+                返回 False 时该条目不算命中（规范化后完全相同的输入不核对）
+
+        Returns:
+            (缓存结果的副本, Jaccard 相似度)，未命中时返回 None
+        """
+        tokens = canonicalize(text)
+        if not tokens:
+            return None
+        canonical = " ".join(tokens)
+        now = time.time()
+
+        with self._lock:
+            entry_id = self._exact.get((namespace, canonical))
+            if entry_id is not None and self._fresh(entry_id, now):
+                self._entries.move_to_end(entry_id)
+                self.exact_hits += 1
+                return copy.deepcopy(self._entries[entry_id]["result"]), 1.0
+
+        items = shingles(tokens)
+        band_keys = self._band_keys(namespace, items)
+        with self._lock:
+            candidates = set()
+            for key in band_keys:
+                candidates |= self._buckets.get(key, set())
+            scored = []
+            for candidate in candidates:
+                if not self._fresh(candidate, now):
+                    continue
+                score = jaccard(items, self._entries[candidate]["items"])
+                if score >= self.threshold:
+                    scored.append((score, candidate))
+            # 相似度从高到低，第一个通过核对的条目命中
+            for score, candidate in sorted(scored, reverse=True):
+                entry = self._entries[candidate]
+                if accept is not None and not accept(entry["result"], entry["text"], text):
+                    self.rejected += 1
+                    continue
+                self._entries.move_to_end(candidate)
+                self.near_hits += 1
+                return copy.deepcopy(entry["result"]), round(score, 4)
+            self.misses += 1
+            return None
+
+    def store(self, namespace: str, text: str, result: Dict[str, Any]):
+        """
+        缓存一条结果（调用方只应缓存成功的结果）
+
+        Args:
+            namespace: 命名空间
+            text: 输入文本
+            result: 结构化结果
+        """
+        tokens = canonicalize(text)
+        if not tokens:
+            return
+        canonical = " ".join(tokens)
+        items = shingles(tokens)
+        band_keys = self._band_keys(namespace, items)
+        stored = copy.deepcopy(result)
+
+        with self._lock:
+            existing = self._exact.get((namespace, canonical))
+            if existing is not None:
+                self._remove(existing)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "namespace": namespace,
+                "canonical": canonical,
+                "text": text,
+                "items": items,
+                "band_keys": band_keys,
+                "result": stored,
+                "stored_at": time.time()
+            }
+            self._exact[(namespace, canonical)] = entry_id
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _fresh(self, entry_id: int, now: float) -> bool:
+        """条目存在且未过期；过期条目顺便删除（调用方持有锁）"""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if now - entry["stored_at"] > self.ttl:
+            self._remove(entry_id)
+            return False
+        return True
+
+    def _remove(self, entry_id: int):
+        """删除条目及其索引（调用方持有锁）"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._exact.pop((entry["namespace"], entry["canonical"]), None)
+        for key in entry["band_keys"]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+near_duplicate_cache = NearDuplicateCache()
+
+
+if __name__ == "__main__":
+    cache = NearDuplicateCache()
+    cache.store("demo", "Senior Python dev, NYC", {"result": "cached"})
+    for query in [
+        "senior python developer in NYC",
+        "Sr. Python Developers — New York City",
+        "NYC senior python dev",
+        "Junior Python dev, NYC",
+        "Senior Java dev, NYC",
+    ]:
+        hit = cache.lookup("demo", query)
+        print(f"{'✅' if hit else '❌'} {query!r}  {canonicalize(query)}  {hit[1] if hit else ''}")
+    print(f"📊 {cache.get_stats()}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+增量流式 JSON 解析器
+逐段读取 LLM 流式输出，在完整对象生成之前就报告已经完成的顶层字段和顶层字段数组中的元素，
+自动跳过对象前后的 markdown 代码块标记和说明文字（根只能是对象：说明文字中的 "[1]" 之类不会被当成结果）
+"""
+
+import json
+from typing import Dict, Any, List, Optional
+
+
+class _Frame:
+    """一层正在解析的对象或数组"""
+
+    __slots__ = ("kind", "start", "key", "expect_key", "index", "scalar_start")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.key: Optional[str] = None
+        self.expect_key = kind == "{"
+        self.index = 0
+        self.scalar_start: Optional[int] = None
+
+
+class IncrementalJSONParser:
+    """
+    增量 JSON 解析器
+
+    每次 feed() 返回新完成的事件：
+        {"type": "field", "key": "jobTitles", "value": [...]}              顶层对象的一个字段完成
+        {"type": "item", "key": "result", "index": 0, "value": {...}}      顶层字段数组中的一个元素完成
+        {"type": "complete", "value": {...}}                               整个 JSON 对象完成
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._base = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self.done = False
+        self.result: Optional[Any] = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        输入一段新的流式文本
+
+        Args:
+            text: 新收到的文本片段
+
+        Returns:
+            本次新完成的事件列表
+        """
+        events: List[Dict[str, Any]] = []
+        if self.done or not text:
+            return events
+
+        self._buffer += text
+        buffer = self._buffer
+        end = self._base + len(buffer)
+
+        while self._pos < end and not self.done:
+            i = self._pos
+            c = buffer[i - self._base]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    raw = self._slice(self._string_start, i + 1)
+                    if self._string_is_key:
+                        frame.key = self._loads(raw)
+                    else:
+                        self._value_done(frame, raw, events)
+                continue
+
+            if not self._stack:
+                # 跳过对象之前的代码块标记和说明文字（所有提取器的输出都是对象，说明文字中的 [ 不是开头）
+                if c == "{":
+                    self._stack.append(_Frame(c, i))
+                    self._discard_before(i)
+                    buffer = self._buffer
+                continue
+
+            frame = self._stack[-1]
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = frame.kind == "{" and frame.expect_key
+            elif c in "{[":
+                self._stack.append(_Frame(c, i))
+            elif c in "}]":
+                self._flush_scalar(frame, i, events)
+                self._stack.pop()
+                raw = self._slice(frame.start, i + 1)
+                if not self._stack:
+                    self.done = True
+                    self.result = self._loads(raw)
+                    events.append({"type": "complete", "value": self.result})
+                else:
+                    self._value_done(self._stack[-1], raw, events)
+            elif c == ":":
+                frame.expect_key = False
+            elif c == ",":
+                self._flush_scalar(frame, i, events)
+                if frame.kind == "{":
+                    frame.expect_key = True
+            elif c.isspace():
+                self._flush_scalar(frame, i, events)
+            elif frame.scalar_start is None:
+                frame.scalar_start = i
+
+        return events
+
+    def _slice(self, start: int, end: int) -> str:
+        """按绝对位置截取缓冲区文本"""
+        return self._buffer[start - self._base:end - self._base]
+
+    def _discard_before(self, index: int):
+        """丢弃对象开始之前的文本"""
+        self._buffer = self._buffer[index - self._base:]
+        self._base = index
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _flush_scalar(self, frame: _Frame, end: int, events: List[Dict[str, Any]]):
+        """数字、true/false/null 等标量在遇到分隔符时才算完成"""
+        if frame.scalar_start is None:
+            return
+        raw = self._slice(frame.scalar_start, end)
+        frame.scalar_start = None
+        self._value_done(frame, raw, events)
+
+    def _value_done(self, frame: _Frame, raw: str, events: List[Dict[str, Any]]):
+        """frame 中的一个值完成，按所在层级生成事件"""
+        depth = len(self._stack)
+        if frame.kind == "{":
+            if depth == 1:
+                events.append({"type": "field", "key": frame.key, "value": self._loads(raw)})
+            return
+
+        if depth == 2:
+            events.append({
+                "type": "item",
+                "key": self._stack[0].key,
+                "index": frame.index,
+                "value": self._loads(raw)
+            })
+        frame.index += 1
+
+
+if __name__ == "__main__":
+    # 模拟 LLM 按小片段流式输出
+    sample = """```json
+{
+  "jobTitles": ["Product Manager", "Senior Product Manager"],
+  "requiredSkills": ["Agile", "Data Analysis"],
+  "Experience": {"gte": 3, "lte": 5},
+  "remote": false
+}
+```"""
+
+    parser = IncrementalJSONParser()
+    for start in range(0, len(sample), 7):
+        for event in parser.feed(sample[start:start + 7]):
+            print(f"📦 {json.dumps(event, ensure_ascii=False)}")
+
+    print(f"✅ 完成: {parser.done}")
+
+    # 对象之前的说明文字中带方括号
+    prefixed = 'Here is the result [1]:\n```json\n{"a": [1,2], "b": 3}\n```'
+    parser = IncrementalJSONParser()
+    for start in range(0, len(prefixed), 5):
+        for event in parser.feed(prefixed[start:start + 5]):
+            print(f"📦 {json.dumps(event, ensure_ascii=False)}")
+    print(f"✅ 完成: {parser.done}，结果: {parser.result}")
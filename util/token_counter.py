@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Token 估算工具
+在没有提供商 usage 信息时，用字符规则粗略估算 token 数
+"""
+
+import re
+
+
+# 中日韩字符通常一个字符约等于一个 token
+_CJK_PATTERN = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯]')
+
+# 其他语言按平均每 4 个字符一个 token 估算
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    Args:
+        text: 要估算的文本
+
+    Returns:
+        估算的 token 数（非空文本至少为 1）
+    """
+    if not text:
+        return 0
+
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    other_chars = len(text) - cjk_chars
+
+    estimated = cjk_chars + (other_chars + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return max(estimated, 1)
+
+
+if __name__ == "__main__":
+    samples = [
+        "We are looking for a backend engineer with 5+ years",
+        "我们正在招聘一名高级产品经理",
+        "",
+    ]
+    for sample in samples:
+        print(f"{estimate_tokens(sample):4d}  {sample!r}")
@@ -0,0 +1,1222 @@
+#!/usr/bin/env python3
+"""
+生产级异步 HTTP 服务
+基于 Starlette + uvicorn，复用 api/stream.py 的统一流式封装，对外提供流式聊天和 function/* 各提取器端点
+
+与 web_stream_demo.py（Flask 开发服务）的区别：
+- 所有请求共享一个 LLMClient，提供商连接走同一个连接池
+- SSE 在事件循环中异步输出，同步的提供商读取放在专用线程池中，不阻塞其它请求
+- 并发上限 SERVER_MAX_CONCURRENT_STREAMS（默认 5000），超出时返回 503 + Retry-After
+- 收到 SIGTERM/SIGINT 后停止接收新连接，等待进行中的流自然结束（最多 SERVER_DRAIN_TIMEOUT 秒），
+  超时后关闭剩余上游连接，让提供商停止生成
+
+并发上限说明：
+每个进行中的 LLM 请求（流式或非流式）占用一个并发名额，并在线程池中占用一个线程读取提供商连接，
+线程池大小为并发上限加少量余量。单机 5000 个并发流约占 5000 个线程、500MB 内存；
+调整 SERVER_MAX_CONCURRENT_STREAMS 时需同步确认 `ulimit -n` 大于并发上限的 2 倍（客户端连接 + 上游连接）。
+启用中途切换（SERVER_FAILOVER）时每个流还多一个上游拉取线程，GIL 争用使单机能保持的流数约减半，
+卡顿看门狗在过载时也可能误判，因此默认关闭。
+
+启动:
+    pip install starlette uvicorn websockets
+    python web_server.py
+
+压测（本地桩服务，不消耗真实额度）见 loadtest_stream.py
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, Callable
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from starlette.applications import Starlette
+    from starlette.requests import HTTPConnection, Request
+    from starlette.responses import JSONResponse, Response, StreamingResponse
+    from starlette.routing import Route, WebSocketRoute
+    from starlette.websockets import WebSocket, WebSocketDisconnect
+except ImportError:
+    print("❌ 需要安装 Starlette 和 uvicorn:")
+    print("   pip install starlette uvicorn")
+    sys.exit(1)
+
+from config import Config, config
+from api.llm import LLMClient
+from api.stream import StreamResponse, create_stream_response, format_sse_event
+from api.stream_metrics import stream_metrics_sink
+from api.stream_failover import FailoverStream
+from api.admission import admission_controller, AdmissionRejected, LANES
+from api.response_cache import response_cache, compute_etag, etag_matches, prompt_version
+from function.job_parser import JobParser
+from function.candidate_parser import CandidateParser
+from function.candidate_tagger import CandidateTagger
+from function.rule_tagger import RuleTagger
+from util.batch_dedup import NearDuplicateClusterer, cluster_sizes, fits_member, with_provenance
+from util.boilerplate import BoilerplateStripper
+from util.near_duplicate import near_duplicate_cache
+from function.target_company_generator import JobAnalyzer
+from function.sourcing_plan_keywords_generator import SourcingPlanGenerator
+from function.company_extractor import CompanyExtractor
+from function.sourcing_keyword_extractor import SourcingKeywordExtractor
+
+
+# 线程池在并发上限之外预留的线程数（非流式请求、关闭上游等短任务）
+EXECUTOR_HEADROOM = 64
+
+# SSE 响应头
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+    'Access-Control-Allow-Origin': '*'
+}
+
+# 不影响结果、不参与缓存键的请求字段
+NON_CACHE_FIELDS = ("stream", "provider", "model", "priority", "queue_deadline")
+
+# 提取器端点名称 -> 提取器类
+EXTRACTORS = {
+    "job_parser": JobParser,
+    "candidate_parser": CandidateParser,
+    "candidate_tagger": CandidateTagger,
+    "job_analyzer": JobAnalyzer,
+    "sourcing_plan": SourcingPlanGenerator,
+    "company_extractor": CompanyExtractor,
+    "sourcing_keyword_extractor": SourcingKeywordExtractor,
+}
+
+
+class ServerState:
+    """服务运行状态：共享客户端、并发名额、进行中的流、关闭排空"""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.max_concurrent = config.SERVER_MAX_CONCURRENT_STREAMS
+        self.llm_client: Optional[LLMClient] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.draining = False
+        self.active = 0
+        self.peak_active = 0
+        self.total_requests = 0
+        self.rejected_requests = 0
+        self.streams = set()
+        self._extractors: Dict[tuple, Any] = {}
+        # 标签器共享的规则预分类器（五个维度都有把握时不调用 LLM）
+        self.rule_tagger = RuleTagger() if config.RULE_TAGGER_ENABLED else None
+        # 启用近似重复输入缓存的提取器（仅支持标签器和两个解析器）
+        self.near_duplicate_functions = {
+            name.strip() for name in config.NEAR_DUPLICATE_FUNCTIONS.split(",") if name.strip()
+        } & {"candidate_tagger", "job_parser", "candidate_parser"}
+        # 职位描述样板剥离（仅支持职位解析、岗位分析和寻访策略）
+        self.boilerplate_functions = {
+            name.strip() for name in config.BOILERPLATE_FUNCTIONS.split(",") if name.strip()
+        } & {"job_parser", "job_analyzer", "sourcing_plan"}
+        self.boilerplate_stripper = BoilerplateStripper() if self.boilerplate_functions else None
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> bool:
+        """
+        占用并发名额，已满或正在关闭时返回 False
+
+        Args:
+            count: 名额数量（批量请求按并行度预留）
+        """
+        with self._lock:
+            if self.draining or self.active + count > self.max_concurrent:
+                self.rejected_requests += 1
+                return False
+            self.active += count
+            self.total_requests += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return True
+
+    def release(self, count: int = 1):
+        """释放并发名额"""
+        with self._lock:
+            self.active -= count
+
+    def track(self, stream_response: StreamResponse):
+        with self._lock:
+            self.streams.add(stream_response)
+
+    def untrack(self, stream_response: StreamResponse):
+        with self._lock:
+            self.streams.discard(stream_response)
+
+    def close_all(self, reason: str) -> int:
+        """关闭所有仍在进行的流，返回关闭数量"""
+        with self._lock:
+            streams = list(self.streams)
+        for stream_response in streams:
+            stream_response.close(reason)
+        return len(streams)
+
+    def get_extractor(self, name: str, provider: Optional[str], model: Optional[str]):
+        """
+        获取（并缓存）提取器实例，所有实例共享同一个 LLMClient
+
+        Args:
+            name: EXTRACTORS 中的名称
+            provider: LLM提供商，None 使用提取器默认值
+            model: 模型名称，None 使用提取器默认值
+        """
+        key = (name, provider, model)
+        with self._lock:
+            extractor = self._extractors.get(key)
+        if extractor is None:
+            kwargs = {"llm_client": self.llm_client}
+            if provider:
+                kwargs["provider"] = provider
+            if model:
+                kwargs["model"] = model
+            if name == "candidate_tagger" and self.rule_tagger is not None:
+                kwargs["rule_tagger"] = self.rule_tagger
+            if name in self.near_duplicate_functions:
+                kwargs["near_duplicate_cache"] = near_duplicate_cache
+            if name in self.boilerplate_functions:
+                kwargs["boilerplate_stripper"] = self.boilerplate_stripper
+            extractor = EXTRACTORS[name](**kwargs)
+            with self._lock:
+                extractor = self._extractors.setdefault(key, extractor)
+        return extractor
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": "draining" if self.draining else "ok",
+                "active": self.active,
+                "peak_active": self.peak_active,
+                "max_concurrent_streams": self.max_concurrent,
+                "open_streams": len(self.streams),
+                "total_requests": self.total_requests,
+                "rejected_requests": self.rejected_requests
+            }
+
+
+state = ServerState(config)
+
+
+class TrackedStreamingResponse(StreamingResponse):
+    """响应结束（完成、客户端断开或关闭时被取消）后释放并发名额并关闭上游"""
+
+    def __init__(
+        self,
+        content,
+        stream_response: Optional[StreamResponse] = None,
+        slots: int = 1,
+        ticket=None,
+        **kwargs
+    ):
+        super().__init__(content, **kwargs)
+        self._stream_response = stream_response
+        self._slots = slots
+        self._ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            reason = "server_shutdown" if state.draining else "client_disconnect"
+            if self._stream_response is not None:
+                # 已正常结束的流 close() 不会有任何动作
+                self._stream_response.close(reason)
+                state.untrack(self._stream_response)
+            if self._ticket is not None:
+                self._ticket.release()
+            state.release(self._slots)
+
+
+def error_response(message: str, status_code: int, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"success": False, "error": message}, status_code=status_code, headers=headers)
+
+
+def rejected_response(error: AdmissionRejected) -> JSONResponse:
+    """准入控制拒绝：429 + Retry-After"""
+    return JSONResponse(
+        {"success": False, "error": str(error), "reason": error.reason, "lane": error.lane},
+        status_code=429,
+        headers={"Retry-After": error.retry_after_header}
+    )
+
+
+def busy_response() -> JSONResponse:
+    if state.draining:
+        return error_response("Server is shutting down", 503, {"Retry-After": "5"})
+    return error_response("Server busy, too many concurrent requests", 503, {"Retry-After": "1"})
+
+
+async def read_params(request: Request) -> Optional[Dict[str, Any]]:
+    """读取请求参数：GET 读查询参数，POST 读 JSON 请求体；请求体不是 JSON 对象时返回 None"""
+    if request.method == "GET":
+        return dict(request.query_params)
+    try:
+        data = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def request_priority(request: HTTPConnection, data: Dict[str, Any], default: str = "interactive") -> tuple:
+    """
+    读取请求的优先级通道和排队截止时间
+
+    优先级来自请求头 X-Priority 或参数 priority；截止时间来自请求头 X-Queue-Deadline 或参数 queue_deadline，
+    只能比通道默认值更短
+
+    Returns:
+        (通道, 截止秒数或 None)
+
+    Raises:
+        ValueError: 通道名称或截止时间不正确
+    """
+    lane = request.headers.get("x-priority") or data.get("priority") or default
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority: {lane}. Supported: {', '.join(LANES)}")
+    deadline = request.headers.get("x-queue-deadline") or data.get("queue_deadline")
+    if deadline is None:
+        return lane, None
+    deadline = float(deadline)
+    if deadline <= 0:
+        raise ValueError("queue_deadline must be positive")
+    return lane, min(deadline, admission_controller.lanes[lane].deadline)
+
+
+async def admit(lane: str, deadline: Optional[float]) -> tuple:
+    """
+    依次占用服务并发名额和准入名额
+
+    Returns:
+        (AdmissionTicket, None) 或 (None, 错误响应)
+    """
+    if not state.acquire():
+        return None, busy_response()
+    try:
+        return await admission_controller.acquire(lane, deadline), None
+    except AdmissionRejected as e:
+        state.release()
+        return None, rejected_response(e)
+    except BaseException:
+        state.release()
+        raise
+
+
+def cache_lookup(
+    request: Request,
+    endpoint: str,
+    provider: Optional[str],
+    model: Optional[str],
+    version: str,
+    payload: Dict[str, Any]
+) -> tuple:
+    """
+    计算请求的 ETag 并查询响应缓存
+
+    Returns:
+        (ETag, 可直接返回的响应或 None)：If-None-Match 匹配时为 304，缓存命中时为缓存的响应体
+    """
+    etag = compute_etag(endpoint, provider, model, version, payload)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.record_not_modified()
+        return etag, Response(status_code=304, headers=cache_headers(etag))
+    body = response_cache.get(etag)
+    if body is not None:
+        return etag, cached_response(body, etag, hit=True)
+    return etag, None
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={state.config.RESPONSE_CACHE_MAX_AGE}"}
+
+
+def cached_response(body: bytes, etag: str, hit: bool) -> Response:
+    headers = cache_headers(etag)
+    headers["X-Cache"] = "HIT" if hit else "MISS"
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cache_store(etag: str, result: Dict[str, Any]) -> Response:
+    """成功的结果写入缓存并返回带 ETag 的响应；失败或输出无法解析（result 为 None）的结果不缓存"""
+    if not result.get("success") or ("result" in result and result["result"] is None):
+        return JSONResponse(result)
+    body = JSONResponse(result).body
+    response_cache.put(etag, body)
+    return cached_response(body, etag, hit=False)
+
+
+def is_cacheable(llm_params: Dict[str, Any], default_deterministic: bool) -> bool:
+    """
+    是否按 ETag 缓存：显式温度不高于 RESPONSE_CACHE_MAX_TEMPERATURE，或未指定温度且端点默认低温度
+    """
+    if not state.config.RESPONSE_CACHE_ENABLED:
+        return False
+    temperature = llm_params.get("temperature")
+    if temperature is None:
+        return default_deterministic
+    return temperature <= state.config.RESPONSE_CACHE_MAX_TEMPERATURE
+
+
+def llm_params_from(data: Dict[str, Any]) -> Dict[str, Any]:
+    """从请求参数中取出透传给 LLM 的采样参数"""
+    params = {}
+    if data.get("temperature") is not None:
+        params["temperature"] = float(data["temperature"])
+    if data.get("max_tokens") is not None:
+        params["max_tokens"] = int(data["max_tokens"])
+    return params
+
+
+def is_true(value: Any) -> bool:
+    return value is True or str(value).lower() in ("1", "true", "yes")
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """在服务线程池中运行同步调用"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+
+
+async def aiter_events(events: Iterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """把提取器的同步事件生成器转换为异步 SSE 输出"""
+    async_events = aiter_sync(events)
+    try:
+        async for event in async_events:
+            yield format_sse_event(json.dumps(event, ensure_ascii=False))
+        yield format_sse_event("[DONE]")
+    finally:
+        await async_events.aclose()
+
+
+async def aiter_sync(events: Iterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    在线程池中逐个读取提取器的同步事件生成器
+
+    客户端断开时，等当前正在读取的事件返回后再关闭生成器（生成器自身的 finally 会关闭上游）
+    """
+    loop = asyncio.get_running_loop()
+    sentinel = object()
+    lock = threading.Lock()
+    completed = False
+
+    def pull():
+        with lock:
+            return next(events, sentinel)
+
+    def close():
+        with lock:
+            events.close()
+
+    try:
+        while True:
+            event = await loop.run_in_executor(None, pull)
+            if event is sentinel:
+                completed = True
+                break
+            yield event
+    finally:
+        if not completed:
+            loop.run_in_executor(None, close)
+
+
+def buffer_stream(stream_response: StreamResponse) -> StreamResponse:
+    """
+    启用 SERVER_STREAM_BUFFER（默认关闭）时在提供商流和客户端之间加入有界缓冲队列，慢客户端不再占住提供商连接；
+    每个流多一个常驻线程，单机能保持的流数量明显下降（见 api/stream_buffer.py）
+    """
+    if not state.config.SERVER_STREAM_BUFFER:
+        return stream_response
+    return stream_response.buffered()
+
+
+def sse_response(stream_response: StreamResponse, ticket) -> TrackedStreamingResponse:
+    """StreamResponse -> SSE 响应（经过有界缓冲，响应结束时归还准入名额）"""
+    stream_response = buffer_stream(stream_response)
+    state.track(stream_response)
+    return TrackedStreamingResponse(
+        stream_response.to_async_sse(),
+        stream_response=stream_response,
+        ticket=ticket,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+def open_chat_stream(provider: str, model: str, messages, llm_params: Dict[str, Any]) -> StreamResponse:
+    """发起聊天流（在线程池中调用，建立连接可能阻塞）"""
+    client = state.llm_client
+    if state.config.SERVER_FAILOVER:
+        return StreamResponse(FailoverStream(client, provider, model, messages, start_time=time.time(), **llm_params))
+    start_time = time.time()
+    raw_stream = client.stream_llm(provider=provider, model=model, messages=messages, **llm_params)
+    return create_stream_response(raw_stream, provider, start_time=start_time, max_tokens=llm_params.get("max_tokens"))
+
+
+def chat_messages(data: Dict[str, Any]):
+    """从请求参数构建消息列表：支持 messages 数组或单条 message"""
+    messages = data.get("messages")
+    if isinstance(messages, list) and messages:
+        return messages
+    message = data.get("message")
+    if message:
+        return [{"role": "user", "content": message}]
+    return None
+
+
+async def health(request: Request) -> JSONResponse:
+    """健康检查：关闭排空期间返回 503，便于负载均衡摘除"""
+    stats = state.get_stats()
+    admission = admission_controller.get_stats()
+    stats["admission"] = {
+        "inflight": admission["inflight"],
+        "queued": admission["queued"],
+        "shed": admission["shed"]
+    }
+    return JSONResponse(stats, status_code=503 if state.draining else 200)
+
+
+async def cache_stats(request: Request) -> JSONResponse:
+    """响应缓存指标：条目数、命中率、304 次数，以及近似重复输入缓存的命中情况"""
+    return JSONResponse({**response_cache.get_stats(), "near_duplicate": near_duplicate_cache.get_stats()})
+
+
+async def rule_tagger_stats(request: Request) -> JSONResponse:
+    """规则预分类指标：分类次数、避免的 LLM 调用次数、平均耗时"""
+    if state.rule_tagger is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **state.rule_tagger.get_stats()})
+
+
+async def boilerplate_stats(request: Request) -> JSONResponse:
+    """样板剥离指标：处理的职位描述数、节省的 token 数、各原因删除的段落数"""
+    if state.boilerplate_stripper is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({
+        "enabled": True,
+        "functions": sorted(state.boilerplate_functions),
+        **state.boilerplate_stripper.get_stats()
+    })
+
+
+async def admission_stats(request: Request) -> JSONResponse:
+    """准入控制指标：各优先级通道的队列深度、放行数、拒绝数和排队耗时"""
+    return JSONResponse(admission_controller.get_stats())
+
+
+async def stream_chat(request: Request):
+    """SSE 流式聊天端点（GET 查询参数或 POST JSON）"""
+    data = await read_params(request)
+    if data is None:
+        return error_response("Invalid JSON body", 400)
+    messages = chat_messages(data)
+    if not messages:
+        return error_response("Message is required", 400)
+
+    provider = data.get("provider", "openai")
+    model = data.get("model", "gpt-4-1106-preview")
+    try:
+        llm_params = {"temperature": 0.7, "max_tokens": 500, **llm_params_from(data)}
+        lane, deadline = request_priority(request, data)
+    except (TypeError, ValueError) as e:
+        return error_response(str(e), 400)
+
+    ticket, rejection = await admit(lane, deadline)
+    if rejection is not None:
+        return rejection
+    try:
+        stream_response = await run_blocking(open_chat_stream, provider, model, messages, llm_params)
+    except Exception as e:
+        ticket.release()
+        state.release()
+        return error_response(str(e), 502)
+    return sse_response(stream_response, ticket)
+
+
+async def api_chat(request: Request) -> JSONResponse:
+    """非流式聊天端点"""
+    data = await read_params(request)
+    if data is None:
+        return error_response("Invalid JSON body", 400)
+    messages = chat_messages(data)
+    if not messages:
+        return error_response("Message is required", 400)
+
+    provider = data.get("provider", "openai")
+    model = data.get("model", "gpt-4-1106-preview")
+    try:
+        llm_params = {"temperature": 0.7, "max_tokens": 500, **llm_params_from(data)}
+        lane, deadline = request_priority(request, data)
+    except (TypeError, ValueError) as e:
+        return error_response(str(e), 400)
+
+    etag = None
+    if is_cacheable(llm_params, False):
+        etag, cached = cache_lookup(request, "chat", provider, model, "chat", {"messages": messages, **llm_params})
+        if cached is not None:
+            return cached
+
+    ticket, rejection = await admit(lane, deadline)
+    if rejection is not None:
+        return rejection
+    try:
+        def collect():
+            stream_response = open_chat_stream(provider, model, messages, llm_params)
+            return stream_response.collect_full_response()
+
+        result = await run_blocking(collect)
+        if etag is not None:
+            return cache_store(etag, result)
+        return JSONResponse(result)
+    except Exception as e:
+        return error_response(str(e), 500)
+    finally:
+        ticket.release()
+        state.release()
+
+
+def _jd_args(data: Dict[str, Any]) -> tuple:
+    return data["jd_content"], data["company_name"], data["position_title"], data.get("output_language", "auto")
+
+
+# 提取器操作（HTTP 端点和 WebSocket 共用）：
+# input_fields: 必填的请求字段
+# blocking: (extractor, data, llm_params) -> 结果字典
+# streaming: (extractor, data, llm_params) -> StreamResponse 或事件生成器；None 表示不支持流式
+# deterministic: 提取器默认使用低温度，未指定 temperature 的非流式请求按 ETag 缓存
+EXTRACTOR_OPERATIONS = {
+    "job_parser": {
+        "input_fields": ("job_description",),
+        "blocking": lambda ex, data, params: ex.parse_job_description(data["job_description"], **params),
+        "streaming": lambda ex, data, params: ex.stream_parse_job_description(data["job_description"], **params),
+        "deterministic": True
+    },
+    "candidate_parser": {
+        "input_fields": ("description",),
+        "blocking": lambda ex, data, params: ex.parse_candidate_description(data["description"], **params),
+        "streaming": lambda ex, data, params: ex.stream_parse_candidate_description(data["description"], **params),
+        "deterministic": True
+    },
+    "candidate_tagger": {
+        "input_fields": ("text",),
+        "blocking": lambda ex, data, params: ex.analyze_text(data["text"], **params),
+        "streaming": lambda ex, data, params: ex.stream_analyze_text(
+            data["text"], early_stop=is_true(data.get("early_stop", False)), **params
+        ),
+        "deterministic": True
+    },
+    "job_analyzer": {
+        "input_fields": ("jd_content", "company_name", "position_title"),
+        "blocking": lambda ex, data, params: ex.analyze_job(*_jd_args(data), **params),
+        "streaming": lambda ex, data, params: ex.stream_analyze_job(*_jd_args(data), **params),
+        "deterministic": False
+    },
+    "sourcing_plan": {
+        "input_fields": ("jd_content", "company_name", "position_title"),
+        "blocking": lambda ex, data, params: ex.generate_sourcing_plan(*_jd_args(data), **params),
+        "streaming": lambda ex, data, params: ex.stream_generate_sourcing_plan(*_jd_args(data), **params),
+        "deterministic": False
+    },
+    "company_extractor": {
+        "input_fields": ("analysis_result",),
+        "blocking": lambda ex, data, params: ex.extract_companies(data["analysis_result"], **params),
+        "streaming": None,
+        "deterministic": True
+    },
+    "sourcing_keyword_extractor": {
+        "input_fields": ("sourcing_plan_content",),
+        "blocking": lambda ex, data, params: ex.extract_sourcing_keywords(data["sourcing_plan_content"], **params),
+        "streaming": None,
+        "deterministic": True
+    },
+}
+
+
+def missing_fields(name: str, data: Dict[str, Any]) -> list:
+    return [field for field in EXTRACTOR_OPERATIONS[name]["input_fields"] if not data.get(field)]
+
+
+def extractor_endpoint(name: str):
+    """
+    生成提取器端点
+
+    Args:
+        name: EXTRACTOR_OPERATIONS 中的名称
+    """
+    operation = EXTRACTOR_OPERATIONS[name]
+    blocking, streaming = operation["blocking"], operation["streaming"]
+
+    async def endpoint(request: Request):
+        data = await read_params(request)
+        if data is None:
+            return error_response("Invalid JSON body", 400)
+        missing = missing_fields(name, data)
+        if missing:
+            return error_response(f"Missing required fields: {', '.join(missing)}", 400)
+
+        use_stream = is_true(data.get("stream", False))
+        if use_stream and streaming is None:
+            return error_response(f"{name} does not support streaming", 400)
+
+        try:
+            llm_params = llm_params_from(data)
+            lane, deadline = request_priority(request, data)
+        except (TypeError, ValueError) as e:
+            return error_response(str(e), 400)
+
+        provider, model = data.get("provider"), data.get("model")
+        etag = None
+        if not use_stream and is_cacheable(llm_params, operation["deterministic"]):
+            try:
+                extractor = state.get_extractor(name, provider, model)
+            except Exception as e:
+                return error_response(str(e), 500)
+            payload = {key: value for key, value in data.items() if key not in NON_CACHE_FIELDS}
+            etag, cached = cache_lookup(
+                request, name, provider, model, prompt_version(extractor.prompt_template), payload
+            )
+            if cached is not None:
+                return cached
+
+        ticket, rejection = await admit(lane, deadline)
+        if rejection is not None:
+            return rejection
+        released = False
+        try:
+            extractor = state.get_extractor(name, provider, model)
+
+            if not use_stream:
+                result = await run_blocking(blocking, extractor, data, llm_params)
+                if etag is not None:
+                    return cache_store(etag, result)
+                return JSONResponse(result)
+
+            stream = await run_blocking(streaming, extractor, data, llm_params)
+            released = True
+            if isinstance(stream, StreamResponse):
+                return sse_response(stream, ticket)
+            return TrackedStreamingResponse(
+                aiter_events(stream),
+                ticket=ticket,
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(str(e), 500)
+        finally:
+            # 流式响应的名额在 TrackedStreamingResponse 结束时释放
+            if not released:
+                ticket.release()
+                state.release()
+
+    endpoint.__name__ = name
+    return endpoint
+
+
+# 批量端点支持的提取器 -> 单条调用
+BATCH_HANDLERS = {
+    "candidate_tagger": lambda ex, text, params: ex.analyze_text(text, **params),
+    "job_parser": lambda ex, text, params: ex.parse_job_description(text, **params),
+    "candidate_parser": lambda ex, text, params: ex.parse_candidate_description(text, **params),
+}
+
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    解析批量请求体：JSON 数组或 NDJSON（每行一个 JSON）
+
+    每一项可以是字符串，或带 "text" 字段的对象
+
+    Returns:
+        文本列表
+
+    Raises:
+        ValueError: 请求体格式错误
+    """
+    text = body.decode("utf-8").strip()
+    if not text:
+        raise ValueError("Empty batch body")
+
+    if "ndjson" not in content_type and text.startswith("["):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("Batch body must be a JSON array")
+    else:
+        items = []
+        for line_no, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f"Invalid JSON on line {line_no}")
+
+    texts = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            item = item.get("text")
+        if not isinstance(item, str) or not item.strip():
+            raise ValueError(f"Item {index} must be a non-empty string or an object with \"text\"")
+        texts.append(item)
+    return texts
+
+
+async def run_batch(
+    handler: Callable,
+    extractor,
+    texts: list,
+    params: Dict[str, Any],
+    concurrency: int,
+    lane: str,
+    assignments: Optional[list] = None
+) -> AsyncIterator[str]:
+    """
+    以有限并行度处理批量输入，每完成一项立即输出一行 NDJSON（按完成顺序，带输入序号）
+
+    每一项单独经过准入控制（不设排队截止时间），interactive 请求可以插队；
+    队列已满而未被准入的项输出 {"success": false, "error": "queue_full"}；
+    客户端断开时停止派发新的输入；已在执行的调用完成后丢弃结果
+
+    Args:
+        assignments: 去重聚类结果（每项的 (代表序号, 相似度)，见 util/batch_dedup.py）；
+            设置时只处理代表，代表完成后输出整个簇，每项结果带 "dedup" 来源；
+            代表抽取出的原文值在成员原文中找不到的成员单独处理（见 fits_member）
+    """
+    start_time = time.time()
+    results: asyncio.Queue = asyncio.Queue()
+    work: asyncio.Queue = asyncio.Queue()
+    members: Dict[int, list] = {}
+    for index, (representative, _) in enumerate(assignments or [(index, 1.0) for index in range(len(texts))]):
+        members.setdefault(representative, []).append(index)
+    sizes = cluster_sizes(assignments) if assignments else {}
+    for representative in members:
+        work.put_nowait(representative)
+    reparsed: list = []
+
+    async def worker():
+        while True:
+            index = await work.get()
+            try:
+                ticket = await admission_controller.acquire(lane, deadline=0)
+            except AdmissionRejected as e:
+                await results.put((index, {"success": False, "error": e.reason}))
+                continue
+            try:
+                result = await run_blocking(handler, extractor, texts[index], params)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            finally:
+                ticket.release()
+            await results.put((index, result))
+
+    def cluster_items(index: int, result: Dict[str, Any]):
+        """代表完成后可以输出的 (序号, 结果)；抽取值与代表不同的成员重新排队单独处理"""
+        if not assignments:
+            return [(index, result)]
+        representative, similarity = assignments[index]
+        if index != representative:
+            return [(index, with_provenance(
+                result, index, representative, similarity, sizes[representative], reparsed=True
+            ))]
+        items = []
+        for member in members[representative]:
+            if member != representative and not fits_member(result, texts[representative], texts[member]):
+                work.put_nowait(member)
+                reparsed.append(member)
+                continue
+            items.append((member, with_provenance(
+                result, member, representative, assignments[member][1], sizes[representative]
+            )))
+        return items
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    succeeded = 0
+    delivered = 0
+    try:
+        while delivered < len(texts):
+            index, result = await results.get()
+            for member, item in cluster_items(index, result):
+                delivered += 1
+                if item.get("success"):
+                    succeeded += 1
+                yield json.dumps({"type": "item", "index": member, "result": item}, ensure_ascii=False) + "\n"
+
+        summary = {
+            "type": "summary",
+            "total": len(texts),
+            "succeeded": succeeded,
+            "failed": len(texts) - succeeded,
+            "concurrency": concurrency,
+            "duration": round(time.time() - start_time, 3)
+        }
+        if assignments:
+            summary["representatives"] = len(members)
+            summary["reparsed"] = len(reparsed)
+        yield json.dumps(summary) + "\n"
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def api_batch(request: Request):
+    """
+    批量端点：POST /api/batch/{extractor}
+
+    请求体为 JSON 数组或 NDJSON，查询参数可指定 provider、model、temperature、max_tokens、concurrency、
+    priority（默认 batch）、dedup（聚类近似重复的输入，每簇只调用一次）、dedup_threshold；
+    响应为 NDJSON，每完成一项输出 {"type": "item", "index": 输入序号, "result": {...}}，最后输出 {"type": "summary", ...}
+    """
+    name = request.path_params["extractor"]
+    handler = BATCH_HANDLERS.get(name)
+    if handler is None:
+        return error_response(f"Unsupported batch extractor: {name}. Supported: {', '.join(BATCH_HANDLERS)}", 404)
+
+    params = dict(request.query_params)
+    try:
+        texts = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+        llm_params = llm_params_from(params)
+        concurrency = int(params.get("concurrency", state.config.BATCH_DEFAULT_CONCURRENCY))
+        lane, _ = request_priority(request, params, default="batch")
+        dedup_threshold = float(params["dedup_threshold"]) if "dedup_threshold" in params else None
+    except (UnicodeDecodeError, TypeError, ValueError) as e:
+        return error_response(str(e), 400)
+
+    if len(texts) > state.config.BATCH_MAX_ITEMS:
+        return error_response(f"Batch too large: {len(texts)} items (max {state.config.BATCH_MAX_ITEMS})", 413)
+
+    assignments = None
+    if is_true(params.get("dedup", False)):
+        def cluster():
+            with NearDuplicateClusterer(threshold=dedup_threshold) as clusterer:
+                return clusterer.cluster(texts)
+        assignments = await run_blocking(cluster)
+    unique = len(cluster_sizes(assignments)) if assignments else len(texts)
+    concurrency = max(1, min(concurrency, state.config.BATCH_MAX_CONCURRENCY, unique))
+
+    try:
+        admission_controller.check(lane, concurrency)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+
+    # 批量请求按并行度预留并发名额
+    if not state.acquire(concurrency):
+        return busy_response()
+    try:
+        extractor = state.get_extractor(name, params.get("provider"), params.get("model"))
+    except Exception as e:
+        state.release(concurrency)
+        return error_response(str(e), 500)
+
+    return TrackedStreamingResponse(
+        run_batch(handler, extractor, texts, llm_params, concurrency, lane, assignments),
+        slots=concurrency,
+        media_type="application/x-ndjson",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def ws_frame(stream_id: Optional[str], frame_type: str, raw_data: Optional[str] = None, **fields) -> str:
+    """
+    构建 WebSocket 帧：{"id": 流ID, "type": 帧类型, ...}
+
+    Args:
+        raw_data: 已序列化的 JSON（数据块），原样放入 "data" 字段，避免反序列化再序列化
+    """
+    frame = json.dumps({"id": stream_id, "type": frame_type, **fields}, ensure_ascii=False)
+    if raw_data is None:
+        return frame
+    return frame[:-1] + ', "data": ' + raw_data + "}"
+
+
+class MultiplexSession:
+    """
+    一个 WebSocket 连接上的多路逻辑流
+
+    客户端消息：
+        {"type": "open", "id": "q1", "op": "chat" | EXTRACTOR_OPERATIONS 中的名称, "params": {...}}
+        {"type": "cancel", "id": "q1"}
+        {"type": "ping"}
+    服务端帧（都带 id）：
+        chunk（StreamResponse 数据块）、event（提取器流式事件）、result（非流式结果）、
+        done（该流结束）、cancelled、error（带 status，准入拒绝时为 429 并带 retry_after）、pong
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.max_streams = state.config.WS_MAX_STREAMS_PER_CONNECTION
+        self.streams: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def send(self, frame: str):
+        """发送一帧；连接已断开时丢弃（由接收循环负责取消所有流）"""
+        if self.closed:
+            return
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(frame)
+            except (WebSocketDisconnect, RuntimeError, OSError):
+                self.closed = True
+
+    async def serve(self):
+        """接收循环：处理 open / cancel / ping，连接断开时取消该连接上的所有流"""
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                    if not isinstance(message, dict):
+                        raise ValueError
+                except ValueError:
+                    await self.send(ws_frame(None, "error", status=400, error="Message must be a JSON object"))
+                    continue
+                await self.handle(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.closed = True
+            tasks = list(self.streams.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def handle(self, message: Dict[str, Any]):
+        message_type = message.get("type")
+        stream_id = message.get("id")
+        if message_type == "ping":
+            await self.send(ws_frame(stream_id, "pong"))
+            return
+        if not isinstance(stream_id, str) or not stream_id:
+            await self.send(ws_frame(None, "error", status=400, error="Message id must be a non-empty string"))
+            return
+
+        if message_type == "cancel":
+            task = self.streams.get(stream_id)
+            if task is None:
+                await self.send(ws_frame(stream_id, "error", status=404, error="Unknown or finished stream"))
+                return
+            task.cancel()
+            await self.send(ws_frame(stream_id, "cancelled"))
+            return
+
+        if message_type != "open":
+            await self.send(ws_frame(stream_id, "error", status=400, error=f"Unknown message type: {message_type}"))
+            return
+        if stream_id in self.streams:
+            await self.send(ws_frame(stream_id, "error", status=409, error="Stream id is already in use"))
+            return
+        if len(self.streams) >= self.max_streams:
+            await self.send(ws_frame(
+                stream_id, "error", status=429,
+                error=f"Too many concurrent streams on this connection (max {self.max_streams})"
+            ))
+            return
+
+        params = message.get("params") or {}
+        op = message.get("op")
+        error = self._validate(op, params)
+        if error:
+            await self.send(ws_frame(stream_id, "error", status=400, error=error))
+            return
+        task = asyncio.create_task(self.run(stream_id, op, params))
+        self.streams[stream_id] = task
+        task.add_done_callback(lambda _: self.streams.pop(stream_id, None))
+
+    @staticmethod
+    def _validate(op: Any, params: Any) -> Optional[str]:
+        if not isinstance(params, dict):
+            return "params must be an object"
+        if op == "chat":
+            return None if chat_messages(params) else "Message is required"
+        if op not in EXTRACTOR_OPERATIONS:
+            return f"Unknown op: {op}. Supported: chat, {', '.join(EXTRACTOR_OPERATIONS)}"
+        missing = missing_fields(op, params)
+        if missing:
+            return f"Missing required fields: {', '.join(missing)}"
+        return None
+
+    async def run(self, stream_id: str, op: str, params: Dict[str, Any]):
+        """执行一个逻辑流：准入 -> 调用 -> 逐块发送 -> done；取消时关闭上游"""
+        try:
+            if op == "chat":
+                llm_params = {"temperature": 0.7, "max_tokens": 500, **llm_params_from(params)}
+            else:
+                llm_params = llm_params_from(params)
+            lane, deadline = request_priority(self.websocket, params)
+        except (TypeError, ValueError) as e:
+            await self.send(ws_frame(stream_id, "error", status=400, error=str(e)))
+            return
+
+        ticket, rejection = await admit(lane, deadline)
+        if rejection is not None:
+            fields = json.loads(rejection.body)
+            fields.pop("success", None)
+            retry_after = rejection.headers.get("retry-after")
+            if retry_after:
+                fields["retry_after"] = int(retry_after)
+            await self.send(ws_frame(stream_id, "error", status=rejection.status_code, **fields))
+            return
+
+        try:
+            if op == "chat":
+                provider = params.get("provider", "openai")
+                model = params.get("model", "gpt-4-1106-preview")
+                messages = chat_messages(params)
+                stream = await run_blocking(open_chat_stream, provider, model, messages, llm_params)
+            else:
+                operation = EXTRACTOR_OPERATIONS[op]
+                extractor = state.get_extractor(op, params.get("provider"), params.get("model"))
+                # 支持流式的操作默认流式，params.stream=false 时返回单个 result 帧
+                if operation["streaming"] is None or not is_true(params.get("stream", True)):
+                    result = await run_blocking(operation["blocking"], extractor, params, llm_params)
+                    await self.send(ws_frame(stream_id, "result", raw_data=json.dumps(result, ensure_ascii=False)))
+                    await self.send(ws_frame(stream_id, "done"))
+                    return
+                stream = await run_blocking(operation["streaming"], extractor, params, llm_params)
+
+            if isinstance(stream, StreamResponse):
+                await self._relay_chunks(stream_id, stream)
+            else:
+                await self._relay_events(stream_id, stream)
+            await self.send(ws_frame(stream_id, "done"))
+        except asyncio.CancelledError:
+            raise
+        except ValueError as e:
+            await self.send(ws_frame(stream_id, "error", status=400, error=str(e)))
+        except Exception as e:
+            await self.send(ws_frame(stream_id, "error", status=500, error=str(e)))
+        finally:
+            ticket.release()
+            state.release()
+
+    async def _relay_chunks(self, stream_id: str, stream_response: StreamResponse):
+        stream_response = buffer_stream(stream_response)
+        state.track(stream_response)
+        try:
+            async for message in stream_response.to_async_websocket():
+                await self.send(ws_frame(stream_id, "chunk", raw_data=message))
+                if self.closed:
+                    break
+        finally:
+            stream_response.close("server_shutdown" if state.draining else "client_disconnect")
+            state.untrack(stream_response)
+
+    async def _relay_events(self, stream_id: str, events: Iterator[Dict[str, Any]]):
+        async_events = aiter_sync(events)
+        try:
+            async for event in async_events:
+                await self.send(ws_frame(stream_id, "event", raw_data=json.dumps(event, ensure_ascii=False)))
+                if self.closed:
+                    break
+        finally:
+            await async_events.aclose()
+
+
+async def ws_multiplex(websocket: WebSocket):
+    """WebSocket 多路复用端点：一个连接上同时进行多个 LLM 流，帧带流ID，可单独取消"""
+    if state.draining:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    await MultiplexSession(websocket).serve()
+
+
+async def stream_metrics(request: Request) -> JSONResponse:
+    """各提供商的流式延迟指标"""
+    return JSONResponse(stream_metrics_sink.snapshot())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时创建共享客户端和线程池；关闭时关闭剩余的流并释放连接池"""
+    loop = asyncio.get_running_loop()
+    state.llm_client = LLMClient()
+    state.executor = ThreadPoolExecutor(
+        max_workers=state.max_concurrent + EXECUTOR_HEADROOM,
+        thread_name_prefix="apn-io"
+    )
+    loop.set_default_executor(state.executor)
+    try:
+        yield
+    finally:
+        # uvicorn 已等待进行中的连接结束（最多 SERVER_DRAIN_TIMEOUT 秒），这里关闭仍未结束的上游
+        state.draining = True
+        closed = state.close_all("server_shutdown")
+        if closed:
+            print(f"⚠️ 关闭时仍有 {closed} 个流未结束，已取消上游")
+        state.llm_client.close()
+        state.executor.shutdown(wait=False, cancel_futures=True)
+
+
+routes = [
+    Route("/health", health, methods=["GET"]),
+    Route("/stream", stream_chat, methods=["GET", "POST"]),
+    Route("/api/chat", api_chat, methods=["GET", "POST"]),
+    Route("/api/stream-metrics", stream_metrics, methods=["GET"]),
+    Route("/api/admission", admission_stats, methods=["GET"]),
+    Route("/api/cache", cache_stats, methods=["GET"]),
+    Route("/api/rule-tagger", rule_tagger_stats, methods=["GET"]),
+    Route("/api/boilerplate", boilerplate_stats, methods=["GET"]),
+    Route("/api/batch/{extractor}", api_batch, methods=["POST"]),
+    WebSocketRoute("/ws", ws_multiplex),
+    Route("/api/job/parse", extractor_endpoint("job_parser"), methods=["GET", "POST"]),
+    Route("/api/candidate/parse", extractor_endpoint("candidate_parser"), methods=["GET", "POST"]),
+    Route("/api/candidate/tags", extractor_endpoint("candidate_tagger"), methods=["GET", "POST"]),
+    Route("/api/job/analyze", extractor_endpoint("job_analyzer"), methods=["POST"]),
+    Route("/api/sourcing/plan", extractor_endpoint("sourcing_plan"), methods=["POST"]),
+    Route("/api/companies/extract", extractor_endpoint("company_extractor"), methods=["POST"]),
+    Route("/api/sourcing/keywords", extractor_endpoint("sourcing_keyword_extractor"), methods=["POST"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ 需要安装 uvicorn:")
+        print("   pip install uvicorn")
+        sys.exit(1)
+
+    print("🚀 启动 APN Pro AI 服务")
+    print("=" * 50)
+    print(f"📱 地址: http://{config.SERVER_HOST}:{config.SERVER_PORT}")
+    print(f"🔢 并发上限: {config.SERVER_MAX_CONCURRENT_STREAMS}（SERVER_MAX_CONCURRENT_STREAMS）")
+    print(f"⏳ 关闭排空时限: {config.SERVER_DRAIN_TIMEOUT}s（SERVER_DRAIN_TIMEOUT）")
+    print("🔗 API 端点:")
+    print("   GET  /health                 - 健康检查与并发状态")
+    print("   GET|POST /stream             - SSE 流式聊天")
+    print("   GET|POST /api/chat           - 非流式聊天（低温度时按 ETag 缓存）")
+    print("   GET|POST /api/job/parse      - 职位描述解析（stream=true 流式）")
+    print("   GET|POST /api/candidate/parse - 候选人描述解析（stream=true 流式）")
+    print("   GET|POST /api/candidate/tags - 候选人标签分析（stream=true 流式）")
+    print("   POST /api/job/analyze        - 岗位分析（stream=true 流式）")
+    print("   POST /api/sourcing/plan      - 寻访策略（stream=true 流式）")
+    print("   POST /api/companies/extract  - 目标公司提取")
+    print("   POST /api/sourcing/keywords  - 寻访关键词提取")
+    print("   POST /api/batch/{extractor}  - 批量标签/解析（JSON 数组或 NDJSON，逐项返回 NDJSON）")
+    print("   WS   /ws                     - WebSocket 多路复用（一个连接上多个流，可单独取消）")
+    print("   GET  /api/stream-metrics     - 流式延迟指标")
+    print("   GET  /api/admission          - 准入控制指标（队列深度、拒绝数）")
+    print("   GET  /api/cache              - 响应缓存指标")
+    print("   GET  /api/rule-tagger        - 规则预分类指标（避免的 LLM 调用次数）")
+    print("   GET  /api/boilerplate        - 职位描述样板剥离指标（节省的 token 数）")
+    print("=" * 50)
+
+    uvicorn.run(
+        app,
+        host=config.SERVER_HOST,
+        port=config.SERVER_PORT,
+        backlog=max(2048, config.SERVER_MAX_CONCURRENT_STREAMS),
+        timeout_graceful_shutdown=int(config.SERVER_DRAIN_TIMEOUT),
+        log_level="warning"
+    )
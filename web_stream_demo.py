@@ -7,6 +7,7 @@ Web 流式响应演示
 import sys
 from pathlib import Path
 import json
+import time
 from typing import Dict, Any
 
 # 添加项目根目录到Python路径
@@ -22,7 +23,11 @@ except ImportError:
     sys.exit(1)
 
 from api.llm import LLMClient
-from api.stream import create_stream_response
+from api.stream import create_stream_response, StreamResponse
+from api.stream_metrics import stream_metrics_sink
+from api.stream_broadcast import broadcast_hub, make_broadcast_key
+from api.stream_resume import sse_replay_store, parse_last_event_id
+from api.stream_failover import FailoverStream
 
 
 app = Flask(__name__)
@@ -167,6 +172,11 @@ HTML_TEMPLATE = """
             };
             
             eventSource.onerror = function(event) {
+                // 连接中断时浏览器会携带 Last-Event-ID 自动重连，服务端从断点续传
+                if (eventSource.readyState === EventSource.CONNECTING) {
+                    console.warn('SSE 连接中断，正在重连...');
+                    return;
+                }
                 console.error('SSE 连接错误:', event);
                 eventSource.close();
                 if (content.length === 0) {
@@ -224,60 +234,65 @@ def stream_chat():
     message = request.args.get('message', '')
     provider = request.args.get('provider', 'openai')
     model = request.args.get('model', 'gpt-4-1106-preview')
+    # share=1 时相同请求共用同一个上游生成（适合多人同时打开同一份长分析）
+    share = request.args.get('share', '0') == '1'
     
     if not message:
         return jsonify({"error": "Message is required"}), 400
     
-    def generate_stream():
-        """生成器函数，用于 SSE 响应"""
+    messages = [{"role": "user", "content": message}]
+    llm_params = {"temperature": 0.7, "max_tokens": 500}
+    
+    def open_upstream():
+        """发起提供商流式请求并返回统一流（卡顿或出错时自动切换到备用提供商续写）"""
+        return FailoverStream(
+            LLMClient(),
+            provider,
+            model,
+            messages,
+            start_time=time.time(),
+            **llm_params
+        )
+    
+    def generate_stream(stream_id: str):
+        """生成器函数，用于 SSE 响应（在续传存储的后台线程中运行）"""
+        subscriber = None
         try:
-            llm = LLMClient()
-            
-            # 获取原始流
-            raw_stream = llm.stream_llm(
-                provider=provider,
-                model=model,
-                messages=[{"role": "user", "content": message}],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
             # 创建统一流式响应
-            stream_response = create_stream_response(raw_stream, provider)
+            if share:
+                key = make_broadcast_key(provider, model, messages, **llm_params)
+                subscriber = broadcast_hub.subscribe(key, open_upstream, provider_name=provider)
+                stream_response = StreamResponse(subscriber)
+            else:
+                stream_response = StreamResponse(open_upstream())
+            # 宽限期内无人重连时由续传存储的清理线程关闭上游（上游停滞时也能取消）
+            sse_replay_store.register_cancel(stream_id, stream_response.close)
             
-            # 转换为 SSE 格式并发送
-            sent_content = False
-            for sse_chunk in stream_response.to_sse():
-                if 'data:' in sse_chunk and sse_chunk.strip() != 'data: [DONE]':
-                    sent_content = True
-                yield sse_chunk
-            
-            # 如果没有发送任何内容，发送一个空响应
-            if not sent_content:
-                empty_response = json.dumps({
-                    "content": "抱歉，没有收到响应内容。",
-                    "type": "content"
-                })
-                yield f"data: {empty_response}\n\n"
-                yield "data: [DONE]\n\n"
-                
-        except Exception as e:
-            # 发送错误信息
-            error_data = json.dumps({
-                "error": f"服务器错误: {str(e)}",
-                "type": "error"
-            })
-            yield f"data: {error_data}\n\n"
-            yield "data: [DONE]\n\n"
+            # 转换为带事件 id 的 SSE 格式
+            yield from stream_response.to_sse(stream_id)
+        finally:
+            # 离开共享流，最后一个订阅者离开时释放上游
+            if subscriber is not None:
+                subscriber.close()
+    
+    # 断线重连：浏览器通过 Last-Event-ID 带回最后收到的事件 id，直接从续传存储回放，不再调用提供商
+    resume_point = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    )
+    if resume_point and sse_replay_store.can_resume(*resume_point):
+        stream_id, last_seq = resume_point
+    else:
+        stream_id, last_seq = sse_replay_store.start(generate_stream), 0
     
     return Response(
-        generate_stream(),
+        sse_replay_store.follow(stream_id, last_seq),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
             'Connection': 'keep-alive',
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Cache-Control'
+            'Access-Control-Allow-Headers': 'Cache-Control, Last-Event-ID',
+            'X-Stream-Id': stream_id
         }
     )
 
@@ -297,6 +312,7 @@ def api_chat():
         llm = LLMClient()
         
         # 获取原始流
+        start_time = time.time()
         raw_stream = llm.stream_llm(
             provider=provider,
             model=model,
@@ -306,7 +322,7 @@ def api_chat():
         )
         
         # 创建统一流式响应并收集完整响应
-        stream_response = create_stream_response(raw_stream, provider)
+        stream_response = create_stream_response(raw_stream, provider, start_time=start_time)
         full_response = stream_response.collect_full_response()
         
         return jsonify(full_response)
@@ -331,15 +347,36 @@ def get_providers():
     })
 
 
+@app.route('/api/stream-metrics')
+def get_stream_metrics():
+    """获取各提供商的流式延迟指标（TTFT、块间间隔、输出速率、卡顿）"""
+    return jsonify(stream_metrics_sink.snapshot())
+
+
+@app.route('/api/stream-broadcast')
+def get_stream_broadcast():
+    """获取共享流（广播）状态"""
+    return jsonify(broadcast_hub.get_stats())
+
+
+@app.route('/api/stream-resume')
+def get_stream_resume():
+    """获取断点续传存储状态"""
+    return jsonify(sse_replay_store.get_stats())
+
+
 if __name__ == '__main__':
     print("🌊 启动 Web 流式响应演示")
     print("=" * 50)
     print("📱 访问地址: http://localhost:5000")
     print("🔗 API 端点:")
     print("   GET  /              - 主页（演示界面）")
-    print("   GET  /stream        - SSE 流式聊天")
+    print("   GET  /stream        - SSE 流式聊天（share=1 共享相同请求的生成）")
     print("   POST /api/chat      - 非流式 API")
     print("   GET  /api/providers - 获取支持的提供商")
+    print("   GET  /api/stream-metrics - 流式延迟指标")
+    print("   GET  /api/stream-broadcast - 共享流状态")
+    print("   GET  /api/stream-resume - 断点续传存储状态")
     print("=" * 50)
     print("💡 使用说明:")
     print("   1. 在浏览器中打开 http://localhost:5000")